@@ -0,0 +1,219 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+import psutil
+import pyarrow as pa
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+DEFAULT_SAMPLE_INTERVAL = 0.01  # seconds
+DEFAULT_ROW_GROUP_BYTES = 128 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 64 * 1024  # rows
+DEFAULT_JSON_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+class MemorySampler:
+    """
+    Sample the resident set size (RSS) of this process and the bytes allocated from Arrow's
+    memory pool in a background thread, e.g. while writing a file.
+
+    RSS includes memory of native libraries (Daft, Arrow, the allocator's caches); the Arrow pool
+    shows the share that Arrow buffers account for.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        self.samples.append((time.perf_counter() - self._started, self._process.memory_info().rss, pa.total_allocated_bytes()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+    def timeline(self) -> pd.DataFrame:
+        """Return the samples with seconds since start, RSS and Arrow pool allocation in MB."""
+        timeline = pd.DataFrame(self.samples, columns=['seconds', 'rss', 'arrow'])
+        return timeline.assign(rss_mb=timeline['rss'] / 2**20, arrow_mb=timeline['arrow'] / 2**20)[['seconds', 'rss_mb', 'arrow_mb']]
+
+    def peaks(self) -> dict:
+        """Return baseline, peak and growth of RSS and Arrow pool allocation in MB."""
+        _, rss, arrow = zip(*self.samples)
+        return {
+            'baseline_rss_mb': rss[0] / 2**20,
+            'peak_rss_mb': max(rss) / 2**20,
+            'rss_growth_mb': (max(rss) - rss[0]) / 2**20,
+            'arrow_growth_mb': (max(arrow) - arrow[0]) / 2**20,
+        }
+
+
+def _batches(source, batch_size: int, block_size: int):
+    """Yield record batches of at most batch_size rows from a JSON lines, Parquet or Arrow IPC file, or an Arrow table."""
+    if isinstance(source, pa.RecordBatch):
+        source = pa.Table.from_batches([source])
+    if isinstance(source, pa.Table):
+        yield from source.to_batches(batch_size)
+        return
+    path = str(source)
+    if path.endswith('.parquet'):
+        yield from pq.ParquetFile(path).iter_batches(batch_size)
+        return
+    if path.endswith(('.arrow', '.feather', '.ipc')):
+        with pa.memory_map(path) as f:
+            yield from pa.ipc.open_file(f).read_all().to_batches(batch_size)
+        return
+    reader = pj.open_json(path, read_options=pj.ReadOptions(block_size=block_size))
+    for batch in reader:
+        for offset in range(0, batch.num_rows, batch_size):
+            yield batch.slice(offset, batch_size)
+
+
+def write_parquet(source, path, row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES, sort_by=None,
+                  compression: str = 'snappy', batch_size: int = DEFAULT_BATCH_SIZE,
+                  block_size: int = DEFAULT_JSON_BLOCK_SIZE) -> dict:
+    """
+    Ingest a source into a Parquet file the way a streaming ingest job would.
+
+    Batches are buffered until a row group of about row_group_bytes (in memory) is complete, so
+    the row group size bounds the buffered data. Sorting needs the whole input in memory.
+
+    Args:
+        source: JSON lines, Parquet or Arrow IPC file, or Arrow table
+        path: Output Parquet file
+        row_group_bytes: Target in-memory size of a row group
+        sort_by: Column name or list of column names to sort by, or None
+        compression: Parquet codec, e.g. 'snappy', 'zstd', 'gzip' or 'none'
+        batch_size: Rows per batch read from the source
+        block_size: Bytes of JSON parsed per block (JSON sources only)
+
+    Returns:
+        Dictionary with rows, row groups and file size
+    """
+    batches = _batches(source, batch_size, block_size)
+    if sort_by:
+        keys = [sort_by] if isinstance(sort_by, str) else list(sort_by)
+        table = pa.Table.from_batches(list(batches)).sort_by([(key, 'ascending') for key in keys])
+        batches = iter(table.to_batches(batch_size))
+        del table
+
+    writer = None
+    buffered, buffered_bytes, rows = [], 0, 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+            buffered.append(batch)
+            buffered_bytes += batch.nbytes
+            rows += batch.num_rows
+            if buffered_bytes >= row_group_bytes:
+                row_group = pa.Table.from_batches(buffered)
+                writer.write_table(row_group, row_group_size=row_group.num_rows)
+                buffered, buffered_bytes = [], 0
+        if buffered:
+            row_group = pa.Table.from_batches(buffered)
+            writer.write_table(row_group, row_group_size=row_group.num_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return {'rows': rows, 'row_groups': pq.ParquetFile(path).metadata.num_row_groups if writer else 0,
+            'file_bytes': os.path.getsize(path) if writer else 0}
+
+
+def config_grid(row_group_bytes=(DEFAULT_ROW_GROUP_BYTES,), sort_by=(None,), compression=('snappy',),
+                batch_size=(DEFAULT_BATCH_SIZE,), block_size=(DEFAULT_JSON_BLOCK_SIZE,)) -> list:
+    """Return the cross product of write settings as a list of configuration dictionaries."""
+    return [
+        {'row_group_bytes': r, 'sort_by': s, 'compression': c, 'batch_size': b, 'block_size': j}
+        for r, s, c, b, j in itertools.product(row_group_bytes, sort_by, compression, batch_size, block_size)
+    ]
+
+
+def _label(config: dict) -> str:
+    sort_by = config.get('sort_by')
+    sort_label = ','.join([sort_by] if isinstance(sort_by, str) else sort_by) if sort_by else 'unsorted'
+    return (f"rg={config.get('row_group_bytes', DEFAULT_ROW_GROUP_BYTES) / 2**20:g}MB {sort_label} "
+            f"{config.get('compression', 'snappy')} batch={config.get('batch_size', DEFAULT_BATCH_SIZE):,} "
+            f"block={config.get('block_size', DEFAULT_JSON_BLOCK_SIZE) / 2**20:g}MB")
+
+
+def measure_write(source, path, config: dict, interval: float = DEFAULT_SAMPLE_INTERVAL) -> dict:
+    """
+    Run write_parquet() with one configuration and record time and memory.
+
+    Returns:
+        Dictionary with the configuration, write result, seconds, memory peaks, the whole-process
+        Arrow pool peak, and the sampled 'timeline' (DataFrame)
+    """
+    with MemorySampler(interval) as sampler:
+        started = time.perf_counter()
+        result = write_parquet(source, path, **config)
+        seconds = time.perf_counter() - started
+    return {
+        'config': _label(config), **config, **result, 'seconds': seconds, **sampler.peaks(),
+        'process_peak_arrow_mb': pa.default_memory_pool().max_memory() / 2**20,
+        'timeline': sampler.timeline(),
+    }
+
+
+def benchmark_memory(source, configs, output_dir, isolate: bool = True,
+                     interval: float = DEFAULT_SAMPLE_INTERVAL) -> dict:
+    """
+    Measure peak memory, time and file size of several ingest/write configurations.
+
+    With isolate=True each configuration runs in a fresh process. Otherwise freed memory stays
+    cached by the allocator, so later configurations would inherit the RSS of earlier ones.
+    An Arrow table source is written to an Arrow IPC file first and memory-mapped by each
+    process.
+
+    Args:
+        source: JSON lines, Parquet or Arrow IPC file, or Arrow table
+        configs: List of keyword dictionaries for write_parquet(), e.g. from config_grid()
+        output_dir: Directory for the Parquet files (and the IPC copy of a table source)
+        isolate: Run each configuration in its own process
+        interval: Memory sampling interval in seconds
+
+    Returns:
+        Dictionary with 'summary' (DataFrame, one row per configuration) and 'timelines'
+        (DataFrame of memory samples per configuration)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if isolate and isinstance(source, (pa.Table, pa.RecordBatch)):
+        ipc_path = output_dir / 'benchmark_source.arrow'
+        with pa.OSFile(str(ipc_path), 'wb') as sink, pa.ipc.new_file(sink, source.schema) as writer:
+            writer.write(source)
+        source = ipc_path
+
+    results = []
+    for i, config in enumerate(configs):
+        path = output_dir / f'benchmark_{i}.parquet'
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results.append(executor.submit(measure_write, source, path, config, interval).result())
+        else:
+            results.append(measure_write(source, path, config, interval))
+
+    timelines = pd.concat([r.pop('timeline').assign(config=r['config']) for r in results], ignore_index=True)
+    return {'summary': pd.DataFrame(results), 'timelines': timelines}
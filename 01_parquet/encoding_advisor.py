@@ -0,0 +1,232 @@
+import io
+import random
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# 'DICTIONARY' stands for dictionary encoding (RLE_DICTIONARY pages); the others are column_encoding values
+ENCODINGS = ('DICTIONARY', 'PLAIN', 'RLE', 'DELTA_BINARY_PACKED', 'DELTA_LENGTH_BYTE_ARRAY', 'DELTA_BYTE_ARRAY',
+             'BYTE_STREAM_SPLIT')
+CODECS = ('none', 'snappy', 'zstd')
+DEFAULT_DICTIONARY_PAGESIZE_LIMIT = 1024 * 1024  # the pyarrow writer default
+DEFAULT_ROW_GROUP_ROWS = 1024 * 1024  # the pyarrow writer default
+SATURATED_DISTINCT_RATIO = 0.01  # below this, the sample is assumed to contain (almost) all distinct values
+
+
+def _applicable(encoding: str, data_type: pa.DataType) -> bool:
+    """Return whether the Parquet writer supports an encoding for a column's physical type."""
+    if encoding == 'PLAIN':
+        return True
+    if encoding == 'DICTIONARY':
+        # Booleans are never dictionary encoded
+        return not pa.types.is_boolean(data_type)
+    if encoding == 'RLE':
+        return pa.types.is_boolean(data_type)
+    integer = pa.types.is_integer(data_type) or pa.types.is_temporal(data_type) or pa.types.is_decimal(data_type)
+    if encoding == 'DELTA_BINARY_PACKED':
+        return integer and not pa.types.is_decimal(data_type) and data_type.bit_width <= 64
+    binary = pa.types.is_string(data_type) or pa.types.is_large_string(data_type) \
+        or pa.types.is_binary(data_type) or pa.types.is_large_binary(data_type)
+    if encoding == 'DELTA_LENGTH_BYTE_ARRAY':
+        return binary
+    if encoding == 'DELTA_BYTE_ARRAY':
+        return binary or pa.types.is_fixed_size_binary(data_type)
+    if encoding == 'BYTE_STREAM_SPLIT':
+        return pa.types.is_floating(data_type) or (integer and data_type.bit_width in (32, 64)) \
+            or pa.types.is_fixed_size_binary(data_type)
+    return False
+
+
+def _flat_columns(table: pa.Table) -> pa.Table:
+    """Flatten struct columns into leaf columns ('a.b'); list and map columns are dropped."""
+    while any(pa.types.is_struct(t) for t in table.schema.types):
+        table = table.flatten()
+    return table.select([f.name for f in table.schema if not pa.types.is_nested(f.type)])
+
+
+def sample_source(source, sample_rows: int = 100_000, seed: int = 42) -> tuple:
+    """
+    Sample rows from a Parquet file (whole random row groups, then rows) or an Arrow table.
+
+    Returns:
+        Tuple of the sampled table and the total number of rows of the source
+    """
+    rng = random.Random(seed)
+    if isinstance(source, pa.Table):
+        total = source.num_rows
+        indices = sorted(rng.sample(range(total), min(sample_rows, total)))
+        return source.take(indices), total
+
+    pqfile = pq.ParquetFile(source)
+    meta = pqfile.metadata
+    row_groups = list(range(meta.num_row_groups))
+    rng.shuffle(row_groups)
+    selected, rows = [], 0
+    for rg in row_groups:
+        if rows >= sample_rows:
+            break
+        selected.append(rg)
+        rows += meta.row_group(rg).num_rows
+    table = pqfile.read_row_groups(sorted(selected))
+    if table.num_rows > sample_rows:
+        table = table.take(sorted(rng.sample(range(table.num_rows), sample_rows)))
+    return table, meta.num_rows
+
+
+def _encode(column: pa.Table, name: str, encoding: str, codec: str, dictionary_pagesize_limit: int) -> bytes:
+    buffer = io.BytesIO()
+    options = {'use_dictionary': True, 'dictionary_pagesize_limit': dictionary_pagesize_limit} \
+        if encoding == 'DICTIONARY' else {'use_dictionary': False, 'column_encoding': {name: encoding}}
+    pq.write_table(column, buffer, compression=codec, write_statistics=False, **options)
+    return buffer.getvalue()
+
+
+def trial_encode(column: pa.Table, encodings=ENCODINGS, codecs=CODECS, repeat: int = 3,
+                 dictionary_pagesize_limit: int = DEFAULT_DICTIONARY_PAGESIZE_LIMIT) -> list:
+    """
+    Write a single-column table with each applicable encoding and codec and time reading it back.
+
+    Args:
+        column: Arrow table with one column
+        encodings: Encodings to try (see ENCODINGS)
+        codecs: Compression codecs to try
+        repeat: Decode repetitions; the fastest one counts
+        dictionary_pagesize_limit: Dictionary size at which the writer falls back to PLAIN
+
+    Returns:
+        List of dictionaries with encoding, codec, encoded bytes, encode and decode time,
+        and decode throughput in MB/s of in-memory data
+    """
+    name = column.column_names[0]
+    data_type = column.schema.types[0]
+    trials = []
+    for encoding in encodings:
+        if not _applicable(encoding, data_type):
+            continue
+        for codec in codecs:
+            started = time.perf_counter()
+            try:
+                encoded = _encode(column, name, encoding, codec, dictionary_pagesize_limit)
+            except (pa.ArrowException, ValueError):
+                continue
+            encode_s = time.perf_counter() - started
+            decode_s = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                pq.read_table(io.BytesIO(encoded))
+                decode_s = min(decode_s, time.perf_counter() - started)
+            trial = {'encoding': encoding, 'codec': codec, 'bytes': len(encoded), 'encode_ms': encode_s * 1000,
+                     'decode_ms': decode_s * 1000, 'decode_mb_per_s': column.nbytes / 2**20 / decode_s if decode_s else None}
+            if encoding == 'DICTIONARY':
+                chunk = pq.ParquetFile(io.BytesIO(encoded)).metadata.row_group(0).column(0)
+                trial['dictionary_bytes'] = chunk.data_page_offset - chunk.dictionary_page_offset \
+                    if chunk.has_dictionary_page else 0
+            trials.append(trial)
+    return trials
+
+
+def _file_fallbacks(path, dictionary_pagesize_limit: int) -> dict:
+    """Return, per column, the share of column chunks whose dictionary reached the page size limit (and likely fell back to PLAIN)."""
+    meta = pq.ParquetFile(path).metadata
+    reached, chunks = {}, {}
+    for rg_idx in range(meta.num_row_groups):
+        rg = meta.row_group(rg_idx)
+        for col_idx in range(rg.num_columns):
+            col = rg.column(col_idx)
+            chunks[col.path_in_schema] = chunks.get(col.path_in_schema, 0) + 1
+            if col.has_dictionary_page:
+                size = col.data_page_offset - col.dictionary_page_offset
+                if size >= 0.9 * dictionary_pagesize_limit:
+                    reached[col.path_in_schema] = reached.get(col.path_in_schema, 0) + 1
+    return {name: reached.get(name, 0) / count for name, count in chunks.items()}
+
+
+def advise_encodings(source, sample_rows: int = 100_000, codecs=CODECS, row_group_rows: int = None,
+                     dictionary_pagesize_limit: int = DEFAULT_DICTIONARY_PAGESIZE_LIMIT,
+                     max_decode_slowdown: float = 2.0, seed: int = 42) -> dict:
+    """
+    Recommend an encoding and codec per column from trial encodes of a sample.
+
+    For each column, the smallest trial wins among those that decode at most max_decode_slowdown
+    times slower than the column's fastest trial. Dictionary encoding is ruled out where the
+    dictionary of a full row group is predicted to exceed the page size limit, since the writer
+    then falls back to PLAIN for the rest of the row group.
+
+    Args:
+        source: Parquet file or Arrow table
+        sample_rows: Number of rows sampled
+        codecs: Compression codecs to try
+        row_group_rows: Rows per row group of the target files (default: as in the source file, or 1Mi rows)
+        dictionary_pagesize_limit: Dictionary size at which the writer falls back to PLAIN
+        max_decode_slowdown: Accepted decode time relative to the fastest trial of a column
+        seed: Random seed for sampling
+
+    Returns:
+        Dictionary with 'trials' (DataFrame, all trials), 'recommendations' (DataFrame, one row per
+        column) and 'writer_options' (keyword arguments for pq.write_table / pq.ParquetWriter)
+    """
+    sample, total_rows = sample_source(source, sample_rows, seed)
+    sample = _flat_columns(sample)
+    scale = total_rows / sample.num_rows if sample.num_rows else 0
+    file_fallbacks = {}
+    if not isinstance(source, pa.Table):
+        meta = pq.ParquetFile(source).metadata
+        row_group_rows = row_group_rows or max(1, meta.num_rows // max(1, meta.num_row_groups))
+        file_fallbacks = _file_fallbacks(source, dictionary_pagesize_limit)
+    row_group_rows = row_group_rows or DEFAULT_ROW_GROUP_ROWS
+
+    trials, recommendations = [], []
+    for name in sample.column_names:
+        column = sample.select([name])
+        column_trials = pd.DataFrame(trial_encode(column, codecs=codecs, dictionary_pagesize_limit=dictionary_pagesize_limit))
+        if column_trials.empty:
+            continue
+        column_trials.insert(0, 'column', name)
+        trials.append(column_trials)
+
+        values = column.column(0)
+        non_null = len(values) - values.null_count
+        distinct = pc.count_distinct(values).as_py()
+        distinct_ratio = distinct / non_null if non_null else 0.0
+        # Distinct values of a full row group: the sample's if it looks saturated, else growing with the rows
+        projected_distinct = distinct if distinct_ratio < SATURATED_DISTINCT_RATIO \
+            else min(distinct * row_group_rows / max(1, len(values)), row_group_rows)
+        dictionary = column_trials[column_trials['encoding'] == 'DICTIONARY']
+        projected_dictionary = dictionary['dictionary_bytes'].max() / max(1, distinct) * projected_distinct \
+            if not dictionary.empty else 0
+        fallback = projected_dictionary > dictionary_pagesize_limit
+
+        candidates = column_trials[column_trials['encoding'] != 'DICTIONARY'] if fallback else column_trials
+        candidates = candidates[candidates['decode_ms'] <= max_decode_slowdown * candidates['decode_ms'].min()]
+        best = candidates.sort_values(['bytes', 'decode_ms']).iloc[0]
+        baseline = column_trials[(column_trials['encoding'] == 'DICTIONARY') & (column_trials['codec'] == 'snappy')]
+        baseline_bytes = baseline['bytes'].iloc[0] if not baseline.empty else None
+
+        recommendations.append({
+            'column': name,
+            'type': str(values.type),
+            'distinct_ratio': distinct_ratio,
+            'dictionary_fallback': fallback,
+            'file_fallback_share': file_fallbacks.get(name),
+            'encoding': best['encoding'],
+            'codec': best['codec'],
+            'predicted_bytes': int(best['bytes'] * scale),
+            'default_bytes': int(baseline_bytes * scale) if baseline_bytes is not None else None,
+            'saving': 1 - best['bytes'] / baseline_bytes if baseline_bytes else None,
+            'decode_mb_per_s': best['decode_mb_per_s'],
+        })
+
+    recommendations = pd.DataFrame(recommendations)
+    writer_options = {
+        'use_dictionary': [r['column'] for r in recommendations.to_dict('records') if r['encoding'] == 'DICTIONARY'],
+        'column_encoding': {r['column']: r['encoding'] for r in recommendations.to_dict('records') if r['encoding'] != 'DICTIONARY'},
+        'compression': {r['column']: r['codec'] for r in recommendations.to_dict('records')},
+        'dictionary_pagesize_limit': dictionary_pagesize_limit,
+    }
+    return {
+        'trials': pd.concat(trials, ignore_index=True) if trials else pd.DataFrame(),
+        'recommendations': recommendations,
+        'writer_options': writer_options,
+    }
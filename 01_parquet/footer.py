@@ -0,0 +1,397 @@
+import os
+import struct
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_MAX_STATISTICS_LENGTH = 16  # bytes, like Iceberg's default truncate(16) metrics mode
+ARROW_SCHEMA_KEY = b'ARROW:schema'
+MAGIC = b'PAR1'
+
+# Thrift compact protocol types
+STOP, TRUE, FALSE, BYTE, I16, I32, I64, DOUBLE, BINARY, LIST, SET, MAP, STRUCT = range(13)
+
+# Field ids of the Parquet footer structures (parquet.thrift)
+FILE_SCHEMA, FILE_ROW_GROUPS, FILE_KEY_VALUE_METADATA = 2, 4, 5
+ROW_GROUP_COLUMNS = 1
+CHUNK_META_DATA = 3
+META_TYPE, META_STATISTICS, META_ENCODING_STATS, META_SIZE_STATISTICS = 1, 12, 13, 16
+STATS_MAX, STATS_MIN, STATS_MAX_VALUE, STATS_MIN_VALUE, STATS_IS_MAX_EXACT, STATS_IS_MIN_EXACT = 1, 2, 5, 6, 7, 8
+BYTE_ARRAY = 6
+
+
+def _varint(buf, pos: int) -> tuple:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_value(buf, pos: int, ctype: int) -> tuple:
+    """Decode one compact protocol value; structs become lists of [field_id, type, value, start, stop]."""
+    if ctype in (TRUE, FALSE):  # inside lists and maps, booleans take a byte
+        return buf[pos] == TRUE, pos + 1
+    if ctype == BYTE:
+        return buf[pos], pos + 1
+    if ctype in (I16, I32, I64):
+        value, pos = _varint(buf, pos)
+        return (value >> 1) ^ -(value & 1), pos
+    if ctype == DOUBLE:
+        return bytes(buf[pos:pos + 8]), pos + 8
+    if ctype == BINARY:
+        size, pos = _varint(buf, pos)
+        return bytes(buf[pos:pos + size]), pos + size
+    if ctype in (LIST, SET):
+        size, element_type = buf[pos] >> 4, buf[pos] & 0x0f
+        pos += 1
+        if size == 15:
+            size, pos = _varint(buf, pos)
+        items = []
+        for _ in range(size):
+            item, pos = _read_value(buf, pos, element_type)
+            items.append(item)
+        return (element_type, items), pos
+    if ctype == MAP:
+        size, pos = _varint(buf, pos)
+        if size == 0:
+            return (0, 0, []), pos
+        key_type, value_type = buf[pos] >> 4, buf[pos] & 0x0f
+        pos += 1
+        items = []
+        for _ in range(size):
+            key, pos = _read_value(buf, pos, key_type)
+            value, pos = _read_value(buf, pos, value_type)
+            items.append((key, value))
+        return (key_type, value_type, items), pos
+    if ctype == STRUCT:
+        return _read_struct(buf, pos)
+    raise ValueError(f'Unknown Thrift compact type {ctype} at byte {pos}')
+
+
+def _read_struct(buf, pos: int) -> tuple:
+    fields, last = [], 0
+    while True:
+        start = pos
+        header = buf[pos]
+        pos += 1
+        ctype = header & 0x0f
+        if ctype == STOP:
+            return fields, pos
+        if header >> 4:
+            field_id = last + (header >> 4)
+        else:
+            field_id, pos = _read_value(buf, pos, I16)
+        if ctype in (TRUE, FALSE):
+            value = ctype == TRUE
+        else:
+            value, pos = _read_value(buf, pos, ctype)
+        fields.append([field_id, ctype, value, start, pos])
+        last = field_id
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_value(out: bytearray, ctype: int, value) -> None:
+    if ctype in (TRUE, FALSE):
+        out.append(TRUE if value else FALSE)
+    elif ctype == BYTE:
+        out.append(value & 0xff)
+    elif ctype in (I16, I32, I64):
+        _write_varint(out, (value << 1) ^ (value >> 63))
+    elif ctype == DOUBLE:
+        out += value
+    elif ctype == BINARY:
+        _write_varint(out, len(value))
+        out += value
+    elif ctype in (LIST, SET):
+        element_type, items = value
+        if len(items) < 15:
+            out.append(len(items) << 4 | element_type)
+        else:
+            out.append(0xf0 | element_type)
+            _write_varint(out, len(items))
+        for item in items:
+            _write_value(out, element_type, item)
+    elif ctype == MAP:
+        key_type, value_type, items = value
+        _write_varint(out, len(items))
+        if items:
+            out.append(key_type << 4 | value_type)
+        for key, item in items:
+            _write_value(out, key_type, key)
+            _write_value(out, value_type, item)
+    elif ctype == STRUCT:
+        _write_struct(out, value)
+    else:
+        raise ValueError(f'Unknown Thrift compact type {ctype}')
+
+
+def _write_struct(out: bytearray, fields: list) -> None:
+    last = 0
+    for field_id, ctype, value, *_ in fields:
+        if ctype in (TRUE, FALSE):
+            ctype = TRUE if value else FALSE
+        if 0 < field_id - last <= 15:
+            out.append((field_id - last) << 4 | ctype)
+        else:
+            out.append(ctype)
+            _write_value(out, I16, field_id)
+        if ctype not in (TRUE, FALSE):
+            _write_value(out, ctype, value)
+        last = field_id
+    out.append(STOP)
+
+
+def _field(fields: list, field_id: int):
+    return next((f for f in fields if f[0] == field_id), None)
+
+
+def _size(fields: list) -> int:
+    """Encoded size of a struct: its fields plus the stop byte."""
+    return sum(f[4] - f[3] for f in fields) + 1
+
+
+def read_footer(path, filesystem=None) -> tuple:
+    """
+    Read the Thrift-encoded footer (FileMetaData) of a Parquet file, with two small reads at the end.
+
+    Returns:
+        (footer bytes, file size)
+    """
+    if filesystem is None:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(size - 8)
+            length, magic = struct.unpack('<i4s', f.read(8))
+            f.seek(size - 8 - length)
+            footer = f.read(length)
+    else:
+        with filesystem.open_input_file(str(path)) as f:
+            size = f.size()
+            length, magic = struct.unpack('<i4s', f.read_at(8, size - 8))
+            footer = f.read_at(length, size - 8 - length)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a Parquet file (or its footer is encrypted)')
+    return footer, size
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def analyze_footer(path, filesystem=None, repeat: int = 5) -> dict:
+    """
+    Break the footer of a Parquet file down into its parts and measure how long it takes to load.
+
+    Every reader fetches and parses the whole footer before reading any data, so on an object
+    store a large footer delays the first byte of every query. The footer holds the schema, one
+    column chunk entry per column and row group (with its statistics), and key/value metadata,
+    which includes the serialized Arrow schema written by PyArrow.
+
+    Args:
+        path: Parquet file
+        filesystem: PyArrow filesystem of the path, e.g. pyarrow.fs.S3FileSystem (default: local)
+        repeat: Number of timed repetitions (the median is reported)
+
+    Returns:
+        Dictionary with file and footer size, bytes per part (schema, column_chunks, statistics,
+        size_statistics, encoding_stats, key_value_metadata, arrow_schema, other), parse_ms
+        (decoding the footer from memory), open_ms (opening the file and reading its metadata,
+        i.e. the time to first data byte), and 'columns' (DataFrame with bytes per column)
+    """
+    footer, file_size = read_footer(path, filesystem)
+    fields, _ = _read_struct(footer, 0)
+    tail = MAGIC + footer + struct.pack('<i', len(footer)) + MAGIC  # parsed like the end of a file
+    metadata = pq.read_metadata(pa.BufferReader(tail))
+    names = [metadata.schema.column(i).path for i in range(metadata.num_columns)]
+
+    columns = {name: {'column': name, 'chunk_bytes': 0, 'statistics_bytes': 0, 'max_statistics_value_bytes': 0}
+               for name in names}
+    parts = dict.fromkeys(['column_chunks', 'statistics', 'size_statistics', 'encoding_stats'], 0)
+    row_groups = _field(fields, FILE_ROW_GROUPS)
+    for row_group in (row_groups[2][1] if row_groups else []):
+        for name, chunk in zip(names, _field(row_group, ROW_GROUP_COLUMNS)[2][1]):
+            size = _size(chunk)
+            columns[name]['chunk_bytes'] += size
+            parts['column_chunks'] += size
+            meta = _field(chunk, CHUNK_META_DATA)
+            if meta is None:
+                continue
+            for part, field_id in (('statistics', META_STATISTICS), ('size_statistics', META_SIZE_STATISTICS),
+                                   ('encoding_stats', META_ENCODING_STATS)):
+                field = _field(meta[2], field_id)
+                if field is not None:
+                    parts[part] += field[4] - field[3]
+                    if part == 'statistics':
+                        columns[name]['statistics_bytes'] += field[4] - field[3]
+                        lengths = [len(f[2]) for f in field[2] if f[0] in (STATS_MIN_VALUE, STATS_MAX_VALUE)]
+                        columns[name]['max_statistics_value_bytes'] = max(
+                            [columns[name]['max_statistics_value_bytes']] + lengths)
+
+    key_values = _field(fields, FILE_KEY_VALUE_METADATA)
+    arrow_schema = 0
+    for key_value in (key_values[2][1] if key_values else []):
+        value = _field(key_value, 2)
+        if _field(key_value, 1)[2] == ARROW_SCHEMA_KEY and value is not None:
+            arrow_schema += len(value[2])
+    schema = _field(fields, FILE_SCHEMA)
+    schema_bytes = schema[4] - schema[3] if schema else 0
+    key_value_bytes = key_values[4] - key_values[3] if key_values else 0
+
+    table = pd.DataFrame(list(columns.values()))
+    table['footer_share'] = table['chunk_bytes'] / len(footer)
+    return {
+        'file_bytes': file_size,
+        'footer_bytes': len(footer),
+        'row_groups': metadata.num_row_groups,
+        'columns_count': metadata.num_columns,
+        'schema': schema_bytes,
+        'column_chunks': parts['column_chunks'],
+        'statistics': parts['statistics'],
+        'size_statistics': parts['size_statistics'],
+        'encoding_stats': parts['encoding_stats'],
+        'key_value_metadata': key_value_bytes,
+        'arrow_schema': arrow_schema,
+        'other': len(footer) - schema_bytes - parts['column_chunks'] - key_value_bytes,
+        'parse_ms': _median_ms(lambda: pq.read_metadata(pa.BufferReader(tail)), repeat),
+        'open_ms': _median_ms(lambda: pq.ParquetFile(str(path), filesystem=filesystem).metadata, repeat),
+        'columns': table.sort_values('chunk_bytes', ascending=False, ignore_index=True),
+    }
+
+
+def _truncate_min(value: bytes, length: int) -> bytes:
+    """Return a prefix of at most length bytes, cut at a character boundary for UTF-8 values."""
+    try:
+        return value.decode('utf-8').encode()[:length].decode('utf-8', 'ignore').encode()
+    except UnicodeDecodeError:
+        return value[:length]
+
+
+def _truncate_max(value: bytes, length: int):
+    """Return a value of at most length bytes that is >= value, or None if there is none."""
+    try:
+        text = value.decode('utf-8')
+    except UnicodeDecodeError:
+        prefix = bytearray(value[:length])
+        while prefix and prefix[-1] == 0xff:
+            prefix.pop()
+        if not prefix:
+            return None
+        prefix[-1] += 1
+        return bytes(prefix)
+    prefix = text.encode()[:length].decode('utf-8', 'ignore')
+    for i in range(len(prefix) - 1, -1, -1):
+        code = ord(prefix[i]) + 1
+        if 0xd800 <= code <= 0xdfff:  # surrogates aren't valid characters
+            code = 0xe000
+        if code <= 0x10ffff:
+            return (prefix[:i] + chr(code)).encode()
+    return None
+
+
+def _truncate_statistics(statistics: list, length: int) -> bool:
+    """Truncate long min/max values of a Statistics struct in place; returns whether it changed."""
+    changed = False
+    for value_id, exact_id, truncate in ((STATS_MIN_VALUE, STATS_IS_MIN_EXACT, _truncate_min),
+                                         (STATS_MAX_VALUE, STATS_IS_MAX_EXACT, _truncate_max),
+                                         (STATS_MIN, None, _truncate_min), (STATS_MAX, None, _truncate_max)):
+        field = _field(statistics, value_id)
+        if field is None or len(field[2]) <= length:
+            continue
+        truncated = truncate(field[2], length)
+        if truncated is None:
+            continue
+        field[2] = truncated
+        changed = True
+        if exact_id is not None:
+            exact = _field(statistics, exact_id)
+            if exact is None:
+                statistics.append([exact_id, FALSE, False, 0, 0])
+            else:
+                exact[2] = False
+    statistics.sort(key=lambda f: f[0])
+    return changed
+
+
+def truncate_statistics(path, max_length: int = DEFAULT_MAX_STATISTICS_LENGTH) -> dict:
+    """
+    Truncate long string min/max statistics in the footer of a local Parquet file, in place.
+
+    Minimums are cut to a prefix, maximums to a prefix whose last character is incremented, so
+    both stay valid bounds for row group pruning, and the exactness flags are cleared. Only the
+    footer is rewritten; data pages are untouched.
+
+    Args:
+        path: Parquet file
+        max_length: Longest min/max value kept, in bytes
+
+    Returns:
+        Dictionary with the number of truncated statistics and the footer size before and after
+    """
+    footer, size = read_footer(path)
+    fields, _ = _read_struct(footer, 0)
+    truncated = 0
+    row_groups = _field(fields, FILE_ROW_GROUPS)
+    for row_group in (row_groups[2][1] if row_groups else []):
+        for chunk in _field(row_group, ROW_GROUP_COLUMNS)[2][1]:
+            meta = _field(chunk, CHUNK_META_DATA)
+            if meta is None or _field(meta[2], META_TYPE)[2] != BYTE_ARRAY:
+                continue
+            statistics = _field(meta[2], META_STATISTICS)
+            if statistics is not None:
+                truncated += _truncate_statistics(statistics[2], max_length)
+
+    result = {'truncated': truncated, 'footer_bytes_before': len(footer), 'footer_bytes': len(footer)}
+    if truncated:
+        out = bytearray()
+        _write_struct(out, fields)
+        with open(path, 'r+b') as f:
+            f.truncate(size - 8 - len(footer))
+            f.seek(0, os.SEEK_END)
+            f.write(bytes(out) + struct.pack('<i', len(out)) + MAGIC)
+        result['footer_bytes'] = len(out)
+    return result
+
+
+def write_slim(table: pa.Table, path, statistics_columns=None, max_statistics_length: int = DEFAULT_MAX_STATISTICS_LENGTH,
+               store_schema: bool = True, **kwargs) -> dict:
+    """
+    Write a Parquet file with a small footer, for wide schemas read from object stores.
+
+    Statistics are written only for the columns that queries filter on, and long string
+    min/max values are truncated. store_schema=False also drops the serialized Arrow schema,
+    which for wide nested schemas can be the largest part of the footer; readers then derive the
+    Arrow types from the Parquet schema (time zones and some Arrow-only types are lost).
+
+    Args:
+        table: Arrow table
+        path: Local output file
+        statistics_columns: Column paths to keep statistics for, e.g. ['source_id', 'time'] (default: all)
+        max_statistics_length: Longest string min/max value kept, in bytes (None: no truncation)
+        store_schema: Store the Arrow schema in the key/value metadata
+        **kwargs: Passed to pyarrow.parquet.write_table(), e.g. row_group_size or compression
+
+    Returns:
+        Dictionary with the number of truncated statistics and the footer size
+    """
+    write_statistics = list(statistics_columns) if statistics_columns is not None else True
+    pq.write_table(table, path, write_statistics=write_statistics, store_schema=store_schema, **kwargs)
+    if max_statistics_length is None:
+        return {'truncated': 0, 'footer_bytes': len(read_footer(path)[0])}
+    result = truncate_statistics(path, max_statistics_length)
+    return {'truncated': result['truncated'], 'footer_bytes': result['footer_bytes']}
@@ -2,23 +2,88 @@ from pathlib import Path
 import pandas as pd
 import pyarrow.parquet as pq
 from IPython.display import display, HTML
+from tracing import traced
 
-def inspect(file_path: Path) -> None:
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_COLUMN_PAGE_SIZE = 50
+
+
+def _page_bounds(page: int, page_size: int, total: int) -> tuple:
+    """Clamp a 1-based page number to the available pages and return (page, pages, start, stop)."""
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return page, pages, start, min(start + page_size, total)
+
+
+def _pager(label: str, page: int, page_size: int, total: int, argument: str = 'page') -> str:
+    """Return the note shown above a paginated section, telling how to fetch the other pages."""
+    page, pages, start, stop = _page_bounds(page, page_size, total)
+    return f"""
+            <div style="margin: 10px 0 15px 20px; padding: 8px; background-color: #fdf6e3; border-radius: 3px; font-size: 0.9em;">
+                Showing {label} {start + 1:,}-{stop:,} of {total:,} (page {page} of {pages}).
+                Pass <code>{argument}=</code> and <code>{argument}_size=</code> for other {label}.
+            </div>
+    """
+
+
+def _column_summary(meta) -> list:
+    """Aggregate the column chunks of all row groups into one row per column."""
+    columns = {}
+    for rg_idx in range(meta.num_row_groups):
+        rg = meta.row_group(rg_idx)
+        for col_idx in range(rg.num_columns):
+            col = rg.column(col_idx)
+            summary = columns.setdefault(col.path_in_schema, {
+                'physical_type': col.physical_type, 'compression': set(), 'encodings': set(),
+                'compressed': 0, 'uncompressed': 0, 'dictionary': 0, 'nulls': 0,
+            })
+            summary['compression'].add(str(col.compression))
+            summary['encodings'].update(str(e) for e in col.encodings)
+            summary['compressed'] += col.total_compressed_size
+            summary['uncompressed'] += col.total_uncompressed_size
+            summary['dictionary'] += col.has_dictionary_page
+            if col.is_stats_set and col.statistics.has_null_count:
+                summary['nulls'] += col.statistics.null_count
+    return [{'column': name, **summary} for name, summary in columns.items()]
+
+
+@traced('html.render', 'render')
+def inspect(file_path: Path, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, column_page: int = 1,
+            column_page_size: int = DEFAULT_COLUMN_PAGE_SIZE) -> None:
+    """
+    Display the physical layout of a Parquet file as HTML.
+
+    Summaries over all row groups are shown first; the per-row-group detail is paginated, and
+    so are the columns of wide schemas, so rendering cost grows with neither.
+
+    Args:
+        file_path: Path to the Parquet file
+        page: Page of row groups to show in detail (1-based)
+        page_size: Number of row groups per page
+        column_page: Page of columns shown in the summary, column chunks and schema details (1-based)
+        column_page_size: Number of columns per page
+    """
     import struct
 
     pqfile = pq.ParquetFile(file_path)
     meta = pqfile.metadata
 
+    # Calculate metadata location (at the end of file), reading the last 8 bytes only
     with open(file_path, 'rb') as f:
-        file_bytes = f.read()
-    file_size = len(file_bytes)
-
-    # Calculate metadata location (at the end of file)
-    metadata_len = struct.unpack('<i', file_bytes[-8:-4])[0]
+        f.seek(-8, 2)
+        file_size = f.tell() + 8
+        metadata_len = struct.unpack('<i', f.read(4))[0]
     metadata_start = file_size - 8 - metadata_len
 
+    _, _, first_column, stop_column = _page_bounds(column_page, column_page_size, meta.num_columns)
+    column_pager, column_range = '', ''
+    if meta.num_columns > column_page_size:
+        column_pager = _pager('columns', column_page, column_page_size, meta.num_columns, 'column_page')
+        column_range = f', showing {first_column + 1:,}-{stop_column:,}'
+
     # Build HTML output
-    html = f"""
+    html = [f"""
     <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 1400px;">
         <h2 style="color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px;">
             📄 Parquet File: {file_path}
@@ -54,15 +119,53 @@ def inspect(file_path: Path) -> None:
             </table>
         </div>
 
+        <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
+            📊 Column Summary (all row groups)
+        </h3>
+        {column_pager}
+
+        <div style="background-color: #fff; padding: 10px; margin: 20px 0; max-height: 400px; overflow-y: auto;">
+            <table style="width: 100%; border-collapse: collapse; font-size: 0.9em;">
+                <tr style="background-color: #ecf0f1;">
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: left;">Column</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: left;">Physical Type</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: left;">Compression</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: left;">Encodings</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: right;">Compressed</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: right;">Uncompressed</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: right;">Dictionary Chunks</th>
+                    <th style="padding: 5px; border: 1px solid #bdc3c7; text-align: right;">Nulls</th>
+                </tr>
+    """]
+
+    for summary in _column_summary(meta)[first_column:stop_column]:
+        ratio = 100 * summary['compressed'] / summary['uncompressed'] if summary['uncompressed'] else 0
+        html.append(f"""
+                <tr style="background-color: #fff;">
+                    <td style="padding: 5px; border: 1px solid #ddd;"><code>{summary['column']}</code></td>
+                    <td style="padding: 5px; border: 1px solid #ddd;"><code>{summary['physical_type']}</code></td>
+                    <td style="padding: 5px; border: 1px solid #ddd;"><code>{', '.join(sorted(summary['compression']))}</code></td>
+                    <td style="padding: 5px; border: 1px solid #ddd;"><code>{', '.join(sorted(summary['encodings']))}</code></td>
+                    <td style="padding: 5px; border: 1px solid #ddd; text-align: right;">{summary['compressed']:,} bytes</td>
+                    <td style="padding: 5px; border: 1px solid #ddd; text-align: right;">{summary['uncompressed']:,} bytes <span style="color: #27ae60;">({ratio:.0f}%)</span></td>
+                    <td style="padding: 5px; border: 1px solid #ddd; text-align: right;">{summary['dictionary']:,} / {meta.num_row_groups:,}</td>
+                    <td style="padding: 5px; border: 1px solid #ddd; text-align: right;">{summary['nulls']:,}</td>
+                </tr>
+        """)
+
+    html.append("""
+            </table>
+        </div>
+
         <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
             📋 File Structure (Physical Layout)
         </h3>
 
         <div style="background-color: #fff; border-left: 4px solid #3498db; padding: 10px; margin: 20px 0;">
-    """
+    """)
 
     # 1. HEADER
-    html += """
+    html.append("""
         <div style="margin-bottom: 25px;">
             <h4 style="color: #16a085; margin: 10px 0;">
                 1️⃣ Header (Magic Number)
@@ -88,19 +191,21 @@ def inspect(file_path: Path) -> None:
                 </table>
             </div>
         </div>
-    """
+    """)
 
     # 2. ROW GROUPS (DATA BLOCKS)
-    html += """
+    html.append("""
         <div style="margin-bottom: 25px;">
             <h4 style="color: #16a085; margin: 10px 0;">
                 2️⃣ Row Groups (Data Blocks)
             </h4>
-    """
+    """)
 
-    current_offset = 4  # After header
+    if meta.num_row_groups > page_size:
+        html.append(_pager('row groups', page, page_size, meta.num_row_groups))
 
-    for rg_idx in range(meta.num_row_groups):
+    _, _, start, stop = _page_bounds(page, page_size, meta.num_row_groups)
+    for rg_idx in range(start, stop):
         rg = meta.row_group(rg_idx)
 
         # Find the start and end of this row group
@@ -136,7 +241,7 @@ def inspect(file_path: Path) -> None:
 
         rg_size = max_offset - min_offset
 
-        html += f"""
+        html.append(f"""
             <div style="margin-left: 20px; margin-bottom: 20px; background-color: #f0f8ff; padding: 15px; border-radius: 5px; border: 1px solid #b0d4f1;">
                 <h5 style="color: #2980b9; margin: 0 0 10px 0;">Row Group {rg_idx}</h5>
                 <table style="width: 100%; border-collapse: collapse; margin-bottom: 15px;">
@@ -164,17 +269,17 @@ def inspect(file_path: Path) -> None:
 
                 <details style="margin-top: 10px;">
                     <summary style="cursor: pointer; color: #2980b9; font-weight: bold; padding: 5px;">
-                        📊 Column Chunks ({rg.num_columns} columns)
+                        📊 Column Chunks ({rg.num_columns} columns{column_range})
                     </summary>
                     <div style="margin-top: 10px;">
-        """
+        """)
 
         # Column chunks
-        for col_idx in range(rg.num_columns):
+        for col_idx in range(first_column, stop_column):
             col = rg.column(col_idx)
             stats = col.statistics if col.is_stats_set else None
 
-            html += f"""
+            html.append(f"""
                         <div style="margin: 10px 0; padding: 10px; background-color: #fff; border-left: 3px solid #3498db; border-radius: 3px;">
                             <div style="font-weight: bold; color: #2c3e50; margin-bottom: 8px;">
                                 Column: <code style="background-color: #e8e8e8; padding: 2px 6px; border-radius: 3px;">{col.path_in_schema}</code>
@@ -192,18 +297,18 @@ def inspect(file_path: Path) -> None:
                                     <td style="padding: 3px;">Encodings:</td>
                                     <td style="padding: 3px;"><code>{', '.join(str(e) for e in col.encodings)}</code></td>
                                 </tr>
-            """
+            """)
 
             if col.has_dictionary_page:
                 dict_size = col.data_page_offset - col.dictionary_page_offset
-                html += f"""
+                html.append(f"""
                                 <tr>
                                     <td style="padding: 3px;">Dictionary Page:</td>
                                     <td style="padding: 3px;">Offset {col.dictionary_page_offset:,}, Size {dict_size:,} bytes</td>
                                 </tr>
-                """
+                """)
 
-            html += f"""
+            html.append(f"""
                                 <tr>
                                     <td style="padding: 3px;">Data Pages Start:</td>
                                     <td style="padding: 3px;">Offset {col.data_page_offset:,}</td>
@@ -222,10 +327,10 @@ def inspect(file_path: Path) -> None:
                                     <td style="padding: 3px;">Values:</td>
                                     <td style="padding: 3px;">{col.num_values:,}</td>
                                 </tr>
-            """
+            """)
 
             if stats and stats.has_min_max:
-                html += f"""
+                html.append(f"""
                                 <tr>
                                     <td style="padding: 3px;">Statistics:</td>
                                     <td style="padding: 3px;">
@@ -234,25 +339,25 @@ def inspect(file_path: Path) -> None:
                                         Nulls: {stats.null_count:,}
                                     </td>
                                 </tr>
-                """
+                """)
 
-            html += """
+            html.append("""
                             </table>
                         </div>
-            """
+            """)
 
-        html += """
+        html.append("""
                     </div>
                 </details>
             </div>
-        """
+        """)
 
-    html += """
+    html.append("""
         </div>
-    """
+    """)
 
     # 3. FILE METADATA
-    html += f"""
+    html.append(f"""
         <div style="margin-bottom: 25px;">
             <h4 style="color: #16a085; margin: 10px 0;">
                 3️⃣ File Metadata (Thrift Structure)
@@ -279,43 +384,43 @@ def inspect(file_path: Path) -> None:
 
                 <details style="margin-top: 15px;">
                     <summary style="cursor: pointer; color: #d68910; font-weight: bold; padding: 5px;">
-                        📐 Schema Details ({meta.num_columns} columns)
+                        📐 Schema Details ({meta.num_columns} columns{column_range})
                     </summary>
                     <div style="margin-top: 10px; max-height: 400px; overflow-y: auto;">
-    """
+    """)
 
     # Schema details
-    for i in range(meta.num_columns):
+    for i in range(first_column, stop_column):
         col_schema = pqfile.schema[i]
-        html += f"""
+        html.append(f"""
                         <div style="margin: 8px 0; padding: 8px; background-color: #fff; border-left: 3px solid #f39c12; border-radius: 3px;">
                             <code style="font-weight: bold; color: #2c3e50;">{col_schema.name}</code>
                             <div style="margin-top: 5px; font-size: 0.9em;">
                                 Physical: <code>{col_schema.physical_type}</code>
-        """
+        """)
 
         if col_schema.logical_type:
-            html += f" | Logical: <code>{col_schema.logical_type}</code>"
+            html.append(f" | Logical: <code>{col_schema.logical_type}</code>")
 
-        html += f"""
+        html.append(f"""
                                 <br>Precision: {col_schema.precision}, Scale: {col_schema.scale}, Length: {col_schema.length}
                                 <br>Max Definition Level: {col_schema.max_definition_level},
                                 Max Repetition Level: {col_schema.max_repetition_level}
                                 <br>Path in Schema: {col_schema.path}
                             </div>
                         </div>
-        """
+        """)
 
-    html += """
+    html.append("""
                     </div>
                 </details>
             </div>
         </div>
-    """
+    """)
 
     # 4. FOOTER
     footer_start = file_size - 8
-    html += f"""
+    html.append(f"""
         <div style="margin-bottom: 25px;">
             <h4 style="color: #16a085; margin: 10px 0;">
                 4️⃣ Footer
@@ -355,9 +460,9 @@ def inspect(file_path: Path) -> None:
                 </table>
             </div>
         </div>
-    """
+    """)
 
-    display(HTML(html))
+    display(HTML(''.join(html)))
 
 def calculate_sizes(parquet_file: pq.ParquetFile):
     metadata = parquet_file.metadata
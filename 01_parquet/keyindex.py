@@ -0,0 +1,190 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+FILES_METADATA_KEY = b'key_index.files'
+KEY_METADATA_KEY = b'key_index.key'
+
+
+def _key_values(table: pa.Table, key: str) -> pa.Array:
+    """Return a (possibly nested, dot-separated) key column, e.g. 'source_id' or 'source.value'."""
+    name, *fields = key.split('.')
+    values = table[name].combine_chunks()
+    for field in fields:
+        values = pc.struct_field(values, field)
+    return values
+
+
+def index_entries(path, key: str, filesystem=None) -> pa.Table:
+    """
+    Compute the index entries of one Parquet file: one entry per key and row group.
+
+    Rows of a key within a row group are covered by [row_start, row_stop). In a file sorted by the
+    key that range holds only rows of the key; otherwise it may include other keys.
+
+    Args:
+        path: Parquet file
+        key: Key column, e.g. 'source_id' (nested fields separated by '.')
+        filesystem: PyArrow filesystem of the path, e.g. pyarrow.fs.S3FileSystem (default: local)
+
+    Returns:
+        Arrow table with columns key, row_group, row_start, row_stop
+    """
+    parquet_file = pq.ParquetFile(str(path), filesystem=filesystem)
+    entries = []
+    for row_group in range(parquet_file.metadata.num_row_groups):
+        values = _key_values(parquet_file.read_row_group(row_group, columns=[key.split('.')[0]]), key)
+        rows = pa.table({'key': values, 'row': np.arange(len(values), dtype=np.int64)}).filter(pc.is_valid(values))
+        runs = rows.group_by('key').aggregate([('row', 'min'), ('row', 'max')])
+        entries.append(pa.table({
+            'key': runs['key'],
+            'row_group': pa.array(np.full(len(runs), row_group, dtype=np.int32)),
+            'row_start': runs['row_min'],
+            'row_stop': pc.add(runs['row_max'], 1),
+        }))
+    if not entries:
+        return pa.table({'key': pa.array([], pa.string()), 'row_group': pa.array([], pa.int32()),
+                         'row_start': pa.array([], pa.int64()), 'row_stop': pa.array([], pa.int64())})
+    return pa.concat_tables(entries)
+
+
+def build_key_index(files, key: str, output, filesystem=None, max_workers: int = 8, base=None) -> dict:
+    """
+    Build a sidecar index mapping each key to the (file, row group, row range) holding its rows.
+
+    The index is an Arrow IPC file sorted by key, so a lookup memory-maps it and binary-searches
+    instead of opening every file's footer. The file paths and the key are stored in the schema
+    metadata.
+
+    Args:
+        files: Parquet files, or a directory whose *.parquet files are indexed
+        key: Key column, e.g. 'source_id' (nested fields separated by '.')
+        output: Index file to write, e.g. 'radiator.keyindex.arrow'
+        filesystem: PyArrow filesystem of the Parquet files (default: local)
+        max_workers: Number of files read in parallel
+        base: Existing index file to extend, e.g. after new files were written (same key)
+
+    Returns:
+        Dictionary with number of files, entries and distinct keys, and the index size in bytes
+    """
+    if isinstance(files, (str, Path)) and Path(files).is_dir():
+        files = sorted(Path(files).glob('*.parquet'))
+    files = [str(f) for f in files]
+
+    tables, first_new = [], 0
+    if base is not None:
+        # The base table's buffers keep the memory map alive after the file is closed
+        with KeyIndex(base) as index:
+            if index.key != key:
+                raise ValueError(f"Index {base} is on '{index.key}', not '{key}'")
+            tables.append(index.table.replace_schema_metadata(None))
+            first_new = len(index.files)
+            files = index.files + [f for f in files if f not in set(index.files)]
+
+    def _entries(file_id):
+        entries = index_entries(files[file_id], key, filesystem)
+        return entries.add_column(1, 'file', pa.array(np.full(len(entries), file_id, dtype=np.int32)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        tables += list(executor.map(_entries, range(first_new, len(files))))
+    if not tables:
+        raise ValueError('No Parquet files to index')
+    table = pa.concat_tables(tables, promote_options='permissive')
+    table = table.sort_by([('key', 'ascending'), ('file', 'ascending'), ('row_group', 'ascending')]).combine_chunks()
+    table = table.replace_schema_metadata({FILES_METADATA_KEY: json.dumps(files).encode(), KEY_METADATA_KEY: key.encode()})
+
+    # Write to a temporary file first: a base index may still be memory-mapped
+    temporary = Path(f'{output}.tmp')
+    with pa.OSFile(str(temporary), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    temporary.replace(output)
+    return {'files': len(files), 'entries': table.num_rows, 'keys': pc.count_distinct(table['key']).as_py(),
+            'index_bytes': Path(output).stat().st_size}
+
+
+class KeyIndex:
+    """
+    Point lookups through a sidecar index written by build_key_index().
+
+    The index file is memory-mapped, so opening it costs the same for ten or ten thousand indexed
+    files, and a lookup is a binary search followed by reads of the matching row groups only.
+    """
+
+    def __init__(self, path, filesystem=None):
+        """
+        Args:
+            path: Index file written by build_key_index()
+            filesystem: PyArrow filesystem of the indexed Parquet files (default: local)
+        """
+        self.path = path
+        self.filesystem = filesystem
+        self._source = pa.memory_map(str(path))
+        self.table = pa.ipc.open_file(self._source).read_all()
+        metadata = self.table.schema.metadata
+        self.files = json.loads(metadata[FILES_METADATA_KEY])
+        self.key = metadata[KEY_METADATA_KEY].decode()
+        self._keys = self.table['key'].chunk(0) if self.table['key'].num_chunks == 1 else self.table['key'].combine_chunks()
+
+    def close(self) -> None:
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _bisect(self, value, right: bool) -> int:
+        lo, hi = 0, len(self._keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._keys[mid].as_py()
+            if current < value or (right and current == value):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def locate(self, value) -> list:
+        """
+        Return where the rows of a key are stored.
+
+        Returns:
+            List of dictionaries with file, row_group, row_start and row_stop, in file order
+        """
+        start, stop = self._bisect(value, right=False), self._bisect(value, right=True)
+        entries = self.table.slice(start, stop - start).to_pylist()
+        return [{'file': self.files[e['file']], 'row_group': e['row_group'], 'row_start': e['row_start'],
+                 'row_stop': e['row_stop']} for e in entries]
+
+    def read(self, value, columns=None) -> pa.Table:
+        """
+        Read the rows of one key, opening only the files and row groups that hold it.
+
+        Args:
+            value: Key value, e.g. '1822301'
+            columns: Columns to return (default: all)
+
+        Returns:
+            Arrow table with the rows whose key equals the value
+        """
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + [self.key.split('.')[0]]))
+        parts, opened = [], {}
+        for entry in self.locate(value):
+            if entry['file'] not in opened:
+                opened[entry['file']] = pq.ParquetFile(entry['file'], filesystem=self.filesystem)
+            row_group = opened[entry['file']].read_row_group(entry['row_group'], columns=read_columns)
+            row_group = row_group.slice(entry['row_start'], entry['row_stop'] - entry['row_start'])
+            # The row range may include other keys unless the file is sorted by the key
+            parts.append(row_group.filter(pc.equal(_key_values(row_group, self.key), value)))
+        if not parts:
+            parts = [pq.read_schema(self.files[0], filesystem=self.filesystem).empty_table()]
+        result = pa.concat_tables(parts, promote_options='permissive')
+        return result.select(list(columns)) if columns is not None else result
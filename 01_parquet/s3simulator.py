@@ -1,8 +1,27 @@
+import hashlib
+import mmap
+import os
+import shutil
 import threading
+import uuid
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
 import boto3
 from werkzeug.serving import make_server, WSGIRequestHandler
 from werkzeug.urls import uri_to_iri
+from werkzeug.wrappers import Request
 from moto.server import DomainDispatcherApplication, create_backend_app
+from tracing import span
+
+CHUNK_SIZE = 1024 * 1024
+OBJECT_SUFFIX = ".s3obj"  # keeps 'dir/' marker objects and 'dir/file' objects apart on disk
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+SOCKET_ENVIRON_KEY = "s3simulator.socket"
 
 
 class S3SimulatorRequestHandler(WSGIRequestHandler):
@@ -10,6 +29,19 @@ class S3SimulatorRequestHandler(WSGIRequestHandler):
 
     bucket_name = None
 
+    def handle_one_request(self):
+        """Handle a request, recorded as a span on the server thread when tracing is enabled."""
+        with span('s3.server_request', 'io') as request_span:
+            super().handle_one_request()
+            if getattr(self, 'command', None):
+                request_span.set(method=self.command, path=self.path, range=self.headers.get('Range'))
+
+    def make_environ(self):
+        """Expose the client socket, so DiskS3Application can send object bodies with sendfile."""
+        environ = super().make_environ()
+        environ[SOCKET_ENVIRON_KEY] = self.connection
+        return environ
+
     def log_request(self, code='-', size='-'):
         """Log S3 requests with range headers."""
         path = uri_to_iri(self.path)
@@ -19,12 +51,424 @@ class S3SimulatorRequestHandler(WSGIRequestHandler):
             print('📡 %06s [%24s] %s %s %s ' % (self.command, range_header, path, code, size))
 
 
+class S3Error(Exception):
+    """S3 error response."""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def _xml(root, *elements):
+    """Render an S3 XML response from (tag, value) pairs; values may be lists of pairs for nested elements."""
+    def render(tag, value):
+        if isinstance(value, list):
+            return f"<{tag}>" + "".join(render(*item) for item in value) + f"</{tag}>"
+        return f"<{tag}>{escape(str(value))}</{tag}>"
+    return (XML_HEADER + f'<{root} xmlns="{S3_NAMESPACE}">' + "".join(render(*e) for e in elements)
+            + f"</{root}>").encode()
+
+
+def _iso_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _aws_chunks(stream):
+    """Decode an aws-chunked request body ('<hex size>[;chunk-signature=...]\\r\\n<data>\\r\\n ... 0\\r\\n<trailers>')."""
+    while True:
+        size = int(stream.readline().split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            return
+        while size:
+            chunk = stream.read(min(size, CHUNK_SIZE))
+            if not chunk:
+                raise S3Error(400, "IncompleteBody", "Request body ended inside a chunk")
+            size -= len(chunk)
+            yield chunk
+        stream.readline()
+
+
+def _body_chunks(request):
+    if "aws-chunked" in request.headers.get("Content-Encoding", "") or \
+            request.headers.get("x-amz-content-sha256", "").startswith("STREAMING-"):
+        yield from _aws_chunks(request.stream)
+        return
+    while chunk := request.stream.read(CHUNK_SIZE):
+        yield chunk
+
+
+def _byte_range(header, size):
+    """Return [start, stop) of a 'bytes=a-b', 'bytes=a-' or 'bytes=-n' Range header, or None for the whole object."""
+    if not header or not header.startswith("bytes="):
+        return None
+    first, _, last = header[len("bytes="):].split(",")[0].strip().partition("-")
+    if first:
+        start, stop = int(first), min(int(last) + 1, size) if last else size
+    else:
+        start, stop = max(size - int(last), 0), size
+    if start >= size or start >= stop:
+        raise S3Error(416, "InvalidRange", "The requested range is not satisfiable")
+    return start, stop
+
+
+def _file_body(path, start, stop, connection=None):
+    """Stream a byte range of a file: with sendfile to the client socket if given, else from a memory map."""
+    if stop <= start:
+        return
+    with open(path, "rb") as f:
+        if connection is not None:
+            yield b""  # makes the server send the status line and headers first
+            connection.sendfile(f, start, stop - start)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for offset in range(start, stop, CHUNK_SIZE):
+                yield view[offset:min(offset + CHUNK_SIZE, stop)]
+
+
+def _append_file(source, target):
+    """Append a file to an open file, in the kernel where possible."""
+    with open(source, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not hasattr(os, "sendfile"):
+            shutil.copyfileobj(f, target, CHUNK_SIZE)
+            return
+        target.flush()
+        offset = 0
+        while offset < size:
+            offset += os.sendfile(target.fileno(), f.fileno(), offset, size - offset)
+        target.seek(0, os.SEEK_END)
+
+
+class DiskS3Application:
+    """
+    WSGI application implementing the S3 calls made by boto3, PyArrow, PyIceberg and Daft, with objects as files.
+
+    Object bodies never sit in memory: uploads and multipart parts are streamed to temporary
+    files and renamed into place, parts are concatenated in the kernel, and GETs (including
+    range GETs) are sent with sendfile, or from memory maps when the server doesn't expose
+    the client socket. Keys map to paths below <directory>/<bucket>/,
+    so a directory can be reused across runs. ETags and content types of objects written by
+    an earlier process are not kept; their ETag is derived from size and modification time.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.directory / ".tmp"
+        self._uploads_dir = self.directory / ".uploads"
+        self._tmp.mkdir(exist_ok=True)
+        self._uploads_dir.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._objects = {}  # path -> {'etag', 'content_type', 'metadata'}
+        self._uploads = {}  # upload id -> {'bucket', 'key', 'content_type', 'metadata', 'parts'}
+
+    # Storage
+
+    def _bucket(self, bucket, must_exist=True):
+        path = self.directory / bucket
+        if bucket.startswith(".") or "/" in bucket:
+            raise S3Error(400, "InvalidBucketName", f"Invalid bucket name {bucket}")
+        if must_exist and not path.is_dir():
+            raise S3Error(404, "NoSuchBucket", f"The bucket {bucket} does not exist")
+        return path
+
+    def _object(self, bucket, key):
+        if any(part in (".", "..") for part in key.split("/")):
+            raise S3Error(400, "InvalidArgument", f"Unsupported key {key}")
+        return self._bucket(bucket) / (key + OBJECT_SUFFIX)
+
+    def _info(self, path):
+        """Return size, modification time, ETag, content type and user metadata of a stored object."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise S3Error(404, "NoSuchKey", "The specified key does not exist.")
+        with self._lock:
+            info = self._objects.get(path, {})
+        etag = info.get("etag") or '"%s"' % hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "etag": etag,
+                "content_type": info.get("content_type", "binary/octet-stream"), "metadata": info.get("metadata", {})}
+
+    def _receive(self, request, target):
+        """Stream the request body to a temporary file, then move it to target. Returns the quoted MD5 ETag."""
+        temporary = self._tmp / uuid.uuid4().hex
+        md5 = hashlib.md5()
+        try:
+            with open(temporary, "wb") as f:
+                for chunk in _body_chunks(request):
+                    md5.update(chunk)
+                    f.write(chunk)
+            self._place(temporary, target)
+        finally:
+            temporary.unlink(missing_ok=True)
+        return f'"{md5.hexdigest()}"'
+
+    def _place(self, temporary, target, attempts=3):
+        """Move a temporary file to target, creating the parent directories."""
+        for attempt in range(attempts):
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temporary, target)
+                return
+            except FileNotFoundError:
+                # A concurrent DELETE pruned the (still empty) parent directory again
+                if attempt == attempts - 1:
+                    raise
+
+    def _store(self, path, etag, content_type, metadata):
+        with self._lock:
+            self._objects[path] = {"etag": etag, "content_type": content_type, "metadata": metadata}
+
+    def _remove(self, bucket, path):
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self._objects.pop(path, None)
+        bucket_path = self._bucket(bucket)
+        parent = path.parent
+        while parent != bucket_path:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+
+    def _keys(self, bucket, prefix):
+        """Return the sorted keys starting with prefix."""
+        bucket_path = self._bucket(bucket)
+        base = bucket_path / prefix.rpartition("/")[0]
+        keys = []
+        for root, _, files in os.walk(base):
+            for name in files:
+                if name.endswith(OBJECT_SUFFIX):
+                    key = (Path(root) / name).relative_to(bucket_path).as_posix()[:-len(OBJECT_SUFFIX)]
+                    if key.startswith(prefix):
+                        keys.append(key)
+        return sorted(keys, key=lambda k: k.encode())
+
+    # Requests
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        bucket, _, key = request.path.lstrip("/").partition("/")
+        try:
+            status, headers, body = self._dispatch(request, bucket, key)
+        except S3Error as e:
+            status, headers = e.status, [("Content-Type", "application/xml")]
+            body = [] if request.method == "HEAD" else [
+                (XML_HEADER + f"<Error><Code>{e.code}</Code><Message>{escape(str(e))}</Message>"
+                 f"<Resource>{escape(request.path)}</Resource></Error>").encode()]
+        if isinstance(body, bytes):
+            headers.append(("Content-Type", "application/xml"))
+            headers.append(("Content-Length", str(len(body))))
+            body = [body]
+        reasons = {200: "OK", 204: "No Content", 206: "Partial Content", 400: "Bad Request", 404: "Not Found",
+                   409: "Conflict", 416: "Range Not Satisfiable", 501: "Not Implemented"}
+        start_response(f"{status} {reasons.get(status, '')}", headers)
+        return body
+
+    def _dispatch(self, request, bucket, key):
+        method, args = request.method, request.args
+        if not bucket:
+            names = sorted(p.name for p in self.directory.iterdir() if p.is_dir() and not p.name.startswith("."))
+            return 200, [], _xml("ListAllMyBucketsResult", ("Buckets", [
+                ("Bucket", [("Name", name), ("CreationDate", _iso_time((self.directory / name).stat().st_ctime))])
+                for name in names]))
+        if not key:
+            if method == "PUT":
+                self._bucket(bucket, must_exist=False).mkdir(exist_ok=True)
+                return 200, [("Location", f"/{bucket}")], []
+            if method == "HEAD":
+                self._bucket(bucket)
+                return 200, [], []
+            if method == "DELETE":
+                try:
+                    self._bucket(bucket).rmdir()
+                except OSError:
+                    raise S3Error(409, "BucketNotEmpty", "The bucket you tried to delete is not empty")
+                return 204, [], []
+            if method == "POST" and "delete" in args:
+                return self._delete_objects(request, bucket)
+            if method == "GET" and "location" in args:
+                self._bucket(bucket)
+                return 200, [], _xml("LocationConstraint")
+            if method == "GET" and not set(args) - {"list-type", "prefix", "delimiter", "max-keys", "marker",
+                                                       "continuation-token", "start-after", "encoding-type",
+                                                       "fetch-owner"}:
+                return self._list_objects(request, bucket)
+        elif method == "PUT" and "uploadId" in args:
+            return self._upload_part(request, args["uploadId"], int(args["partNumber"]))
+        elif method == "PUT" and "x-amz-copy-source" in request.headers:
+            return self._copy_object(request, bucket, key)
+        elif method == "PUT":
+            path = self._object(bucket, key)
+            etag = self._receive(request, path)
+            self._store(path, etag, request.headers.get("Content-Type", "binary/octet-stream"), self._user_metadata(request))
+            return 200, [("ETag", etag)], []
+        elif method in ("GET", "HEAD"):
+            return self._get_object(request, bucket, key)
+        elif method == "DELETE" and "uploadId" in args:
+            self._pop_upload(args["uploadId"])
+            return 204, [], []
+        elif method == "DELETE":
+            self._remove(bucket, self._object(bucket, key))
+            return 204, [], []
+        elif method == "POST" and "uploads" in args:
+            return self._create_upload(request, bucket, key)
+        elif method == "POST" and "uploadId" in args:
+            return self._complete_upload(request, bucket, key, args["uploadId"])
+        raise S3Error(501, "NotImplemented", f"{method} {request.full_path} is not supported by the simulator")
+
+    @staticmethod
+    def _user_metadata(request):
+        return {name.lower(): value for name, value in request.headers.items() if name.lower().startswith("x-amz-meta-")}
+
+    def _get_object(self, request, bucket, key):
+        path = self._object(bucket, key)
+        info = self._info(path)
+        byte_range = _byte_range(request.headers.get("Range"), info["size"])
+        start, stop = byte_range or (0, info["size"])
+        headers = [("Content-Type", info["content_type"]), ("Content-Length", str(stop - start)),
+                   ("ETag", info["etag"]), ("Last-Modified", formatdate(info["mtime"], usegmt=True)),
+                   ("Accept-Ranges", "bytes"), *info["metadata"].items()]
+        if byte_range:
+            headers.append(("Content-Range", f"bytes {start}-{stop - 1}/{info['size']}"))
+        body = [] if request.method == "HEAD" else _file_body(path, start, stop, request.environ.get(SOCKET_ENVIRON_KEY))
+        return (206 if byte_range else 200), headers, body
+
+    def _list_objects(self, request, bucket):
+        args = request.args
+        v2 = args.get("list-type") == "2"
+        prefix, delimiter = args.get("prefix", ""), args.get("delimiter", "")
+        max_keys = int(args.get("max-keys", 1000))
+        after = args.get("continuation-token") or args.get("start-after", "") if v2 else args.get("marker", "")
+        encode = (lambda k: quote(k, safe="/")) if args.get("encoding-type") == "url" else (lambda k: k)
+
+        entries, prefixes = [], set()
+        for key in self._keys(bucket, prefix):
+            if delimiter and delimiter in key[len(prefix):]:
+                common = key[:len(prefix) + key[len(prefix):].index(delimiter) + len(delimiter)]
+                if common not in prefixes:
+                    prefixes.add(common)
+                    entries.append((common, None))
+            else:
+                entries.append((key, key))
+        entries = [e for e in entries if e[0] > after]
+        truncated = len(entries) > max_keys
+        entries = entries[:max_keys]
+
+        bucket_path = self._bucket(bucket)
+        elements = [("Name", bucket), ("Prefix", encode(prefix)), ("MaxKeys", max_keys), ("IsTruncated", str(truncated).lower())]
+        if delimiter:
+            elements.append(("Delimiter", encode(delimiter)))
+        if args.get("encoding-type") == "url":
+            elements.append(("EncodingType", "url"))
+        if v2:
+            elements.append(("KeyCount", len(entries)))
+        if truncated:
+            elements.append(("NextContinuationToken", entries[-1][0]) if v2 else ("NextMarker", encode(entries[-1][0])))
+        for name, key in entries:
+            if key is None:
+                elements.append(("CommonPrefixes", [("Prefix", encode(name))]))
+            else:
+                info = self._info(bucket_path / (key + OBJECT_SUFFIX))
+                elements.append(("Contents", [("Key", encode(key)), ("LastModified", _iso_time(info["mtime"])),
+                                              ("ETag", info["etag"]), ("Size", info["size"]),
+                                              ("StorageClass", "STANDARD")]))
+        return 200, [], _xml("ListBucketResult", *elements)
+
+    def _delete_objects(self, request, bucket):
+        document = ElementTree.fromstring(request.get_data())
+        keys = [element.text for element in document.iter() if element.tag.rpartition("}")[2] == "Key"]
+        for key in keys:
+            self._remove(bucket, self._object(bucket, key))
+        quiet = any(e.tag.rpartition("}")[2] == "Quiet" and e.text == "true" for e in document.iter())
+        return 200, [], _xml("DeleteResult", *([] if quiet else [("Deleted", [("Key", key)]) for key in keys]))
+
+    def _copy_object(self, request, bucket, key):
+        source_bucket, _, source_key = unquote(request.headers["x-amz-copy-source"].split("?")[0]).lstrip("/").partition("/")
+        source = self._object(source_bucket, source_key)
+        info = self._info(source)
+        target = self._object(bucket, key)
+        temporary = self._tmp / uuid.uuid4().hex
+        shutil.copyfile(source, temporary)
+        self._place(temporary, target)
+        if request.headers.get("x-amz-metadata-directive") == "REPLACE":
+            self._store(target, info["etag"], request.headers.get("Content-Type", "binary/octet-stream"),
+                        self._user_metadata(request))
+        else:
+            self._store(target, info["etag"], info["content_type"], info["metadata"])
+        return 200, [], _xml("CopyObjectResult", ("LastModified", _iso_time(target.stat().st_mtime)), ("ETag", info["etag"]))
+
+    def _create_upload(self, request, bucket, key):
+        self._object(bucket, key)
+        upload_id = uuid.uuid4().hex
+        (self._uploads_dir / upload_id).mkdir()
+        with self._lock:
+            self._uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {},
+                                        "content_type": request.headers.get("Content-Type", "binary/octet-stream"),
+                                        "metadata": self._user_metadata(request)}
+        return 200, [], _xml("InitiateMultipartUploadResult", ("Bucket", bucket), ("Key", key), ("UploadId", upload_id))
+
+    def _upload(self, upload_id):
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise S3Error(404, "NoSuchUpload", "The specified multipart upload does not exist.")
+        return upload
+
+    def _pop_upload(self, upload_id):
+        self._upload(upload_id)
+        with self._lock:
+            upload = self._uploads.pop(upload_id)
+        shutil.rmtree(self._uploads_dir / upload_id, ignore_errors=True)
+        return upload
+
+    def _upload_part(self, request, upload_id, part_number):
+        upload = self._upload(upload_id)
+        etag = self._receive(request, self._uploads_dir / upload_id / f"{part_number:05d}")
+        with self._lock:
+            upload["parts"][part_number] = etag
+        return 200, [("ETag", etag)], []
+
+    def _complete_upload(self, request, bucket, key, upload_id):
+        upload = self._upload(upload_id)
+        document = ElementTree.fromstring(request.get_data())
+        numbers = [int(e.text) for e in document.iter() if e.tag.rpartition("}")[2] == "PartNumber"]
+        missing = [n for n in numbers if n not in upload["parts"]]
+        if missing:
+            raise S3Error(400, "InvalidPart", f"Parts {missing} were not uploaded")
+
+        path = self._object(bucket, key)
+        temporary = self._tmp / uuid.uuid4().hex
+        try:
+            with open(temporary, "wb") as target:
+                for number in numbers:
+                    _append_file(self._uploads_dir / upload_id / f"{number:05d}", target)
+            self._place(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        digests = b"".join(bytes.fromhex(upload["parts"][n].strip('"')) for n in numbers)
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(numbers)}"'
+        self._store(path, etag, upload["content_type"], upload["metadata"])
+        self._pop_upload(upload_id)
+        return 200, [], _xml("CompleteMultipartUploadResult", ("Location", f"/{bucket}/{key}"), ("Bucket", bucket),
+                             ("Key", key), ("ETag", etag))
+
+
 class S3Simulator:
-    """Simulates an S3 object store using moto for testing purposes."""
+    """
+    Simulates an S3 object store for testing purposes.
+
+    By default objects live in moto's in-memory backend. With storage_dir, objects are stored as
+    files by DiskS3Application and requests are served by concurrent threads, so multi-GB
+    datasets can be written and read without holding them in memory.
+    """
 
-    def __init__(self, bucket_name="data-lake", port=5000):
+    def __init__(self, bucket_name="data-lake", port=5000, storage_dir=None):
         self.bucket_name = bucket_name
         self.port = port
+        self.storage_dir = storage_dir
         self.server = None
         self.thread = None
 
@@ -37,13 +481,17 @@ class S3Simulator:
         S3SimulatorRequestHandler.bucket_name = self.bucket_name
 
         # Create the WSGI application
-        app = DomainDispatcherApplication(create_backend_app)
+        if self.storage_dir is None:
+            app = DomainDispatcherApplication(create_backend_app)
+        else:
+            app = DiskS3Application(self.storage_dir)
 
         # Create and start the server
         self.server = make_server(
             "127.0.0.1",
             self.port,
             app,
+            threaded=self.storage_dir is not None,
             request_handler=S3SimulatorRequestHandler
         )
 
@@ -60,7 +508,8 @@ class S3Simulator:
             region_name="us-east-1"
         )
         s3.create_bucket(Bucket=self.bucket_name)
-        print(f"S3 Server running on port {self.port}")
+        storage = f"objects in {self.storage_dir}" if self.storage_dir is not None else "objects in memory"
+        print(f"S3 Server running on port {self.port} ({storage})")
 
     def stop(self):
         """Stop the S3 simulator server."""
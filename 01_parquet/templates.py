@@ -0,0 +1,212 @@
+import json
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Variable parts of a message: UUIDs and runs of digits. Everything else is template text.
+DEFAULT_VARIABLE_PATTERN = r'[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}|\d+'
+PLACEHOLDER = '\x1f'  # stands for a parameter in a template; messages containing it are never templated
+CANONICAL_INT_PATTERN = r'^(?:0|[1-9]\d{0,17})$'  # round-trips exactly through int64
+DEFAULT_MAX_TEMPLATES = 100
+METADATA_KEY = 'log_templates.{column}'
+
+
+def learn_templates(values, variable_pattern: str = DEFAULT_VARIABLE_PATTERN, min_count: int = 2,
+                    max_templates: int = DEFAULT_MAX_TEMPLATES) -> dict:
+    """
+    Learn message templates from a sample of a free-text column.
+
+    A template is a message with every variable part (see variable_pattern) replaced by a
+    parameter. Each parameter of each template gets its own column; it is typed int64 if it only
+    held canonical integers (no sign or leading zeros) in the sample, else string.
+
+    Args:
+        values: Arrow array or chunked array of strings, e.g. a sample of the 'text' column
+        variable_pattern: RE2 regular expression matching the variable parts of a message
+        min_count: Minimum number of sampled messages per template
+        max_templates: Maximum number of templates (each adds columns), most frequent first
+
+    Returns:
+        Template model (JSON serializable): pattern, and templates with counts and parameter types;
+        'template' shows parameters as <*>, 'literals' holds the text between them
+    """
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    values = values.filter(pc.invert(pc.match_substring(values, PLACEHOLDER)))
+    masked = pc.replace_substring_regex(values, variable_pattern, PLACEHOLDER)
+    counts = pc.value_counts(masked)
+    counts = counts.filter(pc.and_(pc.is_valid(counts.field('values')), pc.greater_equal(counts.field('counts'), min_count)))
+    counts = counts.take(pc.array_sort_indices(counts.field('counts'), order='descending')[:max_templates])
+    templates = counts.field('values').to_pylist()
+
+    ids = pc.index_in(masked, value_set=pa.array(templates, pa.string()))
+    model = {'pattern': variable_pattern, 'templates': []}
+    for template_id, (template, count) in enumerate(zip(templates, counts.field('counts').to_pylist())):
+        types = []
+        if PLACEHOLDER in template:
+            parameters = pc.extract_regex(values.filter(pc.equal(ids, template_id)), _template_regex(template, variable_pattern))
+            types = ['int64' if pc.all(pc.match_substring_regex(parameters.field(f'p{slot}'), CANONICAL_INT_PATTERN)).as_py()
+                     else 'string' for slot in range(template.count(PLACEHOLDER))]
+        model['templates'].append({'id': template_id, 'template': template.replace(PLACEHOLDER, '<*>'),
+                                   'literals': template.split(PLACEHOLDER), 'count': count, 'types': types})
+    return model
+
+
+def _template_regex(template: str, variable_pattern: str) -> str:
+    """Return an anchored regex with one named group (p0, p1, ...) per parameter of a template."""
+    literals = template.split(PLACEHOLDER)
+    regex = re.escape(literals[0])
+    for slot, literal in enumerate(literals[1:]):
+        regex += f'(?P<p{slot}>{variable_pattern}){re.escape(literal)}'
+    return f'^{regex}$'
+
+
+def _templates(model: dict) -> list:
+    # Not from 'template': a message may contain '<*>' itself
+    return [PLACEHOLDER.join(t['literals']) for t in model['templates']]
+
+
+def _parameter_columns(column: str, model: dict) -> list:
+    """Return (template id, parameter name, Arrow type) of every parameter column, in column order."""
+    return [(t['id'], f"{column}_{t['id']}_p{slot}", pa.int64() if data_type == 'int64' else pa.string())
+            for t in model['templates'] for slot, data_type in enumerate(t['types'])]
+
+
+def _rows(ids: pa.Array, template_id: int) -> np.ndarray:
+    return np.flatnonzero(pc.fill_null(pc.equal(ids, template_id), False).to_numpy(zero_copy_only=False))
+
+
+def _scatter(length: int, indices: np.ndarray, values: pa.Array) -> pa.Array:
+    """Return an array of the given length holding values at the (ascending) row indices, null elsewhere."""
+    if not len(indices):
+        return pa.nulls(length, values.type)
+    mask = np.zeros(length, dtype=bool)
+    mask[indices] = True
+    return pc.replace_with_mask(pa.nulls(length, values.type), pa.array(mask), values)
+
+
+def _reconstruct(ids: pa.Array, parameters: dict, residual: pa.Array, model: dict) -> pa.Array:
+    """Rebuild the messages from template ids, parameter columns (by name) and the residual column."""
+    messages = residual.cast(pa.string())
+    column_names = iter(parameters)
+    for template_id, template in enumerate(_templates(model)):
+        literals = template.split(PLACEHOLDER)
+        names = [next(column_names) for _ in literals[1:]]
+        indices = _rows(ids, template_id)
+        if not len(indices):
+            continue
+        parts = [literals[0]]
+        for name, literal in zip(names, literals[1:]):
+            parts += [parameters[name].take(indices).cast(pa.string()), literal]
+        if len(parts) == 1:
+            rebuilt = pa.array([parts[0]] * len(indices), pa.string())
+        else:
+            rebuilt = pc.binary_join_element_wise(*parts, '')
+        messages = pc.coalesce(messages, _scatter(len(ids), indices, rebuilt))
+    return messages
+
+
+def encode_templates(table: pa.Table, column: str, model: dict, verify: bool = True) -> pa.Table:
+    """
+    Replace a free-text column by a template id, typed parameter columns and a residual column.
+
+    The new columns are <column>_template (int32, null if no template matched), one column
+    <column>_<template id>_p<n> per template parameter (null in rows of other templates) and
+    <column>_residual (the original message where no template matched, else null). The model is stored in the schema metadata, so
+    decode_templates() can restore the column from the written file alone.
+
+    Args:
+        table: Arrow table
+        column: Name of the free-text column
+        model: Template model from learn_templates()
+        verify: Decode again and keep the original message wherever reconstruction is not exact
+
+    Returns:
+        Arrow table with the column replaced
+    """
+    values = table[column].combine_chunks()
+    values = values.cast(pa.string()) if values.type != pa.string() else values
+    pattern = model['pattern']
+    templates = _templates(model)
+
+    masked = pc.replace_substring_regex(values, pattern, PLACEHOLDER)
+    ids = pc.index_in(masked, value_set=pa.array(templates, pa.string()))
+    ids = pc.if_else(pc.match_substring(values, PLACEHOLDER), pa.scalar(None, pa.int32()), ids)
+
+    parameters = {}
+    rejected = np.zeros(len(values), dtype=bool)
+    columns = iter(_parameter_columns(column, model))
+    for template_id, template in enumerate(templates):
+        slots = [next(columns) for _ in range(template.count(PLACEHOLDER))]
+        indices = _rows(ids, template_id)
+        if not slots:
+            continue
+        extracted = pc.extract_regex(values.take(indices), _template_regex(template, pattern))
+        valid = pa.array(np.ones(len(indices), dtype=bool))
+        for slot, (_, name, data_type) in enumerate(slots):
+            if data_type == pa.int64():
+                valid = pc.and_(valid, pc.match_substring_regex(extracted.field(f'p{slot}'), CANONICAL_INT_PATTERN))
+        # Parameters that don't fit their column type leave the message untemplated
+        valid_mask = valid.to_numpy(zero_copy_only=False)
+        rejected[indices[~valid_mask]] = True
+        for slot, (_, name, data_type) in enumerate(slots):
+            parameters[name] = _scatter(len(values), indices[valid_mask],
+                                        extracted.field(f'p{slot}').filter(valid).cast(data_type))
+
+    if rejected.any():
+        ids = pc.if_else(pa.array(rejected), pa.scalar(None, pa.int32()), ids)
+    residual = pc.if_else(pc.is_null(ids), values, pa.scalar(None, pa.string()))
+
+    if verify:
+        mismatch = pc.fill_null(pc.not_equal(_reconstruct(ids, parameters, residual, model), values), True)
+        mismatch = pc.and_(mismatch, pc.is_valid(values))
+        if pc.any(mismatch).as_py():
+            ids = pc.if_else(mismatch, pa.scalar(None, pa.int32()), ids)
+            parameters = {name: pc.if_else(mismatch, pa.scalar(None, p.type), p) for name, p in parameters.items()}
+            residual = pc.if_else(pc.is_null(ids), values, pa.scalar(None, pa.string()))
+
+    position = table.column_names.index(column)
+    table = table.remove_column(position)
+    new_columns = [(f'{column}_template', ids.cast(pa.int32()))] \
+        + list(parameters.items()) \
+        + [(f'{column}_residual', residual)]
+    for offset, (name, array) in enumerate(new_columns):
+        table = table.add_column(position + offset, name, array)
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY.format(column=column).encode()] = json.dumps(model).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def decode_templates(table: pa.Table, column: str, model: dict = None) -> pa.Table:
+    """
+    Restore a column replaced by encode_templates(), exactly as it was.
+
+    Args:
+        table: Arrow table, e.g. read from a Parquet file written after encode_templates()
+        column: Name of the original column
+        model: Template model (default: read from the schema metadata)
+
+    Returns:
+        Arrow table with the template, parameter and residual columns replaced by the original column
+    """
+    if model is None:
+        model = json.loads(table.schema.metadata[METADATA_KEY.format(column=column).encode()])
+    ids = table[f'{column}_template'].combine_chunks()
+    parameters = {name: table[name].combine_chunks() for _, name, _ in _parameter_columns(column, model)}
+    values = _reconstruct(ids, parameters, table[f'{column}_residual'].combine_chunks(), model)
+
+    position = table.column_names.index(f'{column}_template')
+    table = table.drop_columns([f'{column}_template', f'{column}_residual'] + list(parameters))
+    return table.add_column(position, column, values)
+
+
+def template_report(table: pa.Table, column: str, model: dict = None) -> list:
+    """Return the templates of an encoded column with the number of rows each one matched, most frequent first."""
+    if model is None:
+        model = json.loads(table.schema.metadata[METADATA_KEY.format(column=column).encode()])
+    counts = pc.value_counts(table[f'{column}_template'].combine_chunks()).to_pylist()
+    rows = {c['values']: c['counts'] for c in counts}
+    report = [{'template': t['template'], 'rows': rows.get(t['id'], 0)} for t in model['templates']]
+    report.append({'template': '(no template)', 'rows': rows.get(None, 0)})
+    return sorted(report, key=lambda r: -r['rows'])
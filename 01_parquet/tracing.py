@@ -0,0 +1,282 @@
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+import pandas as pd
+
+MAX_SPANS = 1_000_000  # spans beyond this are counted as dropped instead of recorded
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_spans = []
+_dropped = 0
+_patched = {}
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start', 'children')
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.children = 0
+
+    def set(self, **args) -> None:
+        """Attach values known only inside the span, e.g. the number of bytes written."""
+        self.args.update(args)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _dropped
+        duration = time.perf_counter_ns() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        thread = threading.current_thread()
+        with _lock:
+            if len(_spans) < MAX_SPANS:
+                _spans.append((self.name, self.category, self.start, duration, duration - self.children,
+                               thread.ident, thread.name, self.args))
+            else:
+                _dropped += 1
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **args) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, category: str = 'app', **args):
+    """
+    Return a context manager that records the time spent in a block. Spans nest per thread.
+
+    When tracing is disabled, a shared no-op object is returned, so instrumented code costs one
+    global lookup and a function call.
+
+    Args:
+        name: Phase name, e.g. 'parquet.write'
+        category: Group of the phase, e.g. 'io' or 'metadata'
+        **args: Values shown with the span in the trace viewer
+    """
+    if not _enabled:
+        return _NOOP
+    return _Span(name, category, args)
+
+
+def traced(name: str = None, category: str = 'app'):
+    """Decorator recording each call of a function as a span (named after the function by default)."""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Forget all recorded spans."""
+    global _dropped
+    with _lock:
+        _spans.clear()
+        _dropped = 0
+
+
+@contextmanager
+def recording():
+    """Record spans of the enclosed block only: resets, enables, and disables tracing afterwards."""
+    reset()
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+# (module, attribute, span name, category) of library calls wrapped by instrument()
+INSTRUMENTED_CALLS = [
+    ('pyarrow.json', 'read_json', 'json.parse', 'parse'),
+    ('pyarrow.parquet', 'write_table', 'parquet.write', 'write'),
+    ('pyarrow.parquet', 'ParquetWriter.write_table', 'parquet.write_row_group', 'write'),
+    ('pyarrow.parquet', 'read_metadata', 'parquet.footer', 'metadata'),
+    ('pyarrow.parquet', 'ParquetFile.__init__', 'parquet.footer', 'metadata'),
+    ('pyarrow.parquet', 'read_table', 'parquet.read', 'read'),
+    ('pyiceberg.io.pyarrow', 'write_file', 'iceberg.write_data_files', 'write'),
+    ('pyiceberg.table.snapshots', 'Snapshot.manifests', 'manifest_list.decode', 'metadata'),
+    ('pyiceberg.manifest', 'ManifestFile.fetch_manifest_entry', 'manifest.decode', 'metadata'),
+    ('pyiceberg.table', 'DataScan.plan_files', 'scan.plan', 'planning'),
+    ('pyiceberg.catalog.sql', 'SqlCatalog.load_table', 'catalog.load', 'catalog'),
+    ('pyiceberg.catalog.sql', 'SqlCatalog.commit_table', 'catalog.commit', 'catalog'),
+    ('botocore.client', 'BaseClient._make_api_call', 's3.request', 'io'),
+]
+
+
+def _wrap(fn, name: str, category: str):
+    if name == 's3.request':
+        # botocore: _make_api_call(self, operation_name, api_params)
+        def wrapper(self, operation_name, api_params):
+            if not _enabled:
+                return fn(self, operation_name, api_params)
+            with _Span(name, category, {'operation': operation_name, 'bucket': api_params.get('Bucket'),
+                                        'key': api_params.get('Key', api_params.get('Prefix'))}):
+                return fn(self, operation_name, api_params)
+    else:
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, category, {}):
+                return fn(*args, **kwargs)
+    return functools.wraps(fn)(wrapper)
+
+
+def instrument(calls=None) -> list:
+    """
+    Wrap library entry points (JSON parsing, Parquet reads and writes, manifest decoding,
+    catalog commits, boto3 S3 requests) in spans. Modules that are not installed are skipped.
+
+    Functions imported by name before instrument() ran (from module import fn) keep the
+    unwrapped version; call it before such imports, or import the module instead.
+
+    Args:
+        calls: List of (module, attribute, span name, category) (default: INSTRUMENTED_CALLS)
+
+    Returns:
+        List of 'module.attribute' names that were wrapped
+    """
+    wrapped = []
+    for module_name, attribute, name, category in calls or INSTRUMENTED_CALLS:
+        key = f'{module_name}.{attribute}'
+        if key in _patched:
+            continue
+        try:
+            owner = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        *path, leaf = attribute.split('.')
+        for part in path:
+            owner = getattr(owner, part)
+        original = getattr(owner, leaf)
+        setattr(owner, leaf, _wrap(original, name, category))
+        _patched[key] = (owner, leaf, original)
+        wrapped.append(key)
+    return wrapped
+
+
+def uninstrument() -> None:
+    """Restore all library functions wrapped by instrument()."""
+    for owner, leaf, original in _patched.values():
+        setattr(owner, leaf, original)
+    _patched.clear()
+
+
+def spans() -> list:
+    """Return the recorded spans as dictionaries, in order of completion."""
+    with _lock:
+        recorded = list(_spans)
+    return [
+        {'name': name, 'category': category, 'start_ns': start, 'duration_ns': duration, 'self_ns': self_ns,
+         'thread_id': thread_id, 'thread': thread, 'args': args}
+        for name, category, start, duration, self_ns, thread_id, thread, args in recorded
+    ]
+
+
+def export_chrome_trace(path) -> int:
+    """
+    Write the recorded spans as Chrome trace event JSON, viewable in Perfetto (ui.perfetto.dev) or chrome://tracing.
+
+    Args:
+        path: Output file, e.g. 'trace.json'
+
+    Returns:
+        Number of spans written
+    """
+    recorded = spans()
+    origin = min((s['start_ns'] for s in recorded), default=0)
+    pid = os.getpid()
+    events = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id, 'args': {'name': thread}}
+        for thread_id, thread in {s['thread_id']: s['thread'] for s in recorded}.items()
+    ]
+    events += [
+        {'name': s['name'], 'cat': s['category'], 'ph': 'X', 'pid': pid, 'tid': s['thread_id'],
+         'ts': (s['start_ns'] - origin) / 1000, 'dur': s['duration_ns'] / 1000, 'args': s['args']}
+        for s in recorded
+    ]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+    return len(recorded)
+
+
+def summary() -> pd.DataFrame:
+    """
+    Aggregate the recorded spans per phase.
+
+    Returns:
+        DataFrame with one row per span name: calls, total and self time (excluding nested
+        spans), mean, p95 and max duration in milliseconds, slowest phase first
+    """
+    columns = ['name', 'category', 'calls', 'total_ms', 'self_ms', 'mean_ms', 'p95_ms', 'max_ms']
+    recorded = pd.DataFrame(spans(), columns=['name', 'category', 'duration_ns', 'self_ns'])
+    if _dropped:
+        warnings.warn(f"{_dropped:,} spans were dropped (more than {MAX_SPANS:,} recorded)")
+    if recorded.empty:
+        return pd.DataFrame(columns=columns)
+    recorded['duration_ms'] = recorded['duration_ns'] / 1e6
+    recorded['self_ms'] = recorded['self_ns'] / 1e6
+    result = recorded.groupby(['name', 'category']).agg(
+        calls=('duration_ms', 'size'),
+        total_ms=('duration_ms', 'sum'),
+        self_ms=('self_ms', 'sum'),
+        mean_ms=('duration_ms', 'mean'),
+        p95_ms=('duration_ms', lambda s: s.quantile(0.95)),
+        max_ms=('duration_ms', 'max'),
+    ).reset_index()
+    return result.sort_values('total_ms', ascending=False, ignore_index=True)[columns]
@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import OrderedDict
+from statistics import mean, quantiles
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from pyiceberg.catalog import Catalog, MetastoreCatalog
+from pyiceberg.catalog.sql import SqlCatalog
+from pyiceberg.exceptions import CommitFailedException, NoSuchPropertyException
+from pyiceberg.table import Table
+
+DEFAULT_BUSY_TIMEOUT_MS = 30_000
+DEFAULT_POOL_SIZE = 8
+DEFAULT_METADATA_CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_engines = {}
+_catalogs = {}
+
+
+def _create_engine(uri: str, busy_timeout_ms: int, pool_size: int):
+    if not uri.startswith('sqlite'):
+        return create_engine(uri, pool_size=pool_size, pool_pre_ping=True)
+
+    # The sqlite3 driver has its own busy handler (timeout in seconds); both are set
+    # so a writer waits for the lock instead of failing with "database is locked".
+    engine = create_engine(
+        uri,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        connect_args={'timeout': busy_timeout_ms / 1000, 'check_same_thread': False},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers (load_table) proceed while a writer commits, and
+        # synchronous=NORMAL is durable in WAL mode while avoiding an fsync per commit.
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.close()
+
+    return engine
+
+
+def shared_engine(uri: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS, pool_size: int = DEFAULT_POOL_SIZE):
+    """
+    Return the process-wide SQLAlchemy engine (and connection pool) for a catalog URI.
+
+    Engines are shared per (uri, busy_timeout_ms, pool_size), so callers asking for different
+    settings get their own engine instead of silently reusing the first caller's.
+
+    Args:
+        uri: SQLAlchemy connection URI, e.g. 'sqlite:///catalog.db'
+        busy_timeout_ms: How long SQLite connections wait for a lock before failing
+        pool_size: Number of pooled connections kept open
+    """
+    key = (uri, int(busy_timeout_ms), int(pool_size))
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(uri, busy_timeout_ms, pool_size)
+            _engines[key] = engine
+        return engine
+
+
+class PooledSqlCatalog(SqlCatalog):
+    """SqlCatalog that shares one engine per URI and caches parsed table metadata."""
+
+    def __init__(self, name: str, **properties: str):
+        # Skip SqlCatalog.__init__, which would create a private engine per instance.
+        MetastoreCatalog.__init__(self, name, **properties)
+
+        if not (uri := self.properties.get('uri')):
+            raise NoSuchPropertyException("SQL connection URI is required")
+
+        self.engine = shared_engine(
+            uri,
+            busy_timeout_ms=int(self.properties.get('busy_timeout_ms', DEFAULT_BUSY_TIMEOUT_MS)),
+            pool_size=int(self.properties.get('pool_size', DEFAULT_POOL_SIZE)),
+        )
+        self._metadata_cache = OrderedDict()
+        self._metadata_cache_size = int(self.properties.get('metadata_cache_size', DEFAULT_METADATA_CACHE_SIZE))
+        self._metadata_cache_lock = threading.Lock()
+        self._init_catalog()
+
+    def _convert_orm_to_iceberg(self, orm_table):
+        # metadata.json files are immutable, so parsed metadata can be cached by location:
+        # load_table() still reads the current pointer from the catalog database, but only
+        # fetches and parses the JSON when the pointer has moved.
+        metadata_location = orm_table.metadata_location
+        with self._metadata_cache_lock:
+            table = self._metadata_cache.get(metadata_location)
+            if table is not None:
+                self._metadata_cache.move_to_end(metadata_location)
+
+        if table is None:
+            table = super()._convert_orm_to_iceberg(orm_table)
+            with self._metadata_cache_lock:
+                self._metadata_cache[metadata_location] = table
+                while len(self._metadata_cache) > self._metadata_cache_size:
+                    self._metadata_cache.popitem(last=False)
+
+        # Hand out a fresh Table per call: Table objects are updated in place on commit,
+        # so sharing one instance between writers would leak state across threads. The
+        # identifier comes from the catalog row, as a cached entry keeps its name after
+        # rename_table().
+        return Table(
+            identifier=Catalog.identifier_to_tuple(orm_table.table_namespace) + (orm_table.table_name,),
+            metadata=table.metadata,
+            metadata_location=table.metadata_location,
+            io=table.io,
+            catalog=self,
+        )
+
+    def cache_info(self) -> dict:
+        """Return the number of cached metadata files and the cache capacity."""
+        with self._metadata_cache_lock:
+            return {'entries': len(self._metadata_cache), 'capacity': self._metadata_cache_size}
+
+
+def get_catalog(name: str, uri: str, warehouse: str, **properties) -> PooledSqlCatalog:
+    """
+    Return a shared catalog for (name, uri, warehouse), creating it on first use.
+
+    Repeated calls, e.g. from every writer thread, reuse the same catalog object, engine,
+    connection pool and metadata cache instead of building a fresh SqlCatalog each time.
+
+    Args:
+        name: Catalog name
+        uri: Catalog database URI, e.g. f'sqlite:///{catalog_db}'
+        warehouse: Warehouse location, e.g. f'file://{warehouse_path}'
+        **properties: Additional catalog properties (S3 settings, busy_timeout_ms, pool_size, ...)
+    """
+    key = (name, uri, warehouse, tuple(sorted((k, str(v)) for k, v in properties.items())))
+    with _lock:
+        catalog = _catalogs.get(key)
+    if catalog is None:
+        catalog = PooledSqlCatalog(name, uri=uri, warehouse=warehouse, **properties)
+        with _lock:
+            catalog = _catalogs.setdefault(key, catalog)
+    return catalog
+
+
+def dispose_catalogs() -> None:
+    """Close all pooled connections and forget cached catalogs, e.g. before deleting catalog.db."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _catalogs.clear()
+
+
+def benchmark_commits(make_catalog, identifier: str, data, writers: int = 4, commits_per_writer: int = 10,
+                      max_retries: int = 20) -> dict:
+    """
+    Measure append commit latency and throughput with several concurrent writers.
+
+    Each writer calls make_catalog() once, then repeatedly loads the table and appends
+    data. PyIceberg already retries conflicting commits internally (see the table's
+    commit.retry.* properties); commits that still fail are retried here. Latency
+    includes table loading and all retries, and is measured over successful commits only.
+
+    Args:
+        make_catalog: Zero-argument callable returning a catalog
+        identifier: Table identifier, e.g. 'demo.events'
+        data: Arrow table appended by every commit
+        writers: Number of concurrent writer threads
+        commits_per_writer: Commits each writer performs
+        max_retries: Retries per commit before giving up
+
+    Returns:
+        Dictionary with commit counts, outer retries, latency percentiles (ms, None if no commit
+        succeeded) and commits/s
+    """
+    latencies = []
+    retries = []
+    failures = []
+    results_lock = threading.Lock()
+
+    def writer():
+        catalog = make_catalog()
+        for _ in range(commits_per_writer):
+            start = time.perf_counter()
+            succeeded = False
+            for attempt in range(max_retries + 1):
+                try:
+                    catalog.load_table(identifier).append(data)
+                    succeeded = True
+                    break
+                except (CommitFailedException, OperationalError) as e:
+                    if attempt == max_retries:
+                        with results_lock:
+                            failures.append(str(e))
+                        break
+                    time.sleep(0.005 * (attempt + 1))
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                if succeeded:
+                    latencies.append(elapsed * 1000)
+                retries.append(attempt)
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    committed = len(latencies)
+    # Every writer failed: there is no latency to report
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else (latencies or [None]) * 99
+    return {
+        'writers': writers,
+        'commits': committed,
+        'failed': len(failures),
+        'retries': sum(retries),
+        'mean_ms': mean(latencies) if latencies else None,
+        'p50_ms': cuts[49],
+        'p95_ms': cuts[94],
+        'max_ms': max(latencies) if latencies else None,
+        'commits_per_s': committed / wall if wall else 0.0,
+    }
@@ -0,0 +1,175 @@
+import itertools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pyiceberg.exceptions import CommitFailedException, ValidationException
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.expressions.parser import parse
+from pyiceberg.expressions.visitors import (
+    ROWS_MUST_MATCH,
+    _StrictMetricsEvaluator,
+    bind,
+    expression_evaluator,
+    strict_projection,
+)
+from pyiceberg.io.pyarrow import ArrowScan, _dataframe_to_data_files, _expression_to_complementary_pyarrow
+from pyiceberg.schema import Schema
+from pyiceberg.table.snapshots import Operation
+from pyiceberg.table.update.snapshot import _OverwriteFiles
+
+
+def must_match_evaluator(table, delete_filter):
+    """Return a function telling whether every row of a data file matches the filter, from metadata only."""
+    schema = table.schema()
+    metrics = _StrictMetricsEvaluator(schema, delete_filter).eval
+    partitions = {}
+    for spec_id, spec in table.specs().items():
+        if spec.is_unpartitioned():
+            continue
+        partition_schema = Schema(*spec.partition_type(schema).fields)
+        partitions[spec_id] = expression_evaluator(partition_schema, strict_projection(schema, spec)(delete_filter), True)
+
+    def must_match(data_file) -> bool:
+        if data_file.spec_id in partitions and partitions[data_file.spec_id](data_file.partition):
+            return True
+        return metrics(data_file) == ROWS_MUST_MATCH
+
+    return must_match
+
+
+def plan_delete(table, delete_filter) -> dict:
+    """
+    Classify the live data files of the current snapshot for a delete, using metadata only.
+
+    * untouched: partition values or column bounds prove that no row matches
+    * drop: partition values or column bounds prove that every row matches, so the file is
+      removed without reading it
+    * rewrite: some rows may match; the file has to be read, filtered and written again
+
+    Args:
+        table: PyIceberg Table object
+        delete_filter: Filter expression, as string or PyIceberg expression
+
+    Returns:
+        Dictionary with file, byte and record counts per class, plus the 'drop' and 'rewrite' scan tasks
+    """
+    label = delete_filter if isinstance(delete_filter, str) else str(delete_filter)
+    if isinstance(delete_filter, str):
+        delete_filter = parse(delete_filter)
+    snapshot = table.current_snapshot()
+    summary = snapshot.summary if snapshot else {}
+
+    must_match = must_match_evaluator(table, delete_filter)
+    drop, rewrite = [], []
+    for task in table.scan(row_filter=delete_filter).plan_files():
+        (drop if must_match(task.file) else rewrite).append(task)
+
+    files_total = int(summary.get('total-data-files', 0))
+    bytes_total = int(summary.get('total-files-size', 0))
+    result = {
+        'filter': label,
+        'snapshot_id': snapshot.snapshot_id if snapshot else None,
+        'files_total': files_total,
+        'bytes_total': bytes_total,
+        'files_drop': len(drop),
+        'bytes_drop': sum(t.file.file_size_in_bytes for t in drop),
+        'records_drop': sum(t.file.record_count for t in drop),
+        'files_rewrite': len(rewrite),
+        'bytes_rewrite': sum(t.file.file_size_in_bytes for t in rewrite),
+        'records_rewrite': sum(t.file.record_count for t in rewrite),
+        'drop': drop,
+        'rewrite': rewrite,
+    }
+    result['files_untouched'] = files_total - result['files_drop'] - result['files_rewrite']
+    result['bytes_untouched'] = bytes_total - result['bytes_drop'] - result['bytes_rewrite']
+    return result
+
+
+def _rewrite_file(table, task, preserve, write_uuid, counter) -> dict:
+    data = ArrowScan(table.metadata, table.io, table.schema(), AlwaysTrue()).to_table([task])
+    kept = data.filter(preserve)
+    new_files = []
+    if 0 < len(kept) < len(data):
+        new_files = list(_dataframe_to_data_files(table.metadata, kept, table.io, write_uuid=write_uuid, counter=counter))
+    return {'task': task, 'deleted': len(data) - len(kept), 'kept': len(kept), 'new_files': new_files}
+
+
+def execute_delete(table, delete_filter, max_workers: int = None, dry_run: bool = False,
+                   snapshot_properties: dict = None) -> dict:
+    """
+    Delete rows with copy-on-write, rewriting only files that partially match, in parallel.
+
+    Files in the 'drop' class of plan_delete() are removed without being read. Files in the
+    'rewrite' class are read, filtered and written concurrently; a file turns out to be
+    unaffected (kept) or fully deleted (dropped) when its rows show it. Everything is
+    committed as a single snapshot. Under serializable isolation, concurrent appends of
+    matching rows make the commit fail instead of surviving the delete.
+
+    Args:
+        table: PyIceberg Table object
+        delete_filter: Filter expression, as string or PyIceberg expression
+        max_workers: Number of files rewritten in parallel
+        dry_run: Only plan, do not rewrite or commit
+        snapshot_properties: Custom properties added to the snapshot summary
+
+    Returns:
+        The plan_delete() counts, plus records deleted, files dropped/rewritten/unchanged, bytes
+        written, and rewrite_amplification (bytes written per byte of deleted data)
+    """
+    plan = plan_delete(table, delete_filter)
+    if isinstance(delete_filter, str):
+        delete_filter = parse(delete_filter)
+    result = {k: v for k, v in plan.items() if k not in ('drop', 'rewrite')}
+    result.update(records_deleted=0, files_dropped=0, files_rewritten=0, files_unchanged=0,
+                  bytes_deleted=0, bytes_written=0, rewrite_amplification=0.0, committed_snapshot_id=None)
+    if dry_run or not (plan['drop'] or plan['rewrite']):
+        return result
+
+    preserve = _expression_to_complementary_pyarrow(bind(table.schema(), delete_filter, True), table.schema())
+    write_uuid = uuid.uuid4()
+    counter = itertools.count(0)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rewrites = list(executor.map(lambda t: _rewrite_file(table, t, preserve, write_uuid, counter), plan['rewrite']))
+
+    removed = [t.file for t in plan['drop']]
+    new_files = []
+    for r in rewrites:
+        if r['deleted'] == 0:
+            result['files_unchanged'] += 1
+            continue
+        removed.append(r['task'].file)
+        new_files += r['new_files']
+        result['records_deleted'] += r['deleted']
+        # Deleted bytes of a partially matching file are estimated from its share of deleted rows
+        result['bytes_deleted'] += r['task'].file.file_size_in_bytes * r['deleted'] // (r['deleted'] + r['kept'])
+        if r['kept']:
+            result['files_rewritten'] += 1
+        else:
+            result['files_dropped'] += 1
+    result['records_deleted'] += plan['records_drop']
+    result['files_dropped'] += plan['files_drop']
+    result['bytes_deleted'] += plan['bytes_drop']
+    result['bytes_written'] = sum(f.file_size_in_bytes for f in new_files)
+    result['rewrite_amplification'] = result['bytes_written'] / result['bytes_deleted'] if result['bytes_deleted'] else 0.0
+    if not removed:
+        return result
+
+    try:
+        tx = table.transaction()
+        overwrite = _OverwriteFiles(operation=Operation.OVERWRITE if new_files else Operation.DELETE,
+                                    transaction=tx, io=table.io, commit_uuid=write_uuid,
+                                    snapshot_properties=snapshot_properties or {})
+        # The predicate is used for conflict detection against concurrent commits
+        overwrite.delete_by_predicate(delete_filter)
+        for data_file in removed:
+            overwrite.delete_data_file(data_file)
+        for data_file in new_files:
+            overwrite.append_data_file(data_file)
+        overwrite.commit()
+        tx.commit_transaction()
+    except (CommitFailedException, ValidationException):
+        for data_file in new_files:
+            table.io.delete(data_file.file_path)
+        raise
+
+    result['committed_snapshot_id'] = table.current_snapshot().snapshot_id
+    return result
@@ -0,0 +1,245 @@
+import argparse
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import pyarrow as pa
+import pyarrow.feather as feather
+from catalogs import get_catalog
+from maintenance import find_orphan_files, table_target_file_size
+from partitions import partition_files
+
+# Defaults of the Iceberg table properties that control snapshot expiration
+MAX_SNAPSHOT_AGE_MS = 'history.expire.max-snapshot-age-ms'
+MAX_SNAPSHOT_AGE_MS_DEFAULT = 5 * 24 * 60 * 60 * 1000
+MIN_SNAPSHOTS_TO_KEEP = 'history.expire.min-snapshots-to-keep'
+MIN_SNAPSHOTS_TO_KEEP_DEFAULT = 1
+
+REPORT_FORMATS = ('table', 'json', 'arrow')
+REPORT_SCHEMA = pa.schema([
+    ('table', pa.string()),
+    ('snapshots', pa.int64()),
+    ('expirable_snapshots', pa.int64()),
+    ('oldest_snapshot_days', pa.float64()),
+    ('metadata_json_bytes', pa.int64()),
+    ('metadata_log_entries', pa.int64()),
+    ('manifests', pa.int64()),
+    ('avg_manifest_bytes', pa.float64()),
+    ('data_files', pa.int64()),
+    ('delete_files', pa.int64()),
+    ('total_bytes', pa.int64()),
+    ('total_records', pa.int64()),
+    ('small_files', pa.int64()),
+    ('small_file_ratio', pa.float64()),
+    ('excess_files', pa.int64()),
+    ('orphan_files', pa.int64()),
+    ('orphan_bytes', pa.int64()),
+    ('priority', pa.int64()),
+    ('needs', pa.string()),
+    ('scan_seconds', pa.float64()),
+    ('error', pa.string()),
+])
+
+
+def _expirable_snapshots(table, now_ms: int) -> int:
+    """Count snapshots that expire_snapshots() would remove under the table's retention properties."""
+    metadata = table.metadata
+    max_age = int(table.properties.get(MAX_SNAPSHOT_AGE_MS, MAX_SNAPSHOT_AGE_MS_DEFAULT))
+    min_keep = int(table.properties.get(MIN_SNAPSHOTS_TO_KEEP, MIN_SNAPSHOTS_TO_KEEP_DEFAULT))
+
+    protected = {ref.snapshot_id for ref in metadata.refs.values()}
+    snapshot = table.current_snapshot()
+    while snapshot is not None and min_keep > 0:
+        protected.add(snapshot.snapshot_id)
+        min_keep -= 1
+        snapshot = table.snapshot_by_id(snapshot.parent_snapshot_id) if snapshot.parent_snapshot_id else None
+    return sum(1 for s in metadata.snapshots if s.snapshot_id not in protected and s.timestamp_ms < now_ms - max_age)
+
+
+def table_health(table, small_file_size: int = None, orphans: bool = True, older_than=None,
+                 max_workers: int = None) -> dict:
+    """
+    Gather maintenance metrics of one table from its metadata.
+
+    priority counts the objects maintenance would get rid of: data and delete files that
+    compaction would merge away, snapshots past their retention, and orphan files.
+
+    Args:
+        table: PyIceberg Table object
+        small_file_size: Data files below this size count as small (default: 75% of write.target-file-size-bytes)
+        orphans: Estimate orphan files; this lists every object below the table location
+        older_than: Orphan grace period, see find_orphan_files()
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        Dictionary of metrics
+    """
+    started = time.perf_counter()
+    metadata = table.metadata
+    target_size = table_target_file_size(table)
+    if small_file_size is None:
+        small_file_size = int(target_size * 0.75)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    snapshot = table.current_snapshot()
+
+    health = {
+        'table': '.'.join(table.name()),
+        'snapshots': len(metadata.snapshots),
+        'expirable_snapshots': _expirable_snapshots(table, now_ms),
+        'oldest_snapshot_days': (now_ms - min(s.timestamp_ms for s in metadata.snapshots)) / 86_400_000 if metadata.snapshots else 0.0,
+        'metadata_json_bytes': len(table.io.new_input(table.metadata_location)),
+        'metadata_log_entries': len(metadata.metadata_log),
+        'manifests': 0,
+        'avg_manifest_bytes': 0.0,
+        'data_files': 0,
+        'delete_files': 0,
+        'total_bytes': 0,
+        'total_records': 0,
+        'small_files': 0,
+        'small_file_ratio': 0.0,
+        'excess_files': 0,
+        'orphan_files': None,
+        'orphan_bytes': None,
+    }
+
+    if snapshot is not None:
+        manifests = snapshot.manifests(table.io)
+        health['manifests'] = len(manifests)
+        health['avg_manifest_bytes'] = sum(m.manifest_length for m in manifests) / len(manifests) if manifests else 0.0
+
+        files = partition_files(table, max_workers=max_workers)
+        data = files[files['content'] == 'data']
+        health['data_files'] = len(data)
+        health['delete_files'] = int((files['content'] == 'deletes').sum())
+        health['total_bytes'] = int(data['file_size'].sum())
+        health['total_records'] = int(data['record_count'].sum())
+        health['small_files'] = int((data['file_size'] < small_file_size).sum())
+        health['small_file_ratio'] = health['small_files'] / len(data) if len(data) else 0.0
+        # Compaction can't do better than ceil(bytes / target) files per partition, and merges all delete files away
+        ideal = sum(math.ceil(size / target_size) for size in data.groupby(['spec_id', 'partition'])['file_size'].sum())
+        health['excess_files'] = len(data) - ideal + health['delete_files']
+
+    if orphans:
+        found = find_orphan_files(table, older_than, max_workers)
+        health['orphan_files'] = len(found)
+        health['orphan_bytes'] = sum(o['size'] for o in found)
+
+    health['priority'] = health['excess_files'] + health['expirable_snapshots'] + (health['orphan_files'] or 0)
+    needs = []
+    if health['excess_files'] > 0 and health['small_files'] > 1:
+        needs.append('compaction')
+    if health['expirable_snapshots'] > 0:
+        needs.append('expiration')
+    if health['orphan_files']:
+        needs.append('orphan cleanup')
+    health['needs'] = ', '.join(needs)
+    health['scan_seconds'] = time.perf_counter() - started
+    return health
+
+
+def list_all_tables(catalog, namespaces=None) -> list:
+    """Return the identifiers of all tables in the given namespaces, or in all (nested) namespaces."""
+    if namespaces is None:
+        namespaces, pending = [], list(catalog.list_namespaces())
+        while pending:
+            namespace = pending.pop()
+            namespaces.append(namespace)
+            pending.extend(catalog.list_namespaces(namespace))
+    identifiers = []
+    for namespace in namespaces:
+        identifiers.extend(catalog.list_tables(namespace))
+    return sorted(identifiers)
+
+
+def scan_warehouse(catalog, namespaces=None, max_workers: int = 8, orphans: bool = True, older_than=None,
+                   small_file_size: int = None) -> pa.Table:
+    """
+    Scan every table of a catalog in parallel and rank them by maintenance need.
+
+    A table that fails to load or scan gets a row with only 'table' and 'error' set, so one
+    broken table doesn't stop the scan.
+
+    Args:
+        catalog: PyIceberg catalog, e.g. a SqlCatalog
+        namespaces: Namespaces to scan (default: all)
+        max_workers: Number of tables scanned in parallel
+        orphans: Estimate orphan files (lists every object below each table location)
+        older_than: Orphan grace period, see find_orphan_files()
+        small_file_size: Data files below this size count as small (default: per table target size)
+
+    Returns:
+        Arrow table with one row per table, highest priority first
+    """
+    def _scan(identifier):
+        try:
+            table = catalog.load_table(identifier)
+            # Tables are scanned in parallel already, so manifests are read sequentially per table
+            return {**table_health(table, small_file_size, orphans, older_than, max_workers=1), 'error': None}
+        except Exception as e:
+            return {'table': '.'.join(identifier), 'error': f'{type(e).__name__}: {e}'}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(_scan, list_all_tables(catalog, namespaces)))
+    rows.sort(key=lambda row: (row.get('priority') is None, -(row.get('priority') or 0), row['table']))
+    return pa.Table.from_pylist(rows, schema=REPORT_SCHEMA)
+
+
+def write_report(report: pa.Table, format: str = 'table', output: str = None) -> None:
+    """
+    Write a scan_warehouse() report as an aligned text table, JSON (a list of objects) or an Arrow IPC file.
+
+    Args:
+        report: Arrow table returned by scan_warehouse()
+        format: One of 'table', 'json' or 'arrow'
+        output: File to write to (default: stdout; required for 'arrow')
+    """
+    if format == 'arrow':
+        if output is None:
+            raise ValueError("The 'arrow' format needs an output file")
+        feather.write_feather(report, output)
+        return
+    if format == 'json':
+        text = json.dumps(report.to_pylist(), indent=2, default=str)
+    else:
+        text = report.to_pandas().to_string(index=False)
+    if output is None:
+        print(text)
+    else:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Rank the tables of an Iceberg SQL catalog by maintenance need.')
+    parser.add_argument('--uri', required=True, help="Catalog database URI, e.g. 'sqlite:///catalog.db'")
+    parser.add_argument('--warehouse', required=True, help="Warehouse location, e.g. 'file:///data/warehouse'")
+    parser.add_argument('--name', default='default', help='Catalog name')
+    parser.add_argument('--property', '-p', action='append', default=[], metavar='KEY=VALUE',
+                        help='Additional catalog property, e.g. s3.endpoint=http://localhost:9000 (repeatable)')
+    parser.add_argument('--namespace', '-n', action='append', help='Namespace to scan (repeatable, default: all)')
+    parser.add_argument('--format', '-f', choices=REPORT_FORMATS, default='table')
+    parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=8, help='Number of tables scanned in parallel')
+    parser.add_argument('--no-orphans', action='store_true', help='Skip the orphan estimate (no object listing)')
+    parser.add_argument('--grace-days', type=float, help='Orphan grace period in days (default: 3)')
+    parser.add_argument('--top', type=int, help='Only report the N tables with the highest priority')
+    args = parser.parse_args(argv)
+
+    properties = dict(p.split('=', 1) for p in args.property)
+    catalog = get_catalog(args.name, args.uri, args.warehouse, **properties)
+    namespaces = [tuple(n.split('.')) for n in args.namespace] if args.namespace else None
+    older_than = datetime.now(timezone.utc) - timedelta(days=args.grace_days) if args.grace_days is not None else None
+    report = scan_warehouse(catalog, namespaces, max_workers=args.workers, orphans=not args.no_orphans,
+                            older_than=older_than)
+    # Non-zero exit status lets cron wrappers alert on tables that could not be scanned
+    failed = report['error'].null_count < len(report)
+    if args.top is not None:
+        report = report.slice(0, args.top)
+    write_report(report, args.format, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
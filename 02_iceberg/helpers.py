@@ -3,19 +3,63 @@ import fastavro
 from pathlib import Path
 from IPython.display import display, HTML
 from datetime import datetime
+from tracing import traced
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_COLUMN_PAGE_SIZE = 50
+STATUS_NAMES = {0: 'EXISTING', 1: 'ADDED', 2: 'DELETED'}
+STATUS_COLORS = {'EXISTING': '#95a5a6', 'ADDED': '#27ae60', 'DELETED': '#e74c3c'}
+
+
+def _page_bounds(page: int, page_size: int, total: int) -> tuple:
+    """Clamp a 1-based page number to the available pages and return (page, pages, start, stop)."""
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return page, pages, start, min(start + page_size, total)
+
+
+def _column_stats(data_file: dict, name: str) -> dict:
+    """Return a per-column statistic of a manifest entry (e.g. 'value_counts') as {field id: value}."""
+    stats = data_file.get(name) or {}
+    if isinstance(stats, list):
+        # fastavro reads Iceberg's int-keyed maps as lists of {'key': ..., 'value': ...} records
+        stats = {item['key']: item['value'] for item in stats}
+    return stats
+
+
+def _pager(label: str, page: int, page_size: int, total: int, argument: str = 'page') -> str:
+    """Return the note shown above a paginated section, telling how to fetch the other pages."""
+    page, pages, start, stop = _page_bounds(page, page_size, total)
+    return f"""
+    <div style="margin: 10px 0 15px 0; padding: 8px; background-color: #fdf6e3; border-radius: 3px; font-size: 0.9em;">
+        Showing {label} {start + 1:,}-{stop:,} of {total:,} (page {page} of {pages}).
+        Pass <code>{argument}=</code> and <code>{argument}_size=</code> for other {label}.
+    </div>
+    """
 
-def inspect_iceberg_table(table) -> None:
+
+@traced('html.render', 'render')
+def inspect_iceberg_table(table, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, column_page: int = 1,
+                          column_page_size: int = DEFAULT_COLUMN_PAGE_SIZE) -> None:
     """
     Provides comprehensive HTML visualization of Iceberg table structure and metadata.
 
+    The snapshot history is summarized per operation and paginated (newest first), and the
+    fields of wide schemas are paginated too, so large tables render in bounded time.
+
     Args:
         table: PyIceberg Table object
+        page: Page of snapshot history to show in detail (1-based)
+        page_size: Number of snapshots per page
+        column_page: Page of schema fields to show (1-based)
+        column_page_size: Number of schema fields per page
     """
     metadata = table.metadata
     snapshots = list(table.snapshots())
     current_snapshot = table.current_snapshot()
 
-    html = f"""
+    html = [f"""
     <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 1400px;">
         <h2 style="color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px;">
             🧊 Iceberg Table: {table.name()}
@@ -54,10 +98,10 @@ def inspect_iceberg_table(table) -> None:
         <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
             📸 Current Snapshot
         </h3>
-    """
+    """]
 
     if current_snapshot:
-        html += f"""
+        html.append(f"""
         <div style="background-color: #e8f8f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; border-left: 4px solid #27ae60;">
             <table style="width: 100%; border-collapse: collapse;">
                 <tr style="background-color: #fff;">
@@ -68,41 +112,45 @@ def inspect_iceberg_table(table) -> None:
                     <td style="padding: 8px; border: 1px solid #bdc3c7; font-weight: bold;">Timestamp</td>
                     <td style="padding: 8px; border: 1px solid #bdc3c7;">{datetime.fromtimestamp(current_snapshot.timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')}</td>
                 </tr>
-        """
+        """)
 
         if hasattr(current_snapshot, 'summary') and current_snapshot.summary:
             summary = current_snapshot.summary.additional_properties
             if summary:
-                html += """
+                html.append("""
                 <tr style="background-color: #fff;">
                     <td style="padding: 8px; border: 1px solid #bdc3c7; font-weight: bold;">Summary</td>
                     <td style="padding: 8px; border: 1px solid #bdc3c7;">
-                """
+                """)
                 for key, value in sorted(summary.items()):
-                    html += f"<strong>{key}:</strong> {value}<br>"
-                html += """
+                    html.append(f"<strong>{key}:</strong> {value}<br>")
+                html.append("""
                     </td>
                 </tr>
-                """
+                """)
 
-        html += """
+        html.append("""
             </table>
         </div>
-        """
+        """)
 
     # Current Schema
     current_schema = metadata.schemas[-1] if metadata.schemas else None
     if current_schema:
-        html += f"""
+        html.append(f"""
         <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
             📋 Current Schema (ID: {current_schema.schema_id})
         </h3>
         <div style="background-color: #fff5e6; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
-        """
+        """)
 
-        for field in current_schema.fields:
+        fields = current_schema.fields
+        if len(fields) > column_page_size:
+            html.append(_pager('fields', column_page, column_page_size, len(fields), 'column_page'))
+        _, _, start, stop = _page_bounds(column_page, column_page_size, len(fields))
+        for field in fields[start:stop]:
             field_type = str(field.field_type)
-            html += f"""
+            html.append(f"""
             <div style="margin: 8px 0; padding: 8px; background-color: #fff; border-left: 3px solid #f39c12; border-radius: 3px;">
                 <code style="font-weight: bold; color: #2c3e50;">{field.name}</code>
                 <div style="margin-top: 5px; font-size: 0.9em;">
@@ -111,49 +159,63 @@ def inspect_iceberg_table(table) -> None:
                     Required: <strong>{'Yes' if field.required else 'No'}</strong>
                 </div>
             </div>
-            """
+            """)
 
-        html += """
+        html.append("""
         </div>
-        """
+        """)
 
     # Partition Spec
     if metadata.partition_specs:
         current_spec = metadata.partition_specs[-1]
-        html += f"""
+        html.append(f"""
         <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
             🗂️ Current Partition Spec (ID: {current_spec.spec_id})
         </h3>
         <div style="background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
-        """
+        """)
 
         if current_spec.fields:
             for field in current_spec.fields:
-                html += f"""
+                html.append(f"""
                 <div style="margin: 8px 0; padding: 8px; background-color: #fff; border-left: 3px solid #3498db; border-radius: 3px;">
                     <code style="font-weight: bold;">{field.name}</code>: {field.transform}
                 </div>
-                """
+                """)
         else:
-            html += "<p><em>Unpartitioned table</em></p>"
+            html.append("<p><em>Unpartitioned table</em></p>")
 
-        html += """
+        html.append("""
         </div>
-        """
+        """)
 
     # Snapshot History
-    html += """
+    html.append("""
     <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
         📜 Snapshot History
     </h3>
-    """
+    """)
+
+    operations = {}
+    for snapshot in snapshots:
+        operation = snapshot.summary.operation.value if snapshot.summary else 'unknown'
+        operations[operation] = operations.get(operation, 0) + 1
+    if operations:
+        html.append(f"""
+    <div style="margin-bottom: 10px;">
+        <strong>Operations:</strong> {', '.join(f'{op}: {count:,}' for op, count in sorted(operations.items()))}
+    </div>
+        """)
+    if len(snapshots) > page_size:
+        html.append(_pager('snapshots', page, page_size, len(snapshots)))
 
-    for i, snapshot in enumerate(reversed(snapshots)):
+    _, _, start, stop = _page_bounds(page, page_size, len(snapshots))
+    for i, snapshot in enumerate(list(reversed(snapshots))[start:stop], start):
         is_current = snapshot.snapshot_id == metadata.current_snapshot_id
         border_color = "#27ae60" if is_current else "#95a5a6"
         bg_color = "#e8f8f5" if is_current else "#f9f9f9"
 
-        html += f"""
+        html.append(f"""
         <div style="background-color: {bg_color}; padding: 12px; border-radius: 5px; margin-bottom: 10px; border-left: 4px solid {border_color};">
             <div style="font-weight: bold; color: #2c3e50;">
                 Snapshot {len(snapshots) - i}: <code>{snapshot.snapshot_id}</code>
@@ -161,12 +223,12 @@ def inspect_iceberg_table(table) -> None:
             </div>
             <div style="margin-top: 5px; font-size: 0.9em;">
                 <strong>Time:</strong> {datetime.fromtimestamp(snapshot.timestamp_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')}<br>
-        """
+        """)
 
         if hasattr(snapshot, 'summary') and snapshot.summary:
-            html += f"<strong>Operation:</strong> {snapshot.summary.operation.value}<br>"
+            html.append(f"<strong>Operation:</strong> {snapshot.summary.operation.value}<br>")
             if snapshot.summary.additional_properties:
-                html += "<strong>Changes:</strong> "
+                html.append("<strong>Changes:</strong> ")
                 changes = []
                 props = snapshot.summary.additional_properties
                 if 'added-records' in props:
@@ -175,18 +237,18 @@ def inspect_iceberg_table(table) -> None:
                     changes.append(f"-{props['deleted-records']} records")
                 if 'added-data-files' in props:
                     changes.append(f"+{props['added-data-files']} files")
-                html += ", ".join(changes) if changes else "N/A"
+                html.append(", ".join(changes) if changes else "N/A")
 
-        html += """
+        html.append("""
             </div>
         </div>
-        """
+        """)
 
-    html += """
+    html.append("""
     </div>
-    """
+    """)
 
-    display(HTML(html))
+    display(HTML(''.join(html)))
 
 
 def inspect_metadata_json(json_path: Path) -> None:
@@ -360,12 +422,21 @@ def inspect_metadata_json(json_path: Path) -> None:
     return metadata
 
 
-def inspect_manifest(manifest_path: Path):
+@traced('html.render', 'render')
+def inspect_manifest(manifest_path: Path, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, column_page: int = 1,
+                     column_page_size: int = DEFAULT_COLUMN_PAGE_SIZE):
     """
     Read and display AVRO manifest file contents.
 
+    Entries are summarized per status first; the per-entry detail is paginated, and so are the
+    per-column value counts and bounds of wide schemas, so large manifests render in bounded time.
+
     Args:
         manifest_path: Path to AVRO manifest file
+        page: Page of entries to show in detail (1-based)
+        page_size: Number of entries per page
+        column_page: Page of columns shown in each entry's value counts and bounds (1-based)
+        column_page_size: Number of columns per page
 
     Returns:
         List of data file paths referenced in this manifest
@@ -375,7 +446,7 @@ def inspect_manifest(manifest_path: Path):
         reader = fastavro.reader(f)
         records = list(reader)
 
-    html = f"""
+    html = [f"""
     <div style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 1400px;">
         <h2 style="color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px;">
             📦 Manifest File: {manifest_path.name}
@@ -396,22 +467,60 @@ def inspect_manifest(manifest_path: Path):
         </div>
 
         <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
-            📄 Data Files ({len(records)})
+            📊 Entry Summary
         </h3>
-    """
+        <table style="width: 100%; border-collapse: collapse; margin-bottom: 20px;">
+            <tr style="background-color: #ecf0f1;">
+                <th style="padding: 8px; border: 1px solid #bdc3c7; text-align: left;">Status</th>
+                <th style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">Entries</th>
+                <th style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">Records</th>
+                <th style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">File Size</th>
+            </tr>
+    """]
 
     data_file_paths = []
+    totals = {}
+    for record in records:
+        data_file = record.get('data_file', {})
+        data_file_paths.append(Path(data_file.get('file_path', 'N/A').replace('file://', '')))
+        status_total = totals.setdefault(STATUS_NAMES.get(record.get('status', 0), 'UNKNOWN'), [0, 0, 0])
+        status_total[0] += 1
+        status_total[1] += data_file.get('record_count', 0)
+        status_total[2] += data_file.get('file_size_in_bytes', 0)
+
+    for status_name, (entries, record_count, file_size) in sorted(totals.items()):
+        html.append(f"""
+            <tr style="background-color: #fff;">
+                <td style="padding: 8px; border: 1px solid #bdc3c7; border-left: 4px solid {STATUS_COLORS.get(status_name, '#95a5a6')};">{status_name}</td>
+                <td style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">{entries:,}</td>
+                <td style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">{record_count:,}</td>
+                <td style="padding: 8px; border: 1px solid #bdc3c7; text-align: right;">{file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)</td>
+            </tr>
+        """)
+
+    html.append(f"""
+        </table>
 
-    for i, record in enumerate(records, 1):
-        status = record.get('status', 0)
-        status_name = {0: 'EXISTING', 1: 'ADDED', 2: 'DELETED'}.get(status, 'UNKNOWN')
-        status_color = {'EXISTING': '#95a5a6', 'ADDED': '#27ae60', 'DELETED': '#e74c3c'}.get(status_name, '#95a5a6')
+        <h3 style="color: #2c3e50; border-bottom: 2px solid #3498db; padding-bottom: 5px;">
+            📄 Data Files ({len(records)})
+        </h3>
+    """)
+    if len(records) > page_size:
+        html.append(_pager('entries', page, page_size, len(records)))
+
+    _, _, start, stop = _page_bounds(page, page_size, len(records))
+    columns = max((len(_column_stats(r.get('data_file', {}), 'value_counts')) for r in records[start:stop]), default=0)
+    if columns > column_page_size:
+        html.append(_pager('columns', column_page, column_page_size, columns, 'column_page'))
+    _, _, col_start, col_stop = _page_bounds(column_page, column_page_size, columns)
+    for i, record in enumerate(records[start:stop], start + 1):
+        status_name = STATUS_NAMES.get(record.get('status', 0), 'UNKNOWN')
+        status_color = STATUS_COLORS.get(status_name, '#95a5a6')
 
         data_file = record.get('data_file', {})
         file_path = data_file.get('file_path', 'N/A')
-        data_file_paths.append(Path(file_path.replace('file://', '')))
 
-        html += f"""
+        html.append(f"""
         <details style="margin-bottom: 10px;">
             <summary style="cursor: pointer; background-color: #f9f9f9; padding: 10px; border-radius: 5px; border-left: 4px solid {status_color};">
                 <strong>Entry {i}</strong>: <code style="font-size: 0.85em;">{Path(file_path).name}</code>
@@ -435,87 +544,78 @@ def inspect_manifest(manifest_path: Path):
                         <td style="padding: 5px; border: 1px solid #ddd; font-weight: bold;">File Size:</td>
                         <td style="padding: 5px; border: 1px solid #ddd;">{data_file.get('file_size_in_bytes', 0):,} bytes ({data_file.get('file_size_in_bytes', 0) / 1024 / 1024:.2f} MB)</td>
                     </tr>
-        """
+        """)
 
         # Partition data
         if data_file.get('partition'):
-            html += """
+            html.append("""
                     <tr style="background-color: #fff;">
                         <td style="padding: 5px; border: 1px solid #ddd; font-weight: bold; vertical-align: top;">Partition:</td>
                         <td style="padding: 5px; border: 1px solid #ddd;">
-            """
+            """)
             for key, value in data_file['partition'].items():
-                html += f"<div><strong>{key}:</strong> {value}</div>"
-            html += """
+                html.append(f"<div><strong>{key}:</strong> {value}</div>")
+            html.append("""
                         </td>
                     </tr>
-            """
+            """)
 
         # Value counts (statistics) - handle both dict and list formats
-        if data_file.get('value_counts'):
-            html += """
+        value_counts = _column_stats(data_file, 'value_counts')
+        if value_counts:
+            html.append("""
                     <tr style="background-color: #fff;">
                         <td style="padding: 5px; border: 1px solid #ddd; font-weight: bold; vertical-align: top;">Value Counts:</td>
                         <td style="padding: 5px; border: 1px solid #ddd;">
-            """
-            value_counts = data_file['value_counts']
-            if isinstance(value_counts, dict):
-                for key, value in sorted(value_counts.items()):
-                    html += f"<div><code>{key}</code>: {value:,}</div>"
-            else:
-                html += f"<div>{len(value_counts)} column(s) with statistics</div>"
-            html += """
+            """)
+            for key, value in sorted(value_counts.items())[col_start:col_stop]:
+                html.append(f"<div><code>{key}</code>: {value:,}</div>")
+            html.append("""
                         </td>
                     </tr>
-            """
+            """)
 
         # Lower bounds - handle both dict and list formats
-        if data_file.get('lower_bounds'):
-            html += """
+        lower_bounds = _column_stats(data_file, 'lower_bounds')
+        if lower_bounds:
+            html.append("""
                     <tr style="background-color: #fff;">
                         <td style="padding: 5px; border: 1px solid #ddd; font-weight: bold; vertical-align: top;">Lower Bounds:</td>
                         <td style="padding: 5px; border: 1px solid #ddd;">
-            """
-            lower_bounds = data_file['lower_bounds']
-            if isinstance(lower_bounds, dict):
-                for key, value in sorted(lower_bounds.items()):
-                    html += f"<div><code>{key}</code>: {value!r}</div>"
-            else:
-                html += f"<div>{len(lower_bounds)} column(s) with bounds</div>"
-            html += """
+            """)
+            for key, value in sorted(lower_bounds.items())[col_start:col_stop]:
+                html.append(f"<div><code>{key}</code>: {value!r}</div>")
+            html.append("""
                         </td>
                     </tr>
-            """
+            """)
 
         # Upper bounds - handle both dict and list formats
-        if data_file.get('upper_bounds'):
-            html += """
+        upper_bounds = _column_stats(data_file, 'upper_bounds')
+        if upper_bounds:
+            html.append("""
                     <tr style="background-color: #fff;">
                         <td style="padding: 5px; border: 1px solid #ddd; font-weight: bold; vertical-align: top;">Upper Bounds:</td>
                         <td style="padding: 5px; border: 1px solid #ddd;">
-            """
-            upper_bounds = data_file['upper_bounds']
-            if isinstance(upper_bounds, dict):
-                for key, value in sorted(upper_bounds.items()):
-                    html += f"<div><code>{key}</code>: {value!r}</div>"
-            else:
-                html += f"<div>{len(upper_bounds)} column(s) with bounds</div>"
-            html += """
+            """)
+            for key, value in sorted(upper_bounds.items())[col_start:col_stop]:
+                html.append(f"<div><code>{key}</code>: {value!r}</div>")
+            html.append("""
                         </td>
                     </tr>
-            """
+            """)
 
-        html += """
+        html.append("""
                 </table>
             </div>
         </details>
-        """
+        """)
 
-    html += """
+    html.append("""
     </div>
-    """
+    """)
 
-    display(HTML(html))
+    display(HTML(''.join(html)))
     return data_file_paths
 
 
@@ -0,0 +1,244 @@
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+from pyiceberg.exceptions import CommitFailedException, NoSuchTableError
+from pyiceberg.io import load_file_io
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from migrate import read_footers
+
+DEFAULT_RANGE_BYTES = 256 * 1024 * 1024  # JSON bytes per range, i.e. per Parquet file
+DEFAULT_SAMPLE_BYTES = 16 * 1024 * 1024
+DEFAULT_JSON_BLOCK_SIZE = 16 * 1024 * 1024
+DEFAULT_ROW_GROUP_BYTES = 128 * 1024 * 1024
+
+
+def _next_line(f, offset: int, size: int) -> int:
+    """Return the offset of the first line starting at or after offset."""
+    if offset == 0 or offset >= size:
+        return min(offset, size)
+    f.seek(offset - 1)
+    while True:
+        chunk = f.read(64 * 1024)
+        if not chunk:
+            return size
+        newline = chunk.find(b'\n')
+        if newline >= 0:
+            return f.tell() - len(chunk) + newline + 1
+
+
+def split_ranges(path, num_ranges: int) -> list:
+    """
+    Split a JSON lines file into about num_ranges byte ranges that start and end at line boundaries.
+
+    Returns:
+        List of (start, stop) byte offsets, without empty ranges
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        bounds = sorted({_next_line(f, size * i // num_ranges, size) for i in range(num_ranges)} | {size})
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+
+def infer_json_schema(path, sample_bytes: int = DEFAULT_SAMPLE_BYTES) -> pa.Schema:
+    """
+    Infer the Arrow schema of a JSON lines file from its first lines.
+
+    Every range is parsed with this schema, so all files share it. Fields that are only null in
+    the sample, or numbers that are only integers, make later ranges fail to parse; pass an
+    explicit schema to the ingest functions then.
+    """
+    with open(path, 'rb') as f:
+        size = os.path.getsize(path)
+        stop = _next_line(f, min(sample_bytes, size), size)
+        f.seek(0)
+        sample = f.read(stop)
+    return pj.read_json(pa.BufferReader(sample), read_options=pj.ReadOptions(block_size=max(len(sample), 1))).schema
+
+
+def _write_range(path: str, start: int, stop: int, schema: pa.Schema, target: str, properties: dict,
+                 block_size: int, row_group_bytes: int, compression: str) -> dict:
+    """Parse one byte range of a JSON lines file and write it to one Parquet file (runs in a worker process)."""
+    started = time.perf_counter()
+    parse_schema = pa.schema([field.remove_metadata() for field in schema])
+    rows, buffered, buffered_bytes = 0, [], 0
+    with pa.memory_map(path) as source:
+        source.seek(start)
+        # A zero-copy slice of the map: the range is paged in as the reader advances
+        reader = pj.open_json(pa.BufferReader(source.read_buffer(stop - start)),
+                              read_options=pj.ReadOptions(block_size=block_size, use_threads=False),
+                              parse_options=pj.ParseOptions(explicit_schema=parse_schema, unexpected_field_behavior='error'))
+        output = load_file_io(properties, target).new_output(target)
+        with output.create(overwrite=True) as sink, pq.ParquetWriter(sink, schema, compression=compression) as writer:
+            for batch in reader:
+                buffered.append(batch)
+                buffered_bytes += batch.nbytes
+                rows += batch.num_rows
+                if buffered_bytes >= row_group_bytes:
+                    row_group = pa.Table.from_batches(buffered).cast(schema)
+                    writer.write_table(row_group, row_group_size=row_group.num_rows)
+                    buffered, buffered_bytes = [], 0
+            if buffered:
+                row_group = pa.Table.from_batches(buffered).cast(schema)
+                writer.write_table(row_group, row_group_size=row_group.num_rows)
+    return {'path': target, 'rows': rows, 'json_bytes': stop - start, 'seconds': time.perf_counter() - started}
+
+
+def _ranges(path, max_workers: int, range_bytes: int) -> list:
+    """Return at least one range per worker, and no range larger than range_bytes."""
+    return split_ranges(path, max(max_workers or os.cpu_count(), -(-os.path.getsize(path) // range_bytes)))
+
+
+def _write_ranges(path, ranges: list, schema: pa.Schema, targets, properties: dict, max_workers: int,
+                  block_size: int, row_group_bytes: int, compression: str) -> list:
+    """
+    Write the ranges of a JSON lines file in a process pool; targets(i) names the file of range i.
+
+    If a range fails, the error is raised after all other workers finished.
+    """
+    path = str(Path(path).absolute())
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(_write_range, path, start, stop, schema, targets(i), properties, block_size,
+                                   row_group_bytes, compression)
+                   for i, (start, stop) in enumerate(ranges)]
+        results = []
+        for (start, stop), future in zip(ranges, futures):
+            try:
+                results.append(future.result())
+            except pa.ArrowInvalid as e:
+                raise ValueError(f'{path} bytes {start}-{stop}: {e} (pass schema= if the inferred schema is incomplete)') from e
+        return results
+
+
+def _summary(files: list, started: float, **extra) -> dict:
+    seconds = time.perf_counter() - started
+    json_bytes = sum(f['json_bytes'] for f in files)
+    return {'files': len(files), 'rows': sum(f['rows'] for f in files), 'json_bytes': json_bytes, **extra,
+            'seconds': seconds, 'mb_per_second': json_bytes / 2**20 / seconds}
+
+
+def ingest_jsonl_parquet(path, output_dir, schema: pa.Schema = None, max_workers: int = None,
+                         range_bytes: int = DEFAULT_RANGE_BYTES, block_size: int = DEFAULT_JSON_BLOCK_SIZE,
+                         row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES, compression: str = 'zstd') -> dict:
+    """
+    Convert a JSON lines file into a Parquet dataset, parsing byte ranges in parallel processes.
+
+    The file is split into line-aligned byte ranges; each worker process parses its range and
+    writes one Parquet file. Files are written to a staging directory and moved into output_dir
+    only after all ranges succeeded, so a failed ingest leaves the dataset as it was.
+
+    Args:
+        path: JSON lines file, e.g. '../data/input/radiator.jsonl'
+        output_dir: Directory of the dataset (part-*.parquet files are replaced)
+        schema: Arrow schema of the records (default: inferred from the first lines)
+        max_workers: Number of processes (default: number of CPUs)
+        range_bytes: Largest JSON byte range per file
+        block_size: Bytes of JSON parsed per block
+        row_group_bytes: Target in-memory size of a row group
+        compression: Parquet codec
+
+    Returns:
+        Dictionary with files, rows, JSON bytes, Parquet bytes, seconds and throughput (JSON MB/s)
+    """
+    started = time.perf_counter()
+    schema = schema or infer_json_schema(path)
+    output_dir = Path(output_dir).absolute()
+    staging = output_dir / f'.staging-{uuid.uuid4().hex}'
+    staging.mkdir(parents=True)
+    try:
+        files = _write_ranges(path, _ranges(path, max_workers, range_bytes), schema,
+                              lambda i: str(staging / f'part-{i:05d}.parquet'), {}, max_workers, block_size,
+                              row_group_bytes, compression)
+        for old in output_dir.glob('part-*.parquet'):
+            old.unlink()
+        for f in files:
+            os.replace(f['path'], output_dir / Path(f['path']).name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    parquet_bytes = sum(f.stat().st_size for f in output_dir.glob('part-*.parquet'))
+    return _summary(files, started, parquet_bytes=parquet_bytes)
+
+
+def ingest_jsonl_iceberg(catalog, identifier, path, schema: pa.Schema = None, max_workers: int = None,
+                         range_bytes: int = DEFAULT_RANGE_BYTES, block_size: int = DEFAULT_JSON_BLOCK_SIZE,
+                         row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES, compression: str = 'zstd') -> dict:
+    """
+    Append a JSON lines file to an Iceberg table in one snapshot, parsing byte ranges in parallel processes.
+
+    Each worker process parses a line-aligned byte range and writes one data file (with the
+    table's field ids) below the table location. All files are then added in a single fast
+    append, so the ingest is atomic: a failed worker leaves no snapshot behind, and its
+    already written files are deleted. A missing table is created, in the same commit, with the
+    schema given or inferred from the first lines.
+
+    Every worker writes its byte range to a single file, so partitioned tables aren't supported
+    (a ValueError is raised); ingest into an unpartitioned table, or use table.append() there.
+
+    Args:
+        catalog: PyIceberg catalog
+        identifier: Table identifier, e.g. 'iot.radiator'
+        path: JSON lines file, e.g. '../data/input/radiator.jsonl'
+        schema: Arrow schema of the records for a new table (default: inferred from the first lines)
+        max_workers: Number of processes (default: number of CPUs)
+        range_bytes: Largest JSON byte range per data file
+        block_size: Bytes of JSON parsed per block
+        row_group_bytes: Target in-memory size of a row group
+        compression: Parquet codec
+
+    Returns:
+        Dictionary with files, rows, JSON bytes, Parquet bytes, snapshot id, seconds and throughput (JSON MB/s)
+    """
+    started = time.perf_counter()
+    try:
+        tx = catalog.load_table(identifier).transaction()
+    except NoSuchTableError:
+        tx = catalog.create_table_transaction(identifier, schema=schema or infer_json_schema(path))
+    metadata = tx.table_metadata
+    if not metadata.spec().is_unpartitioned():
+        raise ValueError(f'{identifier} is partitioned; ingest_jsonl_iceberg() only writes unpartitioned tables')
+    arrow_schema = schema_to_pyarrow(metadata.schema())
+    write_uuid = uuid.uuid4()
+    location = metadata.location.rstrip('/')
+    properties = {**catalog.properties, **metadata.properties}
+    io = load_file_io(properties, location)
+
+    def _target(i):
+        return f'{location}/data/{write_uuid}-{i:05d}.parquet'
+
+    def _delete_files():
+        # No snapshot references the files
+        for i in range(len(ranges)):
+            try:
+                io.delete(_target(i))
+            except Exception:
+                pass
+
+    ranges = _ranges(path, max_workers, range_bytes)
+    try:
+        files = _write_ranges(path, ranges, arrow_schema, _target, properties, max_workers, block_size,
+                              row_group_bytes, compression)
+        footers = read_footers(io, metadata, [f['path'] for f in files], max_workers or os.cpu_count())
+        errors = [f'{p}: {error}' for p, _, error in footers if error is not None]
+        if errors:
+            raise ValueError(f'Written files do not match the table schema: {errors[0]}')
+        with tx.update_snapshot(snapshot_properties={'ingested-files': str(len(files))}).fast_append() as append:
+            for _, data_file, _ in footers:
+                append.append_data_file(data_file)
+    except BaseException:
+        _delete_files()
+        raise
+    try:
+        table = tx.commit_transaction()
+    except CommitFailedException:
+        # Rejected by the catalog; on any other error the commit may have landed, so the files stay
+        _delete_files()
+        raise
+    return _summary(files, started, parquet_bytes=sum(f.file_size_in_bytes for _, f, _ in footers),
+                    snapshot_id=table.current_snapshot().snapshot_id)
@@ -0,0 +1,479 @@
+import itertools
+import os
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+import boto3
+from pyiceberg.exceptions import CommitFailedException, ValidationException
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.io.pyarrow import ArrowScan, _dataframe_to_data_files
+from pyiceberg.manifest import ManifestContent
+from pyiceberg.table import TableProperties
+from pyiceberg.table.snapshots import Operation, Summary
+from pyiceberg.table.update.snapshot import _OverwriteFiles, _SnapshotProducer
+from pyiceberg.table.update.validate import _validate_data_files_exist, _validate_no_new_deletes_for_data_files
+from writes import order_rows, write_order
+
+
+def _as_replace(summary):
+    # PyIceberg only computes summary totals for append/overwrite/delete, so the totals
+    # are built as an overwrite and the operation is then relabelled as a replace.
+    return Summary(Operation.REPLACE, **summary.additional_properties)
+
+
+class _RewriteFiles(_OverwriteFiles):
+    """Replaces data files with rewritten copies of the same rows and commits a REPLACE snapshot."""
+
+    def _summary(self, snapshot_properties=None):
+        return _as_replace(super()._summary(snapshot_properties or {}))
+
+    def _validate_concurrency(self) -> None:
+        # A rewrite does not change table contents, so concurrent appends are fine. It only
+        # conflicts if a rewritten file was removed or received new deletes in the meantime.
+        if self._commit_window is None or self._commit_window.is_empty():
+            return
+        table = self._transaction._table
+        head, base = self._commit_window.head, self._commit_window.base
+        _validate_data_files_exist(table, head, self._deleted_data_files, base)
+        _validate_no_new_deletes_for_data_files(table, head, None, self._deleted_data_files, base)
+
+
+def table_target_file_size(table, override: int = None) -> int:
+    """Return the target data file size of a table (write.target-file-size-bytes), unless override is given."""
+    if override:
+        return override
+    return int(table.properties.get(TableProperties.WRITE_TARGET_FILE_SIZE_BYTES,
+                                    TableProperties.WRITE_TARGET_FILE_SIZE_BYTES_DEFAULT))
+
+
+def _bin_pack(tasks, target_size: int):
+    """First-fit decreasing: place each file into the first bin that still has room."""
+    bins = []
+    for task in sorted(tasks, key=lambda t: t.file.file_size_in_bytes, reverse=True):
+        size = task.file.file_size_in_bytes
+        for group in bins:
+            if group['bytes'] + size <= target_size:
+                group['tasks'].append(task)
+                group['bytes'] += size
+                break
+        else:
+            bins.append({'tasks': [task], 'bytes': size})
+    return bins
+
+
+def plan_compaction(table, target_file_size: int = None, min_file_size: int = None, min_input_files: int = 2):
+    """
+    Find undersized data files per partition and bin-pack them toward the target size.
+
+    File sizes, record counts and partitions come from the manifests of the current
+    snapshot; no data file is opened.
+
+    Args:
+        table: PyIceberg Table object
+        target_file_size: Desired output file size in bytes (default: write.target-file-size-bytes)
+        min_file_size: Files smaller than this are compaction candidates (default: 75% of target)
+        min_input_files: Only rewrite groups with at least this many files
+
+    Returns:
+        List of groups with 'spec_id', 'partition', 'tasks', 'bytes' and 'records'
+    """
+    target = table_target_file_size(table, target_file_size)
+    min_size = min_file_size if min_file_size is not None else int(target * 0.75)
+
+    candidates = defaultdict(list)
+    for task in table.scan().plan_files():
+        if task.file.file_size_in_bytes < min_size:
+            candidates[(task.file.spec_id, task.file.partition)].append(task)
+
+    groups = []
+    for (spec_id, partition), tasks in candidates.items():
+        for group in _bin_pack(tasks, target):
+            if len(group['tasks']) >= min_input_files:
+                group.update(spec_id=spec_id, partition=partition,
+                             records=sum(t.file.record_count for t in group['tasks']))
+                groups.append(group)
+    return groups
+
+
+def _rewrite_group(table, group, ordering, write_uuid, counter):
+    data = ArrowScan(table.metadata, table.io, table.schema(), AlwaysTrue()).to_table(group['tasks'])
+    data = order_rows(table, data, **ordering)
+    # The bin is already sized to the target on disk, so write it as a single file per partition
+    # instead of letting the writer split it by (uncompressed) in-memory size.
+    properties = {**table.metadata.properties, TableProperties.WRITE_TARGET_FILE_SIZE_BYTES: str(data.nbytes + 1)}
+    metadata = table.metadata.model_copy(update={'properties': properties})
+    return list(_dataframe_to_data_files(metadata, data, table.io, write_uuid=write_uuid, counter=counter))
+
+
+def compact_data_files(table, target_file_size: int = None, min_file_size: int = None, min_input_files: int = 2,
+                       sort_by=None, cluster_by=None, curve: str = 'zorder', max_workers: int = None,
+                       dry_run: bool = False) -> dict:
+    """
+    Bin-pack small data files into larger ones and commit the result as a REPLACE snapshot.
+
+    Groups are rewritten in parallel. The commit only fails if a rewritten file was deleted
+    or received delete files concurrently; concurrent appends are retained.
+
+    Args:
+        table: PyIceberg Table object
+        target_file_size: Desired output file size in bytes (default: write.target-file-size-bytes)
+        min_file_size: Files smaller than this are compaction candidates (default: 75% of target)
+        min_input_files: Only rewrite groups with at least this many files
+        sort_by: Optional column names or (column, 'ascending'|'descending') pairs to sort each
+            output file by
+        cluster_by: Optional columns to cluster each output file by along a space-filling curve
+        curve: 'zorder' or 'hilbert', used with cluster_by
+            Without sort_by and cluster_by, the table's write order is used (see writes.write_order())
+        max_workers: Number of groups rewritten in parallel
+        dry_run: Only plan, do not rewrite or commit
+
+    Returns:
+        Dictionary with the number of groups, files and bytes before and after
+    """
+    groups = plan_compaction(table, target_file_size, min_file_size, min_input_files)
+    result = {
+        'groups': len(groups),
+        'files_before': sum(len(g['tasks']) for g in groups),
+        'bytes_before': sum(g['bytes'] for g in groups),
+        'records': sum(g['records'] for g in groups),
+        'files_after': 0,
+        'bytes_after': 0,
+        'snapshot_id': None,
+    }
+    if dry_run or not groups:
+        return result
+
+    ordering = {'sort_by': sort_by, 'cluster_by': cluster_by, 'curve': curve}
+    order = 'linear' if sort_by else curve if cluster_by else write_order(table)['curve']
+    strategy = {'linear': 'sort', None: 'bin-pack'}.get(order, order)
+    write_uuid = uuid.uuid4()
+    counter = itertools.count(0)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        new_files = list(itertools.chain.from_iterable(
+            executor.map(lambda g: _rewrite_group(table, g, ordering, write_uuid, counter), groups)))
+
+    try:
+        tx = table.transaction()
+        rewrite = _RewriteFiles(operation=Operation.OVERWRITE, transaction=tx, io=table.io,
+                                snapshot_properties={'compaction.strategy': strategy})
+        for group in groups:
+            for task in group['tasks']:
+                rewrite.delete_data_file(task.file)
+        for data_file in new_files:
+            rewrite.append_data_file(data_file)
+        rewrite.commit()
+        tx.commit_transaction()
+    except (CommitFailedException, ValidationException):
+        # These guarantee the commit did not land, so nothing references the rewritten files
+        for data_file in new_files:
+            table.io.delete(data_file.file_path)
+        raise
+
+    result['files_after'] = len(new_files)
+    result['bytes_after'] = sum(f.file_size_in_bytes for f in new_files)
+    result['snapshot_id'] = table.current_snapshot().snapshot_id
+    return result
+
+
+def _partition_key(entry):
+    return tuple((value is None, value) for value in entry.data_file.partition)
+
+
+class _RewriteManifests(_SnapshotProducer):
+    """Rewrites small data manifests into fewer, partition-clustered ones and commits a REPLACE snapshot."""
+
+    def __init__(self, target_size: int, **kwargs):
+        super().__init__(operation=Operation.OVERWRITE, **kwargs)
+        self._target_size = target_size
+        self.rewritten = []
+        self.written = []
+
+    def _summary(self, snapshot_properties=None):
+        return _as_replace(super()._summary(snapshot_properties or {}))
+
+    def _deleted_entries(self):
+        return []
+
+    def _validate_concurrency(self) -> None:
+        # The rewrite doesn't change table contents, so concurrent appends are fine: their
+        # manifests are carried over by the next attempt. It only conflicts if a manifest it
+        # replaces is no longer part of the branch head.
+        if self._commit_window is None or self._commit_window.is_empty() or self._commit_window.head is None:
+            return
+        current = {m.manifest_path for m in self._commit_window.head.manifests(io=self._io)}
+        missing = [m.manifest_path for m in self.rewritten if m.manifest_path not in current]
+        if missing:
+            raise ValidationException(f'Manifest {missing[0]} was replaced by a concurrent commit')
+
+    def _existing_manifests(self):
+        # Recomputed from the branch head on every commit attempt, so manifests added by
+        # concurrent commits are carried over.
+        snapshot = self._transaction.table_metadata.snapshot_by_name(self._target_branch)
+        if snapshot is None:
+            return []
+
+        kept, small = [], defaultdict(list)
+        for manifest in snapshot.manifests(io=self._io):
+            if manifest.content == ManifestContent.DATA and manifest.manifest_length < self._target_size:
+                small[manifest.partition_spec_id].append(manifest)
+            else:
+                kept.append(manifest)
+
+        self.rewritten, self.written = [], []
+        for spec_id, manifests in small.items():
+            if len(manifests) < 2:
+                kept.extend(manifests)
+                continue
+            entries = list(itertools.chain.from_iterable(
+                m.fetch_manifest_entry(self._io, discard_deleted=True) for m in manifests))
+            # Manifest sizes are only known after writing, so roll over to a new manifest
+            # based on the average entry size of the manifests being replaced.
+            bytes_per_entry = sum(m.manifest_length for m in manifests) / max(len(entries), 1)
+            entries_per_manifest = max(int(self._target_size / max(bytes_per_entry, 1)), 1)
+            # Sorting by partition makes each manifest cover a narrow partition range, so its
+            # partition summary lets scan planning skip it for partition filters.
+            entries.sort(key=_partition_key)
+            for start in range(0, len(entries), entries_per_manifest):
+                with self.new_manifest_writer(self.spec(spec_id)) as writer:
+                    for entry in entries[start:start + entries_per_manifest]:
+                        writer.existing(entry)
+                self.written.append(writer.to_manifest_file())
+            self.rewritten.extend(manifests)
+        return kept + self.written
+
+
+def measure_planning(table, row_filter=AlwaysTrue(), repeat: int = 3) -> dict:
+    """
+    Time scan planning (manifest list and manifest reads) for a table.
+
+    Args:
+        table: PyIceberg Table object
+        row_filter: Filter expression or string used for planning, e.g. "type = 'alarm'"
+        repeat: Number of planning runs
+
+    Returns:
+        Dictionary with manifest count, planned files and first/best planning time in ms
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tasks = list(table.scan(row_filter=row_filter).plan_files())
+        timings.append((time.perf_counter() - start) * 1000)
+    snapshot = table.current_snapshot()
+    return {
+        'manifests': len(snapshot.manifests(table.io)) if snapshot else 0,
+        'planned_files': len(tasks),
+        'first_ms': timings[0],
+        'best_ms': min(timings),
+    }
+
+
+def rewrite_manifests(table, target_manifest_size: int = None, row_filter=AlwaysTrue()) -> dict:
+    """
+    Merge small data manifests into fewer, partition-clustered manifests of a target size.
+
+    Data files are not touched; only the manifest layer of the current snapshot is rewritten
+    and committed as a REPLACE snapshot. Planning time is measured before and after.
+
+    Args:
+        table: PyIceberg Table object
+        target_manifest_size: Desired manifest size in bytes (default: commit.manifest.target-size-bytes)
+        row_filter: Filter used to measure planning time
+
+    Returns:
+        Dictionary with manifest counts and planning times before and after
+    """
+    target = target_manifest_size or int(table.properties.get(TableProperties.MANIFEST_TARGET_SIZE_BYTES,
+                                                              TableProperties.MANIFEST_TARGET_SIZE_BYTES_DEFAULT))
+    before = measure_planning(table, row_filter)
+
+    tx = table.transaction()
+    rewrite = _RewriteManifests(target, transaction=tx, io=table.io,
+                                snapshot_properties={'manifests.rewritten': 'true'})
+    rewrite.commit()
+    if rewrite.rewritten:
+        tx.commit_transaction()
+    else:
+        rewrite._clean_all_uncommitted()
+
+    after = measure_planning(table, row_filter)
+    return {
+        'manifests_before': before['manifests'],
+        'manifests_after': after['manifests'],
+        'rewritten': len(rewrite.rewritten),
+        'written': len(rewrite.written),
+        'planning_ms_before': before['first_ms'],
+        'planning_ms_after': after['first_ms'],
+        'snapshot_id': table.current_snapshot().snapshot_id if rewrite.rewritten else None,
+    }
+
+
+DEFAULT_ORPHAN_GRACE_PERIOD = timedelta(days=3)
+S3_DELETE_BATCH_SIZE = 1000  # DeleteObjects accepts at most 1000 keys per request
+
+
+def normalize_path(path: str) -> str:
+    """Return a comparable URI: absolute file:// paths, and s3:// for s3a:// and s3n://."""
+    parsed = urlparse(path)
+    if parsed.scheme in ('', 'file'):
+        return 'file://' + os.path.abspath(parsed.path)
+    scheme = 's3' if parsed.scheme in ('s3a', 's3n') else parsed.scheme
+    return f'{scheme}://{parsed.netloc}{parsed.path}'
+
+
+def referenced_files(table, max_workers: int = None) -> set:
+    """
+    Collect every file referenced by the table's metadata, across all live snapshots.
+
+    This covers metadata.json files (current and logged), statistics files, manifest lists,
+    manifests, and data and delete files. Each distinct manifest is read once, in parallel.
+
+    Args:
+        table: PyIceberg Table object
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        Set of normalized file URIs
+    """
+    metadata = table.metadata
+    referenced = {table.metadata_location}
+    referenced.update(entry.metadata_file for entry in metadata.metadata_log)
+    referenced.update(f.statistics_path for f in getattr(metadata, 'statistics', []))
+    referenced.update(f.statistics_path for f in getattr(metadata, 'partition_statistics', []))
+
+    manifests = {}
+    for snapshot in metadata.snapshots:
+        referenced.add(snapshot.manifest_list)
+        for manifest in snapshot.manifests(table.io):
+            manifests.setdefault(manifest.manifest_path, manifest)
+    referenced.update(manifests)
+
+    def _read(manifest):
+        # Deleted entries are included: the file may still be live in an older snapshot
+        return [entry.data_file.file_path for entry in manifest.fetch_manifest_entry(table.io, discard_deleted=False)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for paths in executor.map(_read, manifests.values()):
+            referenced.update(paths)
+    return {normalize_path(path) for path in referenced}
+
+
+def _s3_client(table):
+    properties = table.io.properties
+    return boto3.client(
+        's3',
+        endpoint_url=properties.get('s3.endpoint'),
+        aws_access_key_id=properties.get('s3.access-key-id'),
+        aws_secret_access_key=properties.get('s3.secret-access-key'),
+        aws_session_token=properties.get('s3.session-token'),
+        region_name=properties.get('s3.region'),
+    )
+
+
+def list_files(table, location: str):
+    """Yield (uri, size, last_modified) for every object below a location."""
+    parsed = urlparse(location)
+    if parsed.scheme in ('', 'file'):
+        for root, _, files in os.walk(parsed.path):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                yield 'file://' + path, stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    else:
+        prefix = parsed.path.lstrip('/').rstrip('/') + '/'
+        paginator = _s3_client(table).get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=parsed.netloc, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield f's3://{parsed.netloc}/{obj["Key"]}', obj['Size'], obj['LastModified']
+
+
+def find_orphan_files(table, older_than=None, max_workers: int = None) -> list:
+    """
+    List files below the table location that no live snapshot references.
+
+    Files newer than the grace period are never reported: they may belong to a write that
+    has not committed yet.
+
+    Args:
+        table: PyIceberg Table object
+        older_than: Only report files last modified before this datetime (default: 3 days ago)
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        List of dictionaries with 'path', 'size' and 'last_modified'
+    """
+    if older_than is None:
+        older_than = datetime.now(timezone.utc) - DEFAULT_ORPHAN_GRACE_PERIOD
+    elif older_than.tzinfo is None:
+        older_than = older_than.astimezone(timezone.utc)
+
+    referenced = referenced_files(table, max_workers)
+    return [
+        {'path': path, 'size': size, 'last_modified': modified}
+        for path, size, modified in list_files(table, table.location())
+        if modified < older_than and normalize_path(path) not in referenced
+    ]
+
+
+def _delete_batch(table, paths):
+    parsed = [urlparse(path) for path in paths]
+    if parsed[0].scheme == 'file':
+        errors = []
+        for path, p in zip(paths, parsed):
+            try:
+                os.remove(p.path)
+            except OSError as e:
+                # e.g. already removed by a concurrent cleanup; keep deleting the rest
+                errors.append(f'{path}: {e.strerror}')
+        return len(paths) - len(errors), errors
+    response = _s3_client(table).delete_objects(
+        Bucket=parsed[0].netloc,
+        Delete={'Objects': [{'Key': p.path.lstrip('/')} for p in parsed], 'Quiet': True},
+    )
+    errors = [f"s3://{parsed[0].netloc}/{e['Key']}: {e.get('Message', e.get('Code'))}" for e in response.get('Errors', [])]
+    return len(paths) - len(errors), errors
+
+
+def remove_orphan_files(table, older_than=None, dry_run: bool = False, max_workers: int = 8,
+                        batch_size: int = S3_DELETE_BATCH_SIZE) -> dict:
+    """
+    Delete unreferenced files below the table location, e.g. after expire_snapshots().
+
+    Deletes are grouped into batches (one DeleteObjects request per batch on S3) and at
+    most max_workers batches run at the same time.
+
+    Args:
+        table: PyIceberg Table object
+        older_than: Only delete files last modified before this datetime (default: 3 days ago)
+        dry_run: Only report orphan files, do not delete them
+        max_workers: Maximum number of concurrent manifest reads and delete requests
+        batch_size: Number of files per delete request
+
+    Returns:
+        Dictionary with orphan count and bytes, deleted count, errors and the orphan paths
+    """
+    orphans = find_orphan_files(table, older_than, max_workers)
+    result = {
+        'orphan_files': len(orphans),
+        'orphan_bytes': sum(o['size'] for o in orphans),
+        'deleted': 0,
+        'errors': [],
+        'paths': [o['path'] for o in orphans],
+    }
+    if dry_run or not orphans:
+        return result
+
+    # A batch must stay within one bucket; S3 deletes address a single bucket per request
+    by_bucket = defaultdict(list)
+    for path in result['paths']:
+        by_bucket[urlparse(path).netloc].append(path)
+    batches = [paths[i:i + batch_size] for paths in by_bucket.values() for i in range(0, len(paths), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for deleted, errors in executor.map(lambda batch: _delete_batch(table, batch), batches):
+            result['deleted'] += deleted
+            result['errors'].extend(errors)
+    return result
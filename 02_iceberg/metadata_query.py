@@ -0,0 +1,210 @@
+import re
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyiceberg.conversions import from_bytes
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.expressions.parser import parse
+from pyiceberg.io.pyarrow import ArrowScan, schema_to_pyarrow
+from pyiceberg.types import BinaryType, DoubleType, FloatType, StringType
+from deletes import must_match_evaluator
+
+AGGREGATES = ('count', 'min', 'max')
+METRICS_DEFAULT = 'write.metadata.metrics.default'
+METRICS_COLUMN = 'write.metadata.metrics.column.'
+METRICS_DEFAULT_MODE = 'truncate(16)'
+
+_AGGREGATE = re.compile(r'^(count|min|max)\s*\(\s*(\*|\w+|"[^"]+")\s*\)(?:\s+as\s+(\w+|"[^"]+"))?$', re.IGNORECASE)
+_QUERY = re.compile(r'^\s*select\s+(.+?)\s+from\s+([\w.]+)(?:\s+where\s+(.+?))?\s*;?\s*$', re.IGNORECASE | re.DOTALL)
+# Daft needs typed literals to compare with temporal columns; PyIceberg binds plain ISO-8601 strings
+_TYPED_LITERAL = re.compile(r"cast\(\s*'([^']*)'\s+as\s+(?:timestamp|date)\s*\)|'([^']*)'::(?:timestamp|date)\b|\bdate\s+'([^']*)'",
+                            re.IGNORECASE)
+
+
+def _iso_literal(match) -> str:
+    value = next(group for group in match.groups() if group is not None)
+    return "'" + re.sub(r'^(\d{4}-\d{2}-\d{2}) ', r'\1T', value) + "'"
+
+
+def parse_aggregate_query(sql: str):
+    """
+    Recognize 'SELECT COUNT(*) | COUNT(col) | MIN(col) | MAX(col), ... FROM table [WHERE filter]'.
+
+    Output names follow Daft: COUNT(*) is named 'count', the others after their column.
+
+    Returns:
+        Dictionary with table name, aggregates (name -> (function, column or None)) and row
+        filter (PyIceberg expression), or None if the query has another shape
+    """
+    match = _QUERY.match(sql)
+    if match is None:
+        return None
+    select, table, where = match.groups()
+    aggregates = {}
+    for item in select.split(','):
+        aggregate = _AGGREGATE.match(item.strip())
+        if aggregate is None:
+            return None
+        function, column, name = aggregate.groups()
+        column = None if column == '*' else column.strip('"')
+        if column is None and function.lower() != 'count':
+            return None
+        name = name.strip('"') if name else (column or 'count')
+        if name in aggregates:
+            return None
+        aggregates[name] = (function.lower(), column)
+    try:
+        row_filter = parse(_TYPED_LITERAL.sub(_iso_literal, where)) if where else AlwaysTrue()
+    except Exception:
+        # Not in PyIceberg's filter syntax; the query engine handles it
+        return None
+    return {'table': table, 'aggregates': aggregates, 'row_filter': row_filter}
+
+
+def _truncate_length(properties: dict, column: str):
+    """Return the length string bounds are truncated to (None: not truncated, 0: no bounds)."""
+    mode = properties.get(METRICS_COLUMN + column, properties.get(METRICS_DEFAULT, METRICS_DEFAULT_MODE))
+    if mode == 'full':
+        return None
+    truncate = re.fullmatch(r'truncate\((\d+)\)', mode)
+    return int(truncate.group(1)) if truncate else 0
+
+
+def _exact_bound(field, value, truncate_length) -> bool:
+    """Tell whether a decoded lower or upper bound is the actual min or max, not a truncated prefix."""
+    if isinstance(field.field_type, (StringType, BinaryType)):
+        return truncate_length is None or len(value) < truncate_length
+    return True
+
+
+def _file_bounds(data_file, field, truncate_length):
+    """
+    Return (lower, upper) of a column in a data file from the manifest entry.
+
+    Returns:
+        (None, None) if the column holds only nulls, or None if the bounds aren't exact
+    """
+    field_id = field.field_id
+    values, nulls = data_file.value_counts.get(field_id), data_file.null_value_counts.get(field_id)
+    if values is not None and nulls is not None and values == nulls:
+        return None, None
+    if isinstance(field.field_type, (FloatType, DoubleType)) and data_file.nan_value_counts.get(field_id) != 0:
+        # Bounds skip NaN, and the count is missing in older files
+        return None
+    lower, upper = data_file.lower_bounds.get(field_id), data_file.upper_bounds.get(field_id)
+    if lower is None or upper is None:
+        return None
+    lower, upper = from_bytes(field.field_type, lower), from_bytes(field.field_type, upper)
+    if not (_exact_bound(field, lower, truncate_length) and _exact_bound(field, upper, truncate_length)):
+        return None
+    return lower, upper
+
+
+def _from_metadata(data_file, aggregates: dict, fields: dict, truncate: dict):
+    """Return the partial aggregates of one fully matching data file, or None if it has to be read."""
+    partial = {}
+    for name, (function, column) in aggregates.items():
+        if column is None:
+            partial[name] = data_file.record_count
+            continue
+        field_id = fields[column].field_id
+        if function == 'count':
+            values, nulls = data_file.value_counts.get(field_id), data_file.null_value_counts.get(field_id)
+            if values is None or nulls is None:
+                return None
+            partial[name] = values - nulls
+            continue
+        bounds = _file_bounds(data_file, fields[column], truncate[column])
+        if bounds is None:
+            return None
+        partial[name] = bounds[0] if function == 'min' else bounds[1]
+    return partial
+
+
+def _min_max(values, function: str) -> pa.Scalar:
+    """Return MIN or MAX of an Arrow array the way Daft computes it: NaN sorts above every number."""
+    result = pc.min_max(values)[function]
+    if pa.types.is_floating(values.type) and (function == 'max' or not result.is_valid):
+        if pc.any(pc.is_nan(values)).as_py():
+            return pa.scalar(float('nan'), values.type)
+    return result
+
+
+def metadata_aggregate(table, aggregates: dict, row_filter=AlwaysTrue(), snapshot_id: int = None) -> dict:
+    """
+    Compute COUNT, MIN and MAX aggregates from manifest metadata where it is exact.
+
+    A data file is answered from its manifest entry (record count, value and null counts, lower
+    and upper bounds) when it has no delete files and its partition values or column bounds prove
+    that every row matches the filter. Only the remaining files are read, with the filter applied,
+    and MIN/MAX follow Daft's NaN ordering (NaN above every number), so the result matches the
+    query engine's; a COUNT(*) over a table without deletes reads no data file. String bounds are
+    used only if they weren't truncated. Float bounds are used only if the manifest records a NaN
+    count of 0; PyIceberg doesn't write NaN counts, so float MIN/MAX over its files are always
+    computed by reading them.
+
+    Args:
+        table: PyIceberg Table object
+        aggregates: Output name -> (function, column), function one of 'count', 'min', 'max';
+            column None for COUNT(*), e.g. {'rows': ('count', None), 'first': ('min', 'timestamp')}
+        row_filter: Filter expression, as string or PyIceberg expression
+        snapshot_id: Snapshot to query (default: current)
+
+    Returns:
+        Dictionary with result (one-row Arrow table), files, metadata_files, scanned_files and seconds
+    """
+    started = time.perf_counter()
+    if isinstance(row_filter, str):
+        row_filter = parse(row_filter)
+    for function, _ in aggregates.values():
+        if function not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate '{function}', expected one of {AGGREGATES}")
+
+    scan = table.scan(row_filter=row_filter, snapshot_id=snapshot_id)
+    schema = scan.projection()
+    columns = list(dict.fromkeys(column for _, column in aggregates.values() if column is not None))
+    fields = {column: schema.find_field(column) for column in columns}
+    truncate = {column: _truncate_length(table.properties, column) for column in columns}
+    must_match = must_match_evaluator(table, row_filter)
+
+    partials, scan_tasks, files = [], [], 0
+    for task in scan.plan_files():
+        files += 1
+        partial = None
+        if not task.delete_files and must_match(task.file):
+            partial = _from_metadata(task.file, aggregates, fields, truncate)
+        if partial is None:
+            scan_tasks.append(task)
+        else:
+            partials.append(partial)
+
+    types = {column: schema_to_pyarrow(fields[column].field_type) for column in columns}
+    if scan_tasks:
+        projected = schema.select(*(columns or [schema.columns[0].name]))
+        data = ArrowScan(table.metadata, table.io, projected, row_filter).to_table(scan_tasks)
+        partial = {}
+        for name, (function, column) in aggregates.items():
+            if column is None:
+                partial[name] = data.num_rows
+            elif function == 'count':
+                partial[name] = pc.count(data[column]).as_py()
+            else:
+                partial[name] = pa.array([_min_max(data[column], function).as_py()], types[column])
+        partials.append(partial)
+
+    result = {}
+    for name, (function, column) in aggregates.items():
+        if function == 'count':
+            result[name] = pa.array([sum(p[name] for p in partials)], pa.uint64())
+            continue
+        # Bounds are decoded to Iceberg's physical values (e.g. microseconds), scanned values are Arrow scalars
+        values = pa.concat_arrays([p[name] if isinstance(p[name], pa.Array) else pa.array([p[name]], types[column])
+                                   for p in partials] or [pa.array([], types[column])])
+        result[name] = pa.array([_min_max(values, function)], types[column])
+    return {'result': pa.table(result), 'files': files, 'metadata_files': len(partials) - bool(scan_tasks),
+            'scanned_files': len(scan_tasks), 'seconds': time.perf_counter() - started}
+
+
+def count_rows(table, row_filter=AlwaysTrue(), snapshot_id: int = None) -> int:
+    """Return the number of rows matching a filter, reading only the data files metadata can't answer for."""
+    return metadata_aggregate(table, {'count': ('count', None)}, row_filter, snapshot_id)['result']['count'][0].as_py()
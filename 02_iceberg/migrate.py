@@ -0,0 +1,126 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pyarrow.parquet as pq
+from pyiceberg.exceptions import NoSuchTableError
+from pyiceberg.io import load_file_io
+from pyiceberg.io.pyarrow import parquet_file_to_data_file
+from pyiceberg.table import TableProperties
+from maintenance import list_files, normalize_path, referenced_files
+
+DEFAULT_FILES_PER_COMMIT = 5000
+
+
+def list_parquet_files(location: str, properties: dict = None) -> list:
+    """
+    List the Parquet files below a local directory or an S3 prefix.
+
+    Args:
+        location: e.g. '../data/output/events_sorted' or 's3://bucket/lake/events'
+        properties: FileIO properties for S3 (s3.endpoint, s3.access-key-id, ...), e.g. catalog.properties
+
+    Returns:
+        Sorted list of file URIs
+    """
+    location = normalize_path(location)
+    io = SimpleNamespace(io=load_file_io(properties or {}, location))
+    return sorted(path for path, _, _ in list_files(io, location) if path.endswith('.parquet'))
+
+
+def read_footers(io, metadata, paths: list, max_workers: int) -> list:
+    """Build a DataFile (statistics from the footer) per path, or record why the file can't be added."""
+    def _read(path):
+        try:
+            return path, parquet_file_to_data_file(io, metadata, path), None
+        except Exception as e:
+            return path, None, f'{type(e).__name__}: {e}'
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_read, paths))
+
+
+def migrate_parquet(catalog, identifier, files, max_workers: int = 16,
+                    files_per_commit: int = DEFAULT_FILES_PER_COMMIT, skip_invalid: bool = False,
+                    dry_run: bool = False) -> dict:
+    """
+    Register existing Parquet files in an Iceberg table without rewriting them.
+
+    Only footers are read (in parallel): each file's schema is checked against the table schema
+    and its column statistics become the manifest entry. Files already in the table are
+    skipped, so an interrupted migration can simply be run again. A missing table is created
+    (unpartitioned) from the first file's schema, in the same commit as the first batch; create
+    a partitioned table beforehand if needed (every file must then hold a single partition).
+
+    The files stay where they are and are referenced by absolute path, so they must not be moved
+    or deleted outside Iceberg. Once a compaction or delete replaced them, expiring the old
+    snapshots deletes them like any other data file.
+
+    Args:
+        catalog: PyIceberg catalog
+        identifier: Table identifier, e.g. 'lake.events'
+        files: List of Parquet file paths, or a directory / S3 prefix to list
+        max_workers: Number of footers read in parallel
+        files_per_commit: Files added per snapshot (one manifest each)
+        skip_invalid: Add the compatible files even if some files don't match the schema
+        dry_run: Only read footers and validate; nothing is committed
+
+    Returns:
+        Dictionary with found, already registered, added and invalid files (with reasons),
+        commits, records, bytes and seconds
+    """
+    started = time.perf_counter()
+    if isinstance(files, str):
+        files = list_parquet_files(files, catalog.properties)
+    files = [normalize_path(str(f)) for f in files]
+
+    try:
+        table = catalog.load_table(identifier)
+        create = None
+        metadata, io = table.metadata, table.io
+        registered = referenced_files(table, max_workers)
+    except NoSuchTableError:
+        if not files:
+            raise ValueError(f'No Parquet files to create {identifier} from')
+        table = None
+        io = load_file_io(catalog.properties, files[0])
+        with io.new_input(files[0]).open() as f:
+            schema = pq.read_schema(f)
+        create = catalog.create_table_transaction(identifier, schema=schema)
+        metadata = create.table_metadata
+        registered = set()
+
+    pending = [f for f in files if f not in registered]
+    footers = read_footers(io, metadata, pending, max_workers)
+    data_files = [data_file for _, data_file, error in footers if error is None]
+    invalid = [{'path': path, 'error': error} for path, _, error in footers if error is not None]
+
+    result = {
+        'files': len(files),
+        'already_registered': len(files) - len(pending),
+        'added': 0,
+        'invalid': invalid,
+        'commits': 0,
+        'records': sum(f.record_count for f in data_files),
+        'bytes': sum(f.file_size_in_bytes for f in data_files),
+    }
+    if dry_run or (invalid and not skip_invalid) or not (data_files or create):
+        result['seconds'] = time.perf_counter() - started
+        return result
+
+    for start in range(0, max(len(data_files), 1), files_per_commit):
+        tx = create if create is not None else table.transaction()
+        if TableProperties.DEFAULT_NAME_MAPPING not in tx.table_metadata.properties:
+            # The files carry no Iceberg field ids, so readers resolve columns by name
+            tx.set_properties(**{TableProperties.DEFAULT_NAME_MAPPING: tx.table_metadata.schema().name_mapping.model_dump_json()})
+        batch = data_files[start:start + files_per_commit]
+        if batch:
+            with tx.update_snapshot(snapshot_properties={'migrated-files': str(len(batch))}).fast_append() as append:
+                for data_file in batch:
+                    append.append_data_file(data_file)
+        table = tx.commit_transaction()
+        create = None
+        result['added'] += len(batch)
+        result['commits'] += 1
+
+    result['seconds'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,377 @@
+import io
+import itertools
+import random
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.expressions.parser import parse
+from pyiceberg.expressions.visitors import expression_evaluator, inclusive_projection
+from pyiceberg.io.pyarrow import ArrowScan, _pyarrow_to_schema_without_ids
+from pyiceberg.manifest import DataFileContent
+from pyiceberg.partitioning import PartitionField, PartitionSpec
+from pyiceberg.schema import Schema, assign_fresh_schema_ids
+from pyiceberg.table import TableProperties
+from pyiceberg.transforms import (
+    BucketTransform,
+    DayTransform,
+    HourTransform,
+    IdentityTransform,
+    MonthTransform,
+    TruncateTransform,
+)
+from pyiceberg.typedef import Record
+from pyiceberg.types import DateType, TimestampType, TimestamptzType
+from maintenance import table_target_file_size
+
+HOT_PARTITION_FACTOR = 2.0  # a partition holding more than 2x the mean bytes is reported as hot
+MAX_IDENTITY_CARDINALITY = 100
+BUCKET_COUNTS = (8, 16, 64)
+
+
+def _snapshot(table, snapshot_id: int = None):
+    snapshot = table.snapshot_by_id(snapshot_id) if snapshot_id is not None else table.current_snapshot()
+    if snapshot is None:
+        raise ValueError(f"Snapshot {snapshot_id} not found" if snapshot_id is not None else "Table has no snapshots")
+    return snapshot
+
+
+def partition_files(table, snapshot_id: int = None, max_workers: int = None) -> pd.DataFrame:
+    """
+    List the live data and delete files of a snapshot with their partition, read from the manifests.
+
+    Only manifests are read (in parallel), so this works the same on local and S3 warehouses.
+
+    Args:
+        table: PyIceberg Table object
+        snapshot_id: Snapshot to inspect (default: current snapshot)
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        DataFrame with one row per file: spec_id, partition, content, file_path, file_size, record_count
+    """
+    snapshot = _snapshot(table, snapshot_id)
+    schema = table.schemas().get(snapshot.schema_id, table.schema()) if snapshot.schema_id is not None else table.schema()
+    specs = table.specs()
+
+    def _read(manifest):
+        return manifest.fetch_manifest_entry(table.io, discard_deleted=True)
+
+    columns = {'spec_id': [], 'partition': [], 'content': [], 'file_path': [], 'file_size': [], 'record_count': []}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for entries in executor.map(_read, snapshot.manifests(table.io)):
+            for entry in entries:
+                data_file = entry.data_file
+                columns['spec_id'].append(data_file.spec_id)
+                columns['partition'].append(specs[data_file.spec_id].partition_to_path(data_file.partition, schema))
+                columns['content'].append('data' if data_file.content == DataFileContent.DATA else 'deletes')
+                columns['file_path'].append(data_file.file_path)
+                columns['file_size'].append(data_file.file_size_in_bytes)
+                columns['record_count'].append(data_file.record_count)
+
+    files = pd.DataFrame(columns)
+    files['partition'] = files['partition'].replace('', '(unpartitioned)')
+    return files.astype({'spec_id': 'int32', 'file_size': 'int64', 'record_count': 'int64'})
+
+
+def _gini(values: np.ndarray) -> float:
+    if len(values) == 0 or values.sum() == 0:
+        return 0.0
+    values = np.sort(values)
+    n = len(values)
+    return float(2 * np.sum(np.arange(1, n + 1) * values) / (n * values.sum()) - (n + 1) / n)
+
+
+def partition_report(table, snapshot_id: int = None, small_file_size: int = None, max_workers: int = None) -> dict:
+    """
+    Summarize partition health (size, fragmentation) and skew across partitions for a snapshot.
+
+    Args:
+        table: PyIceberg Table object
+        snapshot_id: Snapshot to inspect (default: current snapshot)
+        small_file_size: Data files below this size count as small (default: 75% of write.target-file-size-bytes)
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        Dictionary with 'partitions' (DataFrame, one row per partition, largest first) and 'skew' (dict)
+    """
+    if small_file_size is None:
+        small_file_size = int(table_target_file_size(table) * 0.75)
+
+    files = partition_files(table, snapshot_id, max_workers)
+    data = files[files['content'] == 'data'].assign(small=lambda df: df['file_size'] < small_file_size)
+    keys = ['spec_id', 'partition']
+
+    partitions = data.groupby(keys).agg(
+        files=('file_size', 'size'),
+        bytes=('file_size', 'sum'),
+        records=('record_count', 'sum'),
+        small_files=('small', 'sum'),
+        min_file_bytes=('file_size', 'min'),
+        p50_file_bytes=('file_size', 'median'),
+        p90_file_bytes=('file_size', lambda s: s.quantile(0.9)),
+        max_file_bytes=('file_size', 'max'),
+    )
+    delete_files = files[files['content'] == 'deletes'].groupby(keys).size()
+    partitions['delete_files'] = delete_files.reindex(partitions.index, fill_value=0)
+    partitions['small_file_ratio'] = partitions['small_files'] / partitions['files']
+    partitions['share_of_bytes'] = partitions['bytes'] / partitions['bytes'].sum()
+    partitions['hot'] = partitions['bytes'] > HOT_PARTITION_FACTOR * partitions['bytes'].mean()
+    partitions['fragmented'] = partitions['small_files'] > 1
+    partitions = partitions.sort_values('bytes', ascending=False).reset_index()
+
+    sizes = partitions['bytes'].to_numpy(dtype='float64')
+    mean = sizes.mean() if len(sizes) else 0.0
+    skew = {
+        'partitions': len(partitions),
+        'data_files': len(data),
+        'delete_files': int(partitions['delete_files'].sum()),
+        'total_bytes': int(sizes.sum()),
+        'total_records': int(partitions['records'].sum()),
+        'small_file_ratio': float(data['small'].mean()) if len(data) else 0.0,
+        'mean_partition_bytes': float(mean),
+        'max_to_mean': float(sizes.max() / mean) if mean else 0.0,
+        'cv': float(sizes.std() / mean) if mean else 0.0,
+        'gini': _gini(sizes),
+        'top_partition_share': float(partitions['share_of_bytes'].iloc[0]) if len(partitions) else 0.0,
+        'hot_partitions': int(partitions['hot'].sum()),
+        'fragmented_partitions': int(partitions['fragmented'].sum()),
+    }
+    return {'partitions': partitions, 'skew': skew}
+
+
+def sample_table(table, sample_rows: int = 100_000, seed: int = 42) -> pa.Table:
+    """
+    Read a random sample of rows from randomly chosen data files of the current snapshot.
+
+    Whole files are picked until they hold enough rows, so the sample covers the table's
+    time span instead of just its first files.
+
+    Args:
+        table: PyIceberg Table object
+        sample_rows: Number of rows to return (at most)
+        seed: Random seed, for reproducible samples
+
+    Returns:
+        Arrow table with the sampled rows
+    """
+    rng = random.Random(seed)
+    tasks = list(table.scan().plan_files())
+    rng.shuffle(tasks)
+    chosen, rows = [], 0
+    for task in tasks:
+        if rows >= sample_rows:
+            break
+        chosen.append(task)
+        rows += task.file.record_count
+
+    data = ArrowScan(table.metadata, table.io, table.schema(), AlwaysTrue()).to_table(chosen)
+    if len(data) > sample_rows:
+        indices = np.sort(np.random.default_rng(seed).choice(len(data), sample_rows, replace=False))
+        data = data.take(indices)
+    return data
+
+
+def profile_columns(sample: pa.Table, schema: Schema) -> pd.DataFrame:
+    """
+    Profile the primitive columns of a sample: cardinality, nulls, value skew and time span.
+
+    Args:
+        sample: Arrow table, e.g. from sample_table()
+        schema: Iceberg schema of the table
+
+    Returns:
+        DataFrame with one row per column
+    """
+    rows = []
+    for field in schema.fields:
+        if not field.field_type.is_primitive or field.name not in sample.column_names:
+            continue
+        column = sample.column(field.name)
+        counts = pc.value_counts(column.drop_null()) if len(column) else pa.array([])
+        non_null = len(column) - column.null_count
+        minmax = pc.min_max(column) if non_null else None
+        span_days = None
+        if minmax is not None and isinstance(field.field_type, (TimestampType, TimestamptzType, DateType)):
+            span_days = (minmax['max'].as_py() - minmax['min'].as_py()).total_seconds() / 86400
+        rows.append({
+            'column': field.name,
+            'type': str(field.field_type),
+            'distinct': len(counts),
+            'null_fraction': column.null_count / len(column) if len(column) else 0.0,
+            'top_value_share': pc.max(counts.field('counts')).as_py() / non_null if non_null else 0.0,
+            'min': minmax['min'].as_py() if minmax is not None else None,
+            'max': minmax['max'].as_py() if minmax is not None else None,
+            'span_days': span_days,
+        })
+    return pd.DataFrame(rows)
+
+
+def candidate_fields(profile: pd.DataFrame, sample: pa.Table) -> list:
+    """
+    Suggest single partition fields per column from a profile.
+
+    * timestamp/date columns: hour (timestamps only), day and month
+    * string/int/long columns with at most 100 distinct values: identity
+    * string/int/long columns with more distinct values: bucket(8, 16, 64) and the truncate(w)
+      with the finest granularity that still yields at most 100 partitions
+
+    Returns:
+        List of (column, transform) tuples
+    """
+    fields = []
+    for row in profile.itertuples():
+        if row.type in ('timestamp', 'timestamptz'):
+            fields += [(row.column, HourTransform()), (row.column, DayTransform()), (row.column, MonthTransform())]
+        elif row.type == 'date':
+            fields += [(row.column, DayTransform()), (row.column, MonthTransform())]
+        elif row.type in ('string', 'int', 'long'):
+            if row.distinct <= MAX_IDENTITY_CARDINALITY:
+                fields.append((row.column, IdentityTransform()))
+                continue
+            fields += [(row.column, BucketTransform(n)) for n in BUCKET_COUNTS if n < row.distinct]
+            column = sample.column(row.column)
+            if row.type == 'string':
+                truncated = {w: pc.utf8_slice_codeunits(column, 0, w) for w in range(1, 9)}
+            else:
+                truncated = {10 ** e: pc.divide(column, 10 ** e) for e in range(1, 19)}
+            widths = [w for w, values in truncated.items()
+                      if 1 < pc.count_distinct(values).as_py() <= MAX_IDENTITY_CARDINALITY]
+            if widths:
+                # Longest string prefix / narrowest integer range that stays within the partition limit
+                fields.append((row.column, TruncateTransform(max(widths) if row.type == 'string' else min(widths))))
+    return fields
+
+
+def _spec(schema: Schema, fields) -> PartitionSpec:
+    return PartitionSpec(*[
+        PartitionField(source_id=schema.find_field(column).field_id, field_id=1000 + i,
+                       transform=transform, name=f'{column}_{i}')
+        for i, (column, transform) in enumerate(fields)
+    ])
+
+
+def _label(fields) -> str:
+    return ', '.join(f'{transform}({column})' for column, transform in fields) or 'unpartitioned'
+
+
+def simulate_spec(sample: pa.Table, schema: Schema, fields, predicates, total_rows: int, bytes_per_row: float,
+                  target_file_size: int) -> dict:
+    """
+    Estimate the partition layout of a spec and how much data each predicate can prune.
+
+    The sample's partition distribution is scaled to total_rows. Each partition is assumed to be
+    written as ceil(bytes / target_file_size) files. A predicate prunes a partition when its
+    inclusive projection onto the spec (the same test Iceberg uses during planning) rejects it.
+
+    Args:
+        sample: Arrow table with sampled rows
+        schema: Iceberg schema of the sample
+        fields: List of (column, transform) tuples; empty for an unpartitioned table
+        predicates: Dictionary of label -> PyIceberg expression
+        total_rows: Number of rows in the full table
+        bytes_per_row: Average compressed bytes per row
+        target_file_size: Target data file size in bytes
+
+    Returns:
+        Dictionary with spec label, partitions, files, file sizes and pruned fraction per predicate
+    """
+    spec = _spec(schema, fields)
+    names = [field.name for field in spec.fields]
+    partitioned = pa.table({
+        name: transform.pyarrow_transform(schema.find_field(column).field_type)(sample.column(column))
+        for name, (column, transform) in zip(names, fields)
+    } or {'_': pa.nulls(len(sample), pa.int8())})
+    groups = partitioned.group_by(partitioned.column_names).aggregate([([], 'count_all')])
+
+    shares = groups.column('count_all').to_numpy() / len(sample)
+    partition_bytes = shares * total_rows * bytes_per_row
+    files = np.maximum(1, np.ceil(partition_bytes / target_file_size))
+
+    partition_schema = Schema(*spec.partition_type(schema).fields)
+    values = groups.select(names).to_pylist() if names else [{}]
+    result = {
+        'spec': _label(fields),
+        'fields': list(fields),
+        'partitions': len(groups),
+        'files': int(files.sum()),
+        'files_per_partition': float(files.mean()),
+        'avg_file_bytes': float(partition_bytes.sum() / files.sum()),
+        'pruned': {},
+    }
+    for label, predicate in predicates.items():
+        evaluator = expression_evaluator(partition_schema, inclusive_projection(schema, spec)(predicate), True)
+        matches = np.array([evaluator(Record(*(row[name] for name in names))) for row in values])
+        result['pruned'][label] = float(shares[~matches].sum())
+    return result
+
+
+def advise_partition_spec(table, predicates, sample_rows: int = 100_000, candidates=None, max_fields: int = 2,
+                          total_rows: int = None, target_file_size: int = None) -> dict:
+    """
+    Rank candidate partition specs for a table against representative query predicates.
+
+    A sample is profiled, candidate fields are derived from the profile (see candidate_fields()),
+    and every spec of up to max_fields fields on distinct columns is simulated with simulate_spec().
+    Specs are ranked by score: the mean fraction of data pruned, discounted when the average file
+    would fall below 75% of the target file size.
+
+    Args:
+        table: PyIceberg Table object, or an Arrow table (e.g. before the Iceberg table exists)
+        predicates: Representative filters, as strings ("device_id = 'device_42'") or PyIceberg expressions
+        sample_rows: Number of rows to profile
+        candidates: Explicit specs to simulate, each a list of (column, transform) tuples
+        max_fields: Maximum number of fields in generated specs
+        total_rows: Rows in the full table (default: from the current snapshot, or the Arrow table's length)
+        target_file_size: Target data file size (default: write.target-file-size-bytes)
+
+    Returns:
+        Dictionary with 'profile' (DataFrame) and 'candidates' (DataFrame, best first)
+    """
+    if isinstance(table, pa.Table):
+        schema = assign_fresh_schema_ids(_pyarrow_to_schema_without_ids(table.schema, downcast_ns_timestamp_to_us=True))
+        sample = table if len(table) <= sample_rows else table.take(
+            np.sort(np.random.default_rng(42).choice(len(table), sample_rows, replace=False)))
+        total_rows = total_rows or len(table)
+        target_file_size = target_file_size or TableProperties.WRITE_TARGET_FILE_SIZE_BYTES_DEFAULT
+    else:
+        schema = table.schema()
+        sample = sample_table(table, sample_rows)
+        snapshot = table.current_snapshot()
+        total_rows = total_rows or (int(snapshot.summary['total-records']) if snapshot else len(sample))
+        target_file_size = target_file_size or table_target_file_size(table)
+    if len(sample) == 0:
+        raise ValueError("Cannot advise a partition spec for an empty table")
+
+    buffer = io.BytesIO()
+    pq.write_table(sample, buffer, compression='zstd')
+    bytes_per_row = buffer.tell() / len(sample)
+
+    profile = profile_columns(sample, schema)
+    predicates = {str(p): parse(p) if isinstance(p, str) else p for p in predicates}
+    if candidates is None:
+        fields = candidate_fields(profile, sample)
+        candidates = [[]] + [
+            list(combination)
+            for size in range(1, max_fields + 1)
+            for combination in itertools.combinations(fields, size)
+            if len({column for column, _ in combination}) == size
+        ]
+
+    rows = []
+    for fields in candidates:
+        result = simulate_spec(sample, schema, fields, predicates, total_rows, bytes_per_row, target_file_size)
+        pruned_by_predicate = result.pop('pruned')
+        pruned = list(pruned_by_predicate.values())
+        size_factor = min(1.0, result['avg_file_bytes'] / (0.75 * target_file_size))
+        result.update(pruned_mean=float(np.mean(pruned)) if pruned else 0.0,
+                      pruned_min=float(min(pruned)) if pruned else 0.0)
+        result['score'] = result['pruned_mean'] * size_factor
+        result.update({f'pruned: {label}': value for label, value in pruned_by_predicate.items()})
+        rows.append(result)
+
+    ranked = pd.DataFrame(rows).sort_values(['score', 'pruned_mean', 'partitions'], ascending=[False, False, True])
+    return {'profile': profile, 'candidates': ranked.reset_index(drop=True)}
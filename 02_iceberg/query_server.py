@@ -0,0 +1,311 @@
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+import daft
+import numpy as np
+import pyarrow as pa
+import pyarrow.flight as flight
+from catalogs import get_catalog
+from health import list_all_tables
+from metadata_query import metadata_aggregate, parse_aggregate_query
+from result_cache import DEFAULT_MAX_BYTES, ResultCache, snapshot_ids
+
+DEFAULT_LOCATION = 'grpc://127.0.0.1:8815'
+DEFAULT_CACHED_TABLES = 64
+LATENCY_WINDOW = 1000  # latest queries kept for the latency percentiles
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+
+
+def _binding_name(identifier: tuple) -> str:
+    return '__'.join(identifier)
+
+
+def _subn_outside_strings(pattern, replacement: str, sql: str) -> tuple:
+    """Like pattern.subn(), but leaves string literals ('...') as they are."""
+    parts, found = _STRING_LITERAL.split(sql), 0
+    for i in range(0, len(parts), 2):
+        parts[i], n = pattern.subn(replacement, parts[i])
+        found += n
+    return ''.join(parts), found
+
+
+class QueryServer(flight.FlightServerBase):
+    """
+    Long-lived Arrow Flight server answering SQL over the tables of an Iceberg catalog.
+
+    The process keeps the catalog (and its connection pool and metadata cache), the loaded
+    tables and their Daft DataFrames warm between requests. Per query the server only checks
+    the table's current metadata pointer in the catalog database; metadata.json files and
+    DataFrames are rebuilt only after a table got a new snapshot. Parquet footers aren't cached:
+    Daft reads the footers of the data files it scans on every query that isn't answered from
+    metadata or the result cache.
+
+    Tables are referenced in SQL as namespace.table, or by bare table name where unambiguous.
+    Requests are served concurrently by gRPC worker threads. COUNT/MIN/MAX queries over a single
+    table are answered from manifest metadata where it is exact. With a ResultCache, results are
+    reused until one of the queried tables commits a new snapshot.
+    """
+
+    def __init__(self, catalog, location: str = DEFAULT_LOCATION, namespaces=None,
+                 max_cached_tables: int = DEFAULT_CACHED_TABLES, result_cache=None, **kwargs):
+        """
+        Args:
+            catalog: PyIceberg catalog, ideally a PooledSqlCatalog from get_catalog()
+            location: 'grpc://127.0.0.1:<port>' (port 0 picks a free one) or 'grpc+unix:///path/to/socket'
+            namespaces: Namespaces whose tables can be queried (default: all)
+            max_cached_tables: Number of table versions kept warm (LRU)
+            result_cache: ResultCache for query results, or None
+            **kwargs: Passed to FlightServerBase, e.g. tls_certificates
+        """
+        super().__init__(location, **kwargs)
+        self.catalog = catalog
+        self.namespaces = namespaces
+        self.result_cache = result_cache
+        self._max_cached_tables = max_cached_tables
+        self._frames = OrderedDict()  # (identifier, metadata location) -> (table, DataFrame)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {'queries': 0, 'errors': 0, 'rows': 0, 'table_hits': 0, 'table_misses': 0, 'metadata_answers': 0,
+                      'active': 0}
+        self.refresh_tables()
+
+    def refresh_tables(self) -> list:
+        """Re-list the catalog's tables, e.g. after tables were created. Returns the identifiers."""
+        identifiers = list_all_tables(self.catalog, self.namespaces)
+        counts = Counter(identifier[-1] for identifier in identifiers)
+        # Longest names first, so 'demo.events_v2' isn't rewritten as 'demo.events' + '_v2'
+        qualified = sorted(identifiers, key=lambda i: -len('.'.join(i)))
+        with self._lock:
+            self._identifiers = identifiers
+            self._unique_names = {i[-1]: i for i in identifiers if counts[i[-1]] == 1}
+            self._qualified = [(re.compile(r'(?<![\w.])' + re.escape('.'.join(i)) + r'(?!\w)', re.IGNORECASE), i)
+                               for i in qualified]
+        return identifiers
+
+    @property
+    def identifiers(self) -> list:
+        """The queryable tables as of the last refresh_tables()."""
+        with self._lock:
+            return list(self._identifiers)
+
+    def _frame(self, identifier: tuple):
+        # load_table() reads the metadata pointer; PooledSqlCatalog only parses metadata.json when it moved
+        table = self.catalog.load_table(identifier)
+        key = (identifier, table.metadata_location)
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is not None:
+                self._frames.move_to_end(key)
+                self.stats['table_hits'] += 1
+                return cached
+        frame = daft.read_iceberg(table)
+        with self._lock:
+            self.stats['table_misses'] += 1
+            self._frames[key] = (table, frame)
+            while len(self._frames) > self._max_cached_tables:
+                self._frames.popitem(last=False)
+        return table, frame
+
+    def _plan(self, sql: str):
+        """
+        Rewrite qualified table names to binding names and load the tables the query uses.
+
+        Returns:
+            Rewritten SQL, binding name -> DataFrame, and 'namespace.table' -> Table
+        """
+        with self._lock:
+            qualified, unique_names = self._qualified, self._unique_names
+        bindings = {}
+        for pattern, identifier in qualified:
+            sql, found = _subn_outside_strings(pattern, _binding_name(identifier), sql)
+            if found:
+                bindings[_binding_name(identifier)] = identifier
+        for word in set(re.findall(r'\b\w+\b', ''.join(_STRING_LITERAL.split(sql)[::2]))):
+            if word in unique_names and word not in bindings:
+                bindings[word] = unique_names[word]
+        frames, tables = {}, {}
+        for name, identifier in bindings.items():
+            tables['.'.join(identifier)], frames[name] = self._frame(identifier)
+        return sql, frames, tables
+
+    def _answer_from_metadata(self, sql: str):
+        """Answer a COUNT/MIN/MAX query from the table's manifests, or return None to run it in Daft."""
+        parsed = parse_aggregate_query(sql)
+        if parsed is None:
+            return None
+        name = parsed['table']
+        with self._lock:
+            identifier = next((i for i in self._identifiers if '.'.join(i).lower() == name.lower()),
+                              self._unique_names.get(name))
+        if identifier is None:
+            return None
+        try:
+            result = metadata_aggregate(self.catalog.load_table(identifier), parsed['aggregates'], parsed['row_filter'])
+        except Exception:
+            # e.g. a column PyIceberg can't bind; Daft reports the error or handles the query
+            return None
+        with self._lock:
+            self.stats['metadata_answers'] += 1
+        return result['result']
+
+    def execute(self, sql: str):
+        """Plan a query and return its Daft DataFrame (not yet executed)."""
+        sql, frames, _ = self._plan(sql)
+        return daft.sql(sql, register_globals=False, **frames)
+
+    def _record(self, started: float, rows: int, failed: bool) -> None:
+        with self._lock:
+            self.stats['active'] -= 1
+            self.stats['queries'] += 1
+            self.stats['errors'] += failed
+            self.stats['rows'] += rows
+            self._latencies.append((time.perf_counter() - started) * 1000)
+
+    def do_get(self, context, ticket):
+        """Run the SQL query in the ticket and stream the result as record batches."""
+        started = time.perf_counter()
+        with self._lock:
+            self.stats['active'] += 1
+        query = ticket.ticket.decode()
+        try:
+            answer = self._answer_from_metadata(query)
+            if answer is not None:
+                self._record(started, answer.num_rows, False)
+                return flight.RecordBatchStream(answer)
+            sql, frames, tables = self._plan(query)
+            # The DataFrames read the table versions the cache key is built from
+            versions = snapshot_ids(tables)
+            if self.result_cache is not None:
+                cached = self.result_cache.get(query, versions)
+                if cached is not None:
+                    self._record(started, cached.num_rows, False)
+                    return flight.RecordBatchStream(cached)
+            frame = daft.sql(sql, register_globals=False, **frames)
+            schema = frame.schema().to_pyarrow_schema()
+        except Exception as e:
+            self._record(started, 0, True)
+            raise flight.FlightServerError(f'{type(e).__name__}: {e}')
+
+        def _batches():
+            rows, failed, collected = 0, True, []
+            try:
+                for batch in frame.to_arrow_iter():
+                    for record_batch in (batch.to_batches() if isinstance(batch, pa.Table) else [batch]):
+                        record_batch = record_batch.cast(schema) if record_batch.schema != schema else record_batch
+                        rows += record_batch.num_rows
+                        if self.result_cache is not None:
+                            collected.append(record_batch)
+                        yield record_batch
+                failed = False
+                if self.result_cache is not None:
+                    self.result_cache.put(query, versions, pa.Table.from_batches(collected, schema))
+            finally:
+                self._record(started, rows, failed)
+
+        return flight.GeneratorStream(schema, _batches())
+
+    def list_flights(self, context, criteria):
+        """List the queryable tables with their current schemas."""
+        for identifier in self.identifiers:
+            table = self.catalog.load_table(identifier)
+            yield flight.FlightInfo(table.schema().as_arrow(), flight.FlightDescriptor.for_path(*identifier),
+                                    [], -1, -1)
+
+    def list_actions(self, context):
+        return [('stats', 'Cache and latency statistics (JSON)'),
+                ('refresh', 'Re-list the catalog tables'),
+                ('clear', 'Drop the warm tables and DataFrames, and the cached results')]
+
+    def do_action(self, context, action):
+        if action.type == 'stats':
+            result = self.cache_info()
+        elif action.type == 'refresh':
+            result = {'tables': ['.'.join(i) for i in self.refresh_tables()]}
+        elif action.type == 'clear':
+            with self._lock:
+                self._frames.clear()
+            if self.result_cache is not None:
+                self.result_cache.clear()
+            result = {'cleared': True}
+        else:
+            raise flight.FlightServerError(f'Unknown action {action.type!r}')
+        yield flight.Result(json.dumps(result).encode())
+
+    def cache_info(self) -> dict:
+        """Return query counts, warm tables, latency percentiles (ms) and the catalog's metadata cache info."""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            info = {**self.stats, 'warm_tables': len(self._frames), 'capacity': self._max_cached_tables}
+        if len(latencies):
+            info.update(p50_ms=float(np.percentile(latencies, 50)), p95_ms=float(np.percentile(latencies, 95)),
+                        max_ms=float(latencies.max()))
+        if hasattr(self.catalog, 'cache_info'):
+            info['metadata_cache'] = self.catalog.cache_info()
+        if self.result_cache is not None:
+            info['result_cache'] = self.result_cache.cache_info()
+        return info
+
+
+def start_server(catalog, location: str = 'grpc://127.0.0.1:0', **kwargs) -> QueryServer:
+    """
+    Start a QueryServer in a background thread of this process, e.g. from a notebook.
+
+    Returns:
+        The running server; its address is f'grpc://127.0.0.1:{server.port}'. Call server.shutdown() to stop it.
+    """
+    server = QueryServer(catalog, location, **kwargs)
+    threading.Thread(target=server.serve, daemon=True, name='query-server').start()
+    return server
+
+
+def query(location, sql: str) -> pa.Table:
+    """
+    Run a query on a QueryServer.
+
+    Args:
+        location: Server address, e.g. 'grpc://127.0.0.1:8815', or a FlightClient to reuse
+        sql: SQL query, e.g. 'SELECT type, COUNT(*) AS n FROM demo.events GROUP BY type'
+
+    Returns:
+        Arrow table (use client.do_get(flight.Ticket(sql)) to stream batches instead)
+    """
+    client = location if isinstance(location, flight.FlightClient) else flight.connect(location)
+    return client.do_get(flight.Ticket(sql.encode())).read_all()
+
+
+def server_stats(location) -> dict:
+    """Return the cache and latency statistics of a QueryServer."""
+    client = location if isinstance(location, flight.FlightClient) else flight.connect(location)
+    return json.loads(next(client.do_action(flight.Action('stats', b''))).body.to_pybytes())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Serve SQL over the tables of an Iceberg SQL catalog via Arrow Flight.')
+    parser.add_argument('--uri', required=True, help="Catalog database URI, e.g. 'sqlite:///catalog.db'")
+    parser.add_argument('--warehouse', required=True, help="Warehouse location, e.g. 'file:///data/warehouse'")
+    parser.add_argument('--name', default='default', help='Catalog name')
+    parser.add_argument('--property', '-p', action='append', default=[], metavar='KEY=VALUE',
+                        help='Additional catalog property, e.g. s3.endpoint=http://localhost:9000 (repeatable)')
+    parser.add_argument('--namespace', '-n', action='append', help='Namespace to serve (repeatable, default: all)')
+    parser.add_argument('--location', default=DEFAULT_LOCATION,
+                        help="Listen address, e.g. grpc://127.0.0.1:8815 or grpc+unix:///tmp/query.sock")
+    parser.add_argument('--cache-dir', help='Directory for cached query results (default: no result cache)')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_MAX_BYTES // 2**20, help='Size of the result cache in MB')
+    args = parser.parse_args(argv)
+
+    properties = dict(p.split('=', 1) for p in args.property)
+    catalog = get_catalog(args.name, args.uri, args.warehouse, **properties)
+    namespaces = [tuple(n.split('.')) for n in args.namespace] if args.namespace else None
+    result_cache = ResultCache(args.cache_dir, args.cache_mb * 2**20) if args.cache_dir else None
+    server = QueryServer(catalog, args.location, namespaces=namespaces, result_cache=result_cache)
+    print(f"Serving {len(server.identifiers)} tables on {args.location.replace(':0', f':{server.port}')}")
+    server.serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
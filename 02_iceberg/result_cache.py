@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import pyarrow as pa
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_ENTRY_FRACTION = 0.25  # larger results would evict too much of the cache
+
+# Quoted strings and identifiers are kept verbatim; comments and whitespace runs are not
+_SQL_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(--[^\n]*|/\*.*?\*/)|(\s+)""", re.DOTALL)
+
+
+def normalize_sql(sql: str) -> str:
+    """Return the query without comments, with whitespace collapsed and no trailing semicolon."""
+    parts, separated, position = [], False, 0
+    for match in _SQL_TOKENS.finditer(sql + ' '):
+        for text in (sql[position:match.start()], match.group(1)):
+            if text:
+                if separated and parts:
+                    parts.append(' ')
+                parts.append(text)
+                separated = False
+        separated = separated or match.group(1) is None
+        position = match.end()
+    return ''.join(parts).rstrip(';').rstrip()
+
+
+def cache_key(sql: str, snapshots: dict) -> str:
+    """
+    Return the cache key of a query over tables at given snapshots.
+
+    Args:
+        sql: SQL query
+        snapshots: Table name -> snapshot id (None for a table without snapshots)
+    """
+    versions = sorted((str(table), snapshot_id) for table, snapshot_id in snapshots.items())
+    return hashlib.sha256(json.dumps([normalize_sql(sql), versions]).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Disk cache of query results, keyed by query text and the snapshot ids of the tables it reads.
+
+    Snapshots are immutable, so a cached result never goes stale: when a table commits, its
+    new snapshot id changes the key and the next query misses. Results are Arrow IPC files,
+    memory-mapped on a hit. The least recently used results are deleted when the cache grows
+    beyond max_bytes; the order survives restarts through the files' modification times.
+    """
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES, max_entry_bytes: int = None):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+            max_bytes: Total size of the cached results
+            max_entry_bytes: Larger results aren't cached (default: a quarter of max_bytes)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or int(max_bytes * DEFAULT_MAX_ENTRY_FRACTION)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'skipped': 0}
+        files = sorted(self.directory.glob('*.arrow'), key=lambda f: f.stat().st_mtime)
+        self._entries = OrderedDict((f.stem, f.stat().st_size) for f in files)
+        self._bytes = sum(self._entries.values())
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.arrow'
+
+    def get(self, sql: str, snapshots: dict):
+        """Return the cached result (Arrow table) of a query at the given snapshots, or None."""
+        key = cache_key(sql, snapshots)
+        with self._lock:
+            if key not in self._entries:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+            with pa.memory_map(str(path)) as source:
+                return pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            # Removed by another process sharing the directory
+            with self._lock:
+                self._bytes -= self._entries.pop(key, 0)
+            return None
+
+    def put(self, sql: str, snapshots: dict, result: pa.Table) -> bool:
+        """Store a query result; returns False if it is too large to cache."""
+        key = cache_key(sql, snapshots)
+        if result.nbytes > self.max_entry_bytes:
+            with self._lock:
+                self.stats['skipped'] += 1
+            return False
+        path = self._path(key)
+        temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        with pa.OSFile(str(temporary), 'wb') as sink, pa.ipc.new_file(sink, result.schema) as writer:
+            writer.write_table(result)
+        os.replace(temporary, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self.stats['stores'] += 1
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted.append(old_key)
+            self.stats['evictions'] += len(evicted)
+        for old_key in evicted:
+            self._path(old_key).unlink(missing_ok=True)
+        return True
+
+    def clear(self) -> None:
+        """Delete all cached results."""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+
+    def cache_info(self) -> dict:
+        """Return entries, size and hit/miss statistics."""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes, **self.stats}
+
+
+def load_tables(catalog, identifiers) -> dict:
+    """Return 'namespace.table' -> PyIceberg Table for table identifiers (strings or tuples)."""
+    tables = {}
+    for identifier in identifiers:
+        identifier = tuple(identifier.split('.')) if isinstance(identifier, str) else tuple(identifier)
+        tables['.'.join(identifier)] = catalog.load_table(identifier)
+    return tables
+
+
+def snapshot_ids(tables: dict) -> dict:
+    """Return name -> current snapshot id (None if the table has none) for loaded tables."""
+    return {name: (table.current_snapshot().snapshot_id if table.current_snapshot() else None)
+            for name, table in tables.items()}
+
+
+def cached_query(cache: ResultCache, catalog, sql: str, identifiers, run):
+    """
+    Answer a query from the cache, or run it and cache the result.
+
+    run() gets the tables as loaded for the cache key, so a commit landing meanwhile can't put a
+    newer result under an older snapshot's key.
+
+    Example:
+        cached_query(cache, catalog, sql, ['demo.events'],
+                     lambda tables: daft.sql(sql, events=daft.read_iceberg(tables['demo.events'])).to_arrow())
+
+    Args:
+        cache: ResultCache
+        catalog: PyIceberg catalog holding the tables
+        sql: Query text (part of the key)
+        identifiers: Identifiers of the tables the query reads
+        run: Callable taking 'namespace.table' -> Table and returning the result as an Arrow table
+
+    Returns:
+        Arrow table
+    """
+    tables = load_tables(catalog, identifiers)
+    versions = snapshot_ids(tables)
+    result = cache.get(sql, versions)
+    if result is None:
+        result = run(tables)
+        cache.put(sql, versions, result)
+    return result
@@ -0,0 +1,366 @@
+import hashlib
+import json
+import os
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyiceberg.exceptions import NoSuchTableError
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.expressions.parser import parse
+from pyiceberg.io.pyarrow import ArrowScan
+from pyiceberg.manifest import DataFileContent, ManifestEntryStatus
+from pyiceberg.table import FileScanTask
+from pyiceberg.table.snapshots import Operation
+
+MEASURES = ('count', 'sum', 'min', 'max', 'approx_distinct')
+DEFAULT_PRECISION = 12  # HyperLogLog registers: 2^12 bytes per group, about 1.6% standard error
+SKETCH_SUFFIX = '_sketch'
+
+# The refresh state is kept with the rollup itself: in the table properties of an Iceberg
+# rollup, or in the schema metadata of a Parquet rollup.
+SOURCE_SNAPSHOT_PROPERTY = 'rollup.source-snapshot-id'
+DEFINITION_PROPERTY = 'rollup.definition'
+
+
+def define_rollup(group_by, measures: dict, derived: dict = None, row_filter: str = None,
+                  precision: int = DEFAULT_PRECISION) -> dict:
+    """
+    Describe a rollup: source rows grouped by some columns, with mergeable measures per group.
+
+    Example:
+        define_rollup(
+            group_by=['week', 'type'],
+            measures={'events': ('count', None), 'sources': ('approx_distinct', 'source'),
+                      'last_seen': ('max', 'time')},
+            derived={'week': (['time'], lambda t: pc.floor_temporal(t['time'], unit='week'))},
+        )
+
+    Args:
+        group_by: Column names to group by (source or derived columns)
+        measures: Output name -> (function, source column); functions are 'count' (column None
+            counts rows), 'sum', 'min', 'max' and 'approx_distinct' (HyperLogLog)
+        derived: Column name -> (source columns, function computing an Arrow array from a table
+            of those columns), e.g. a truncated timestamp
+        row_filter: Only aggregate source rows matching this filter expression
+        precision: HyperLogLog precision; each approx_distinct measure keeps 2^precision bytes per group
+
+    Returns:
+        Rollup definition for refresh_rollup()
+    """
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by)
+    for name, (function, column) in measures.items():
+        if function not in MEASURES:
+            raise ValueError(f"Unknown measure function {function!r} for {name!r}, expected one of {MEASURES}")
+        if column is None and function != 'count':
+            raise ValueError(f"Measure {name!r} ({function}) needs a source column")
+    if not 4 <= precision <= 18:
+        raise ValueError('precision must be between 4 and 18')
+    return {'group_by': group_by, 'measures': dict(measures), 'derived': dict(derived or {}),
+            'row_filter': row_filter, 'precision': precision}
+
+
+def _code_key(code) -> str:
+    # Bytecode, constants and referenced names, e.g. unit='week' and pc.floor_temporal, recursing
+    # into nested functions; repr() of a code object or frozenset isn't stable across processes
+    def _constant(value):
+        if isinstance(value, types.CodeType):
+            return _code_key(value)
+        if isinstance(value, frozenset):
+            return sorted(repr(v) for v in value)
+        return repr(value)
+
+    return json.dumps([code.co_code.hex(), [_constant(c) for c in code.co_consts], code.co_names])
+
+
+def _function_key(function) -> str:
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return f"{getattr(function, '__module__', '')}.{getattr(function, '__qualname__', repr(function))}"
+    return _code_key(code)
+
+
+def _fingerprint(rollup: dict) -> str:
+    # Changing a derived column's function rebuilds the rollup. Values it captures from enclosing
+    # scopes aren't part of its code, and neither are the bodies of functions it calls.
+    definition = {**rollup, 'derived': {name: [columns, _function_key(function)]
+                                        for name, (columns, function) in rollup['derived'].items()}}
+    return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _source_columns(rollup: dict) -> tuple:
+    columns = [c for c in rollup['group_by'] if c not in rollup['derived']]
+    columns += [column for _, column in rollup['measures'].values() if column is not None]
+    for inputs, _ in rollup['derived'].values():
+        columns += inputs
+    return tuple(dict.fromkeys(columns)) or ('*',)
+
+
+def _leading_zeros(values: np.ndarray) -> np.ndarray:
+    # Branch-free count of leading zero bits of non-zero uint64 values
+    count = np.zeros(len(values), dtype=np.uint8)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        high_zero = values < np.uint64(1 << (64 - shift))
+        count[high_zero] += shift
+        values[high_zero] <<= np.uint64(shift)
+    return count
+
+
+def _sketch(values: pa.Array, groups: np.ndarray, n_groups: int, precision: int) -> np.ndarray:
+    """Return HyperLogLog registers (n_groups x 2^precision, uint8) of the non-null values per group."""
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    valid = pc.is_valid(values).to_numpy(zero_copy_only=False)
+    if not valid.any():
+        return registers
+    hashes = pd.util.hash_array(values.filter(pa.array(valid)).to_numpy(zero_copy_only=False))
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    # A guard bit caps the rank at 64 - precision + 1
+    rank = _leading_zeros((hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))) + 1
+    np.maximum.at(registers, (groups[valid], index), rank)
+    return registers
+
+
+def _estimate(registers: np.ndarray) -> np.ndarray:
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    # Linear counting is more accurate for small cardinalities
+    small = (estimate <= 2.5 * m) & (zeros > 0)
+    estimate[small] = m * np.log(m / zeros[small])
+    return np.round(estimate).astype(np.int64)
+
+
+def _to_sketch_array(registers: np.ndarray) -> pa.Array:
+    n, m = registers.shape
+    return pa.FixedSizeBinaryArray.from_buffers(pa.binary(m), n, [None, pa.py_buffer(registers.tobytes())])
+
+
+def _from_sketch_array(sketches, precision: int) -> np.ndarray:
+    # Iceberg may hand fixed[n] back as variable binary, so go through bytes
+    return np.frombuffer(b''.join(sketches.to_pylist()), dtype=np.uint8).reshape(-1, 1 << precision)
+
+
+def _group(table: pa.Table, keys: list, aggregations: list, sketches: dict, precision: int, from_sketches: bool) -> pa.Table:
+    """Group rows by keys, computing Arrow aggregations and merging HyperLogLog sketches per group."""
+    table = table.append_column('__row', pa.array(np.arange(len(table), dtype=np.int64)))
+    grouped = table.group_by(keys, use_threads=False).aggregate(aggregations + [('__row', 'list')])
+    rows = grouped['__row_list'].combine_chunks()
+    groups = np.empty(len(table), dtype=np.int64)
+    groups[pc.list_flatten(rows).to_numpy()] = np.repeat(np.arange(len(grouped)), pc.list_value_length(rows).to_numpy())
+
+    result = grouped.drop_columns(['__row_list'])
+    for name, column in sketches.items():
+        if from_sketches:
+            registers = np.zeros((len(grouped), 1 << precision), dtype=np.uint8)
+            np.maximum.at(registers, groups, _from_sketch_array(table[column], precision))
+        else:
+            registers = _sketch(table[column].combine_chunks(), groups, len(grouped), precision)
+        result = result.append_column(name, pa.array(_estimate(registers)))
+        result = result.append_column(name + SKETCH_SUFFIX, _to_sketch_array(registers))
+    return result
+
+
+def _aggregate(data: pa.Table, rollup: dict) -> pa.Table:
+    """Aggregate source rows into rollup rows."""
+    for name, (inputs, function) in rollup['derived'].items():
+        data = data.append_column(name, function(data.select(inputs)))
+    aggregations, outputs, sketches = {}, {}, {}
+    for name, (function, column) in rollup['measures'].items():
+        if function == 'approx_distinct':
+            sketches[name] = column
+        elif function == 'count' and column is None:
+            outputs[name] = 'count_all'
+            aggregations['count_all'] = ([], 'count_all')
+        else:
+            outputs[name] = f'{column}_{function}'
+            aggregations[outputs[name]] = (column, function)
+    result = _group(data, rollup['group_by'], list(aggregations.values()), sketches, rollup['precision'], from_sketches=False)
+    return _finish(result, rollup, outputs)
+
+
+def _merge(parts: list, rollup: dict) -> pa.Table:
+    """Merge rollup rows of the same groups: counts and sums add up, min/max and sketches combine."""
+    combine = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}
+    aggregations, outputs, sketches = [], {}, {}
+    for name, (function, _) in rollup['measures'].items():
+        if function == 'approx_distinct':
+            sketches[name] = name + SKETCH_SUFFIX
+        else:
+            aggregations.append((name, combine[function]))
+            outputs[name] = f'{name}_{combine[function]}'
+    table = pa.concat_tables(parts, promote_options='permissive')
+    result = _group(table, rollup['group_by'], aggregations, sketches, rollup['precision'], from_sketches=True)
+    return _finish(result, rollup, outputs)
+
+
+def _finish(result: pa.Table, rollup: dict, outputs: dict) -> pa.Table:
+    """Name the Arrow aggregates ('<column>_<function>') after their measures, in definition order."""
+    arrays, names = [result[key] for key in rollup['group_by']], list(rollup['group_by'])
+    for name, (function, _) in rollup['measures'].items():
+        if function == 'approx_distinct':
+            arrays += [result[name], result[name + SKETCH_SUFFIX]]
+            names += [name, name + SKETCH_SUFFIX]
+        else:
+            arrays.append(result[outputs[name]])
+            names.append(name)
+    return pa.table(arrays, names=names).sort_by([(key, 'ascending') for key in rollup['group_by']])
+
+
+def _added_data_files(source, since_snapshot_id: int, snapshot, max_workers: int = None):
+    """
+    Return the data files appended after since_snapshot_id up to snapshot, or None if rows may
+    have been removed or rewritten in between (or the older snapshot is no longer an ancestor).
+    """
+    chain = []
+    while snapshot is not None and snapshot.snapshot_id != since_snapshot_id:
+        chain.append(snapshot)
+        snapshot = source.snapshot_by_id(snapshot.parent_snapshot_id) if snapshot.parent_snapshot_id else None
+    if snapshot is None:
+        return None
+    appends = []
+    for s in chain:
+        operation = s.summary.operation if s.summary else None
+        if operation == Operation.REPLACE:
+            continue  # compaction rewrites rows that were aggregated already
+        if operation != Operation.APPEND:
+            return None
+        appends.append(s)
+
+    def _read(snapshot):
+        # Files added by an append live in the manifests it wrote
+        manifests = [m for m in snapshot.manifests(source.io) if m.added_snapshot_id == snapshot.snapshot_id]
+        return [entry.data_file for manifest in manifests for entry in manifest.fetch_manifest_entry(source.io)
+                if entry.snapshot_id == snapshot.snapshot_id and entry.status == ManifestEntryStatus.ADDED
+                and entry.data_file.content == DataFileContent.DATA]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [f for files in executor.map(_read, appends) for f in files]
+
+
+def _load_state(target, catalog):
+    """Return (rollup rows or None, properties) of a Parquet file or Iceberg table."""
+    if catalog is None:
+        if not Path(target).exists():
+            return None, {}
+        state = pq.read_table(target)
+        metadata = state.schema.metadata or {}
+        return state.replace_schema_metadata(None), {k.decode(): v.decode() for k, v in metadata.items()}
+    try:
+        table = catalog.load_table(target)
+    except NoSuchTableError:
+        return None, {}
+    return table.scan().to_arrow(), dict(table.properties)
+
+
+def _save_state(state: pa.Table, target, catalog, properties: dict, recreate: bool) -> None:
+    if catalog is None:
+        temporary = f'{target}.tmp'
+        pq.write_table(state.replace_schema_metadata({k.encode(): v.encode() for k, v in properties.items()}), temporary)
+        os.replace(temporary, target)
+        return
+    if recreate and catalog.table_exists(target):
+        catalog.drop_table(target)
+    try:
+        table = catalog.load_table(target)
+    except NoSuchTableError:
+        table = catalog.create_table(target, schema=state.schema)
+    # Rows and the processed source snapshot are committed together
+    with table.transaction() as tx:
+        if table.current_snapshot() is None:
+            tx.append(state)
+        else:
+            tx.overwrite(state)
+        tx.set_properties(properties)
+
+
+def refresh_rollup(source, rollup: dict, target, catalog=None, max_workers: int = None) -> dict:
+    """
+    Bring a materialized rollup up to date with its source table.
+
+    Only data files appended since the source snapshot recorded with the rollup are read and
+    merged into the existing rollup rows. The rollup is rebuilt from a full scan on the first
+    refresh, after the definition changed, or when source rows were deleted or overwritten
+    (counts and sketches can't be retracted). Compactions (replace snapshots) are skipped.
+
+    Args:
+        source: PyIceberg Table object with the raw rows
+        rollup: Definition from define_rollup()
+        target: Parquet file path, or Iceberg table identifier if catalog is given
+        catalog: PyIceberg catalog to keep the rollup in as an Iceberg table
+        max_workers: Number of manifests read in parallel
+
+    Returns:
+        Dictionary with mode ('full', 'incremental' or 'unchanged'), source snapshot id, data files
+        and rows read, and the number of rollup rows
+    """
+    snapshot = source.current_snapshot()
+    state, properties = _load_state(target, catalog)
+    fingerprint = _fingerprint(rollup)
+    same_definition = state is not None and properties.get(DEFINITION_PROPERTY) == fingerprint
+    processed = int(properties[SOURCE_SNAPSHOT_PROPERTY]) if same_definition and SOURCE_SNAPSHOT_PROPERTY in properties else None
+
+    result = {'mode': 'unchanged', 'source_snapshot_id': snapshot.snapshot_id if snapshot else None,
+              'data_files': 0, 'rows_read': 0, 'rollup_rows': len(state) if state is not None else 0}
+    if snapshot is not None and processed == snapshot.snapshot_id:
+        return result
+
+    row_filter = parse(rollup['row_filter']) if rollup['row_filter'] else AlwaysTrue()
+    scan = source.scan(row_filter=row_filter, selected_fields=_source_columns(rollup),
+                       snapshot_id=snapshot.snapshot_id if snapshot else None)
+    added = _added_data_files(source, processed, snapshot, max_workers) if processed is not None else None
+    if added is None:
+        result['mode'] = 'full'
+        parts = []
+        if snapshot is not None:
+            result['data_files'] = len(scan.plan_files())
+            batches = scan.to_arrow_batch_reader()
+        else:
+            batches = []
+    else:
+        result['mode'] = 'incremental'
+        result['data_files'] = len(added)
+        parts = [state]
+        batches = ArrowScan(source.metadata, source.io, scan.projection(), scan.row_filter).to_record_batches(
+            [FileScanTask(f) for f in added])
+
+    # Aggregating batch by batch keeps memory bounded by the batch size and the number of groups
+    for batch in batches:
+        result['rows_read'] += batch.num_rows
+        parts.append(_aggregate(pa.Table.from_batches([batch]), rollup))
+    if parts:
+        state = _merge(parts, rollup)
+    else:
+        state = _aggregate(scan.to_arrow(), rollup)
+
+    properties = {DEFINITION_PROPERTY: fingerprint}
+    if snapshot is not None:
+        properties[SOURCE_SNAPSHOT_PROPERTY] = str(snapshot.snapshot_id)
+    _save_state(state, target, catalog, properties, recreate=not same_definition)
+    result['rollup_rows'] = len(state)
+    return result
+
+
+def read_rollup(target, catalog=None, sketches: bool = False) -> pa.Table:
+    """
+    Read a materialized rollup, e.g. for a dashboard.
+
+    Args:
+        target: Parquet file path, or Iceberg table identifier if catalog is given
+        catalog: PyIceberg catalog holding the rollup table
+        sketches: Keep the HyperLogLog sketch columns (needed to merge groups further)
+
+    Returns:
+        Arrow table with one row per group
+    """
+    state, _ = _load_state(target, catalog)
+    if state is None:
+        raise FileNotFoundError(f"Rollup {target} doesn't exist yet, run refresh_rollup() first")
+    if sketches:
+        return state
+    return state.drop_columns([c for c in state.column_names if c.endswith(SKETCH_SUFFIX)])
@@ -0,0 +1,208 @@
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pyiceberg.expressions import AlwaysTrue
+from pyiceberg.expressions.parser import parse
+from pyiceberg.expressions.visitors import _InclusiveMetricsEvaluator
+from pyiceberg.io.pyarrow import ArrowScan
+from pyiceberg.manifest import DataFileContent, ManifestEntryStatus
+from pyiceberg.table import FileScanTask
+
+DEFAULT_CACHED_SNAPSHOTS = 64
+DEFAULT_MAX_REPLAY = 8
+
+
+def _timestamp_ms(timestamp) -> int:
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp() * 1000)
+    return int(timestamp)
+
+
+class SnapshotTimeline:
+    """
+    Index over a table's snapshot log for fast "as of timestamp" lookups.
+
+    Lookups binary-search the snapshot log instead of scanning history(). The live file set of
+    each resolved snapshot is cached (LRU). A snapshot's set is derived from its parent's set by
+    applying only the manifests the snapshot itself wrote, so moving along the timeline reads a
+    few small manifests instead of the whole manifest tree. A snapshot with no cached ancestor
+    within max_replay commits is resolved from its own manifest list instead.
+    """
+
+    def __init__(self, table, max_cached: int = DEFAULT_CACHED_SNAPSHOTS, max_workers: int = None,
+                 max_replay: int = DEFAULT_MAX_REPLAY):
+        self._table = table
+        self._max_cached = max_cached
+        self._max_replay = max_replay
+        self._max_workers = max_workers
+        self._timestamps = []
+        self._snapshot_ids = []
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'incremental': 0, 'full': 0, 'manifests_read': 0}
+        self.refresh()
+
+    def refresh(self, table=None) -> None:
+        """Pick up new commits, e.g. after table.refresh() or catalog.load_table(). Cached file sets stay valid."""
+        if table is not None:
+            self._table = table
+        log = self._table.metadata.snapshot_log
+        known = len(self._timestamps)
+        # The snapshot log is append-only, unless old entries were expired from its head
+        if known and len(log) >= known and log[known - 1].snapshot_id == self._snapshot_ids[-1] \
+                and log[0].snapshot_id == self._snapshot_ids[0]:
+            log = log[known:]
+        else:
+            self._timestamps, self._snapshot_ids = [], []
+        for entry in log:
+            self._timestamps.append(entry.timestamp_ms)
+            self._snapshot_ids.append(entry.snapshot_id)
+
+    def __len__(self) -> int:
+        return len(self._snapshot_ids)
+
+    def snapshot_at(self, timestamp):
+        """
+        Return the snapshot that was current at a point in time, or None before the first commit.
+
+        Args:
+            timestamp: datetime, or milliseconds since the epoch
+        """
+        position = bisect_right(self._timestamps, _timestamp_ms(timestamp)) - 1
+        if position < 0:
+            return None
+        return self._table.snapshot_by_id(self._snapshot_ids[position])
+
+    def _delta(self, snapshot, executor):
+        # Entries added or deleted by this snapshot live in the manifests it wrote
+        manifests = [m for m in snapshot.manifests(self._table.io) if m.added_snapshot_id == snapshot.snapshot_id]
+
+        def _read(manifest):
+            return manifest.fetch_manifest_entry(self._table.io, discard_deleted=False)
+
+        added, removed = {}, set()
+        for entries in executor.map(_read, manifests):
+            for entry in entries:
+                if entry.snapshot_id != snapshot.snapshot_id:
+                    continue
+                if entry.status == ManifestEntryStatus.ADDED:
+                    added[entry.data_file.file_path] = entry.data_file
+                elif entry.status == ManifestEntryStatus.DELETED:
+                    removed.add(entry.data_file.file_path)
+        self.stats['manifests_read'] += len(manifests)
+        return added, removed
+
+    def _resolve_full(self, snapshot, executor) -> dict:
+        def _read(manifest):
+            return manifest.fetch_manifest_entry(self._table.io, discard_deleted=True)
+
+        manifests = snapshot.manifests(self._table.io)
+        files = {}
+        for entries in executor.map(_read, manifests):
+            files.update((entry.data_file.file_path, entry.data_file) for entry in entries)
+        self.stats['manifests_read'] += len(manifests)
+        return files
+
+    def _cache(self, snapshot_id: int, files: dict) -> None:
+        self._files[snapshot_id] = files
+        self._files.move_to_end(snapshot_id)
+        while len(self._files) > self._max_cached:
+            self._files.popitem(last=False)
+
+    def data_files(self, snapshot_id: int) -> dict:
+        """
+        Return the live data and delete files of a snapshot, keyed by file path.
+
+        Walks up the parent chain to the nearest cached ancestor and replays the changes of each
+        snapshot in between. If there is no cached ancestor (or first snapshot) within max_replay
+        commits, the snapshot is resolved from its full manifest list instead.
+        """
+        with self._lock:
+            if snapshot_id in self._files:
+                self.stats['hits'] += 1
+                self._files.move_to_end(snapshot_id)
+                return self._files[snapshot_id]
+
+            chain = []
+            snapshot = self._table.snapshot_by_id(snapshot_id)
+            if snapshot is None:
+                raise ValueError(f"Snapshot {snapshot_id} not found")
+            while snapshot is not None and snapshot.snapshot_id not in self._files and len(chain) < self._max_replay:
+                chain.append(snapshot)
+                parent = snapshot.parent_snapshot_id
+                # None once the first snapshot is reached or the parent was expired
+                snapshot = self._table.snapshot_by_id(parent) if parent is not None else None
+
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                if snapshot is not None and snapshot.snapshot_id in self._files:
+                    files = self._files[snapshot.snapshot_id]
+                elif snapshot is None and chain[-1].parent_snapshot_id is None:
+                    files = {}
+                else:
+                    # Replaying a long chain costs a manifest list read per commit: cheaper to
+                    # read the requested snapshot's manifests directly
+                    files = self._resolve_full(chain[0], executor)
+                    self.stats['full'] += 1
+                    self._cache(snapshot_id, files)
+                    return files
+                for snapshot in reversed(chain):
+                    files = self._apply(files, snapshot, executor)
+                    self._cache(snapshot.snapshot_id, files)
+            return files
+
+    def _apply(self, parent_files: dict, snapshot, executor) -> dict:
+        added, removed = self._delta(snapshot, executor)
+        files = {path: f for path, f in parent_files.items() if path not in removed}
+        files.update(added)
+        self.stats['incremental'] += 1
+        return files
+
+    def files_at(self, timestamp) -> dict:
+        """Return the live files (keyed by path) as of a point in time; empty before the first commit."""
+        snapshot = self.snapshot_at(timestamp)
+        return self.data_files(snapshot.snapshot_id) if snapshot is not None else {}
+
+    def scan_tasks(self, timestamp, row_filter=AlwaysTrue()) -> list:
+        """
+        Plan a scan as of a point in time from the cached file set, pruning files by column bounds.
+
+        Returns None if the snapshot has delete files; use table.scan(snapshot_id=...) then.
+        """
+        snapshot = self.snapshot_at(timestamp)
+        if snapshot is None:
+            return []
+        files = self.data_files(snapshot.snapshot_id).values()
+        if any(f.content != DataFileContent.DATA for f in files):
+            return None
+        if isinstance(row_filter, str):
+            row_filter = parse(row_filter)
+        schema = self._table.schemas().get(snapshot.schema_id, self._table.schema())
+        evaluator = _InclusiveMetricsEvaluator(schema, row_filter).eval
+        return [FileScanTask(f) for f in files if evaluator(f)]
+
+    def to_arrow(self, timestamp, row_filter=AlwaysTrue(), selected_fields: tuple = ('*',)):
+        """
+        Read the table as of a point in time.
+
+        Args:
+            timestamp: datetime, or milliseconds since the epoch
+            row_filter: Filter expression, as string or PyIceberg expression
+            selected_fields: Columns to read
+
+        Returns:
+            Arrow table
+        """
+        snapshot = self.snapshot_at(timestamp)
+        if snapshot is None:
+            raise ValueError(f"No snapshot existed at {timestamp}")
+        tasks = self.scan_tasks(timestamp, row_filter)
+        scan = self._table.scan(row_filter=row_filter, selected_fields=selected_fields, snapshot_id=snapshot.snapshot_id)
+        if tasks is None:
+            return scan.to_arrow()
+        return ArrowScan(self._table.metadata, self._table.io, scan.projection(), scan.row_filter).to_table(tasks)
+
+    def cache_info(self) -> dict:
+        """Return the number of indexed and cached snapshots plus hit/miss statistics."""
+        return {'snapshots': len(self), 'cached': len(self._files), 'capacity': self._max_cached, **self.stats}
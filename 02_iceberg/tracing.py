@@ -0,0 +1,15 @@
+"""
+The tracing layer of ../01_parquet/tracing.py, importable from this folder.
+
+Loads that module and registers it as 'tracing', so spans recorded by code in either folder
+end up in the same trace.
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    __name__, Path(__file__).resolve().parent.parent / '01_parquet' / 'tracing.py')
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+sys.modules[__name__] = _module
@@ -0,0 +1,352 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyiceberg.exceptions import NoSuchTableError
+from pyiceberg.expressions.parser import parse
+from pyiceberg.io.pyarrow import schema_to_pyarrow
+from pyiceberg.schema import index_by_name
+from pyiceberg.table import TableProperties
+from pyiceberg.table.sorting import SortDirection
+from pyiceberg.transforms import IdentityTransform
+
+# Iceberg sort orders only describe linear sorts, so space-filling curve clustering is kept
+# in table properties, like Spark's Z-order rewrite options.
+WRITE_CLUSTER_COLUMNS = 'write.cluster.columns'  # comma separated column names
+WRITE_CLUSTER_CURVE = 'write.cluster.curve'  # 'zorder' or 'hilbert'
+CURVES = ('zorder', 'hilbert')
+ARROW_FIELD_ID_KEY = b'PARQUET:field_id'
+
+
+def set_write_order(table, cluster_by=None, curve: str = 'zorder') -> None:
+    """
+    Cluster future appends and compactions of a table along a space-filling curve.
+
+    For a plain linear sort, use the table's sort order instead:
+    `with table.update_sort_order() as update: update.asc('device_id', IdentityTransform())`
+
+    Args:
+        table: PyIceberg Table object
+        cluster_by: Column names to cluster by, or None to remove the clustering
+        curve: 'zorder' or 'hilbert'
+    """
+    if curve not in CURVES:
+        raise ValueError(f"Unknown curve {curve!r}, expected one of {CURVES}")
+    with table.transaction() as tx:
+        if cluster_by:
+            tx.set_properties({WRITE_CLUSTER_COLUMNS: ','.join(cluster_by), WRITE_CLUSTER_CURVE: curve})
+        else:
+            tx.remove_properties(WRITE_CLUSTER_COLUMNS, WRITE_CLUSTER_CURVE)
+
+
+def write_order(table) -> dict:
+    """
+    Return the write ordering configured for a table.
+
+    Returns:
+        Dictionary with 'curve' ('zorder', 'hilbert', 'linear' or None) and 'columns'; for 'linear'
+        the columns are (column, 'ascending'|'descending') pairs from the table's sort order
+    """
+    if columns := table.properties.get(WRITE_CLUSTER_COLUMNS):
+        return {'curve': table.properties.get(WRITE_CLUSTER_CURVE, 'zorder'), 'columns': columns.split(',')}
+
+    keys = []
+    schema = table.schema()
+    for field in table.sort_order().fields:
+        # Only identity transforms can be applied with a plain Arrow sort
+        if not isinstance(field.transform, IdentityTransform):
+            break
+        direction = 'ascending' if field.direction == SortDirection.ASC else 'descending'
+        keys.append((schema.find_column_name(field.source_id), direction))
+    return {'curve': 'linear' if keys else None, 'columns': keys}
+
+
+def _ordinals(column, bits: int) -> np.ndarray:
+    # Dense ranks (nulls last) spread every column evenly over [0, 2^bits), whatever its type or distribution
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    ranks = pc.rank(column, sort_keys='ascending', tiebreaker='dense').to_numpy()
+    top = ranks.max() - 1 if len(ranks) else 0
+    if top == 0:
+        return np.zeros(len(ranks), dtype=np.uint64)
+    return np.floor((ranks - 1) / top * ((1 << bits) - 1)).astype(np.uint64)
+
+
+def _interleave(coords: list, bits: int) -> np.ndarray:
+    # Most significant bit first; the first column owns the highest bit of each group
+    key = np.zeros(len(coords[0]), dtype=np.uint64)
+    for b in range(bits - 1, -1, -1):
+        for x in coords:
+            key = (key << np.uint64(1)) | ((x >> np.uint64(b)) & np.uint64(1))
+    return key
+
+
+def _hilbert_transpose(coords: list, bits: int) -> list:
+    # Skilling's AxesToTranspose ("Programming the Hilbert curve", 2004), vectorized over rows
+    x = [c.copy() for c in coords]
+    q = np.uint64(1 << (bits - 1))
+    while q > 1:
+        p = q - np.uint64(1)
+        for i in range(len(x)):
+            high = (x[i] & q) != 0
+            t = np.where(high, np.uint64(0), (x[0] ^ x[i]) & p)
+            x[0] = np.where(high, x[0] ^ p, x[0] ^ t)
+            if i:
+                x[i] = x[i] ^ t
+        q >>= np.uint64(1)
+    for i in range(1, len(x)):
+        x[i] ^= x[i - 1]
+    t = np.zeros_like(x[0])
+    q = np.uint64(1 << (bits - 1))
+    while q > 1:
+        t = np.where((x[-1] & q) != 0, t ^ (q - np.uint64(1)), t)
+        q >>= np.uint64(1)
+    return [xi ^ t for xi in x]
+
+
+def curve_key(data: pa.Table, columns, curve: str = 'zorder') -> pa.Array:
+    """
+    Compute a Z-order or Hilbert curve position per row from several columns.
+
+    Each column is mapped to its dense rank, so strings, timestamps and skewed numbers all
+    contribute equally. The 64 key bits are split evenly between the columns.
+
+    Args:
+        data: Arrow table
+        columns: Column names
+        curve: 'zorder' or 'hilbert'
+
+    Returns:
+        UInt64 array; sorting by it clusters rows that are close in all columns
+    """
+    if curve not in CURVES:
+        raise ValueError(f"Unknown curve {curve!r}, expected one of {CURVES}")
+    bits = min(32, 64 // len(columns))
+    coords = [_ordinals(data.column(c), bits) for c in columns]
+    if curve == 'hilbert' and len(columns) > 1:
+        coords = _hilbert_transpose(coords, bits)
+    return pa.array(_interleave(coords, bits), type=pa.uint64())
+
+
+def order_rows(table, data: pa.Table, sort_by=None, cluster_by=None, curve: str = 'zorder') -> pa.Table:
+    """
+    Order rows before writing: explicit sort_by or cluster_by, otherwise the table's write order.
+
+    Args:
+        table: PyIceberg Table object
+        data: Arrow table to write
+        sort_by: Column names or (column, 'ascending'|'descending') pairs for a linear sort
+        cluster_by: Column names to cluster along a space-filling curve
+        curve: 'zorder' or 'hilbert', used with cluster_by
+
+    Returns:
+        Reordered Arrow table (the input itself if no ordering applies)
+    """
+    if sort_by:
+        return data.sort_by([(key, 'ascending') if isinstance(key, str) else key for key in sort_by])
+    order = {'curve': curve, 'columns': list(cluster_by)} if cluster_by else write_order(table)
+    if order['curve'] is None or len(data) < 2:
+        return data
+    if order['curve'] == 'linear':
+        return data.sort_by(order['columns'])
+    return data.take(pc.sort_indices(curve_key(data, order['columns'], order['curve'])))
+
+
+def clustered_append(table, data: pa.Table, sort_by=None, cluster_by=None, curve: str = 'zorder',
+                     snapshot_properties: dict = None) -> None:
+    """
+    Append data in the table's write order (see order_rows()), so file min/max bounds stay narrow.
+
+    Args:
+        table: PyIceberg Table object
+        data: Arrow table to append
+        sort_by: Optional linear sort overriding the table's write order
+        cluster_by: Optional clustering columns overriding the table's write order
+        curve: 'zorder' or 'hilbert', used with cluster_by
+        snapshot_properties: Custom properties added to the snapshot summary
+    """
+    table.append(order_rows(table, data, sort_by, cluster_by, curve), snapshot_properties=snapshot_properties or {})
+
+
+def files_scanned(table, row_filter) -> dict:
+    """
+    Count the data files a query has to read after partition and min/max pruning.
+
+    Args:
+        table: PyIceberg Table object
+        row_filter: Filter expression, as string or PyIceberg expression
+
+    Returns:
+        Dictionary with total, scanned and skipped file counts
+    """
+    snapshot = table.current_snapshot()
+    total = int(snapshot.summary['total-data-files']) if snapshot else 0
+    scanned = sum(1 for _ in table.scan(row_filter=row_filter).plan_files())
+    return {'files': total, 'scanned': scanned, 'skipped': total - scanned}
+
+
+def benchmark_clustering(catalog, namespace: str, data: pa.Table, queries, sort_by=None, cluster_by=None,
+                         target_file_size: int = 1024 * 1024) -> pd.DataFrame:
+    """
+    Write the same data in arrival order, linear sort order, Z-order and Hilbert order and compare
+    how many files each query can skip.
+
+    One table per layout is (re)created as '<namespace>.clustering_<layout>'. A small target file
+    size makes the append produce many files, as a large table would.
+
+    Args:
+        catalog: PyIceberg catalog
+        namespace: Existing namespace for the benchmark tables
+        data: Arrow table to write
+        queries: Dictionary of label -> filter expression
+        sort_by: Columns for the linear layout (default: cluster_by)
+        cluster_by: Columns for the curve layouts
+        target_file_size: write.target-file-size-bytes of the benchmark tables
+
+    Returns:
+        DataFrame with files, scanned and skipped counts per layout and query
+    """
+    layouts = {'arrival': {}}
+    if sort_by or cluster_by:
+        layouts['linear'] = {'sort_by': sort_by or cluster_by}
+    if cluster_by:
+        layouts.update({curve: {'cluster_by': cluster_by, 'curve': curve} for curve in CURVES})
+
+    rows = []
+    for layout, options in layouts.items():
+        identifier = f'{namespace}.clustering_{layout}'
+        try:
+            catalog.drop_table(identifier)
+        except NoSuchTableError:
+            pass
+        table = catalog.create_table(identifier, schema=data.schema, properties={
+            TableProperties.WRITE_TARGET_FILE_SIZE_BYTES: str(target_file_size),
+        })
+        clustered_append(table, data, **options)
+        for label, query in queries.items():
+            row_filter = parse(query) if isinstance(query, str) else query
+            rows.append({'layout': layout, 'query': label, **files_scanned(table, row_filter)})
+    return pd.DataFrame(rows)
+
+
+def _field_ids_by_name(table) -> dict:
+    """Map every column name the table ever had (dotted for nested fields) to its field id."""
+    ids = {}
+    for schema in sorted(table.schemas().values(), key=lambda schema: schema.schema_id):
+        ids.update(index_by_name(schema))
+    ids.update(index_by_name(table.schema()))  # current names win if an old name was reused
+    return ids
+
+
+def _same_layout(source: pa.DataType, target: pa.DataType) -> bool:
+    # string/large_string etc. differ only in offset width; PyIceberg accepts both, so avoid the copy
+    if source == target:
+        return True
+    for small, large in ((pa.types.is_string, pa.types.is_large_string), (pa.types.is_binary, pa.types.is_large_binary)):
+        if (small(source) or large(source)) and (small(target) or large(target)):
+            return True
+    return False
+
+
+def _fill_column(field, name: str, fill: dict, length: int) -> pa.Array:
+    arrow_type = schema_to_pyarrow(field.field_type, include_field_ids=False)
+    value = fill[name] if name in fill else field.write_default
+    if value is None:
+        if field.required:
+            raise ValueError(f"Required column {name!r} is missing and has no default")
+        return pa.nulls(length, arrow_type)
+    return pa.repeat(pa.scalar(value, arrow_type), length)
+
+
+def _align_columns(arrays, source_fields, target_fields, ids: dict, fill: dict, prefix: str, length: int) -> list:
+    by_id, unknown = {}, []
+    for array, source in zip(arrays, source_fields):
+        metadata = source.metadata or {}
+        field_id = int(metadata[ARROW_FIELD_ID_KEY]) if ARROW_FIELD_ID_KEY in metadata else ids.get(prefix + source.name)
+        if field_id is None:
+            unknown.append(prefix + source.name)
+        else:
+            by_id[field_id] = array
+    if unknown:
+        raise ValueError(f"Columns {unknown} do not exist in any schema of the table")
+
+    # Iterating the target fields reorders columns and drops deleted ones (ids no longer in the schema)
+    aligned = []
+    for target in target_fields:
+        name = prefix + target.name
+        array = by_id.get(target.field_id)
+        if array is None:
+            aligned.append(_fill_column(target, name, fill, length))
+        elif target.field_type.is_struct and pa.types.is_struct(array.type):
+            children = _align_columns(
+                [pc.struct_field(array, [i]) for i in range(array.type.num_fields)],
+                list(array.type), target.field_type.fields, ids, fill, name + '.', length,
+            )
+            fields = [pa.field(f.name, c.type, nullable=not f.required) for f, c in zip(target.field_type.fields, children)]
+            aligned.append(pa.StructArray.from_arrays(children, fields=fields, mask=array.is_null() if array.null_count else None))
+        else:
+            arrow_type = schema_to_pyarrow(target.field_type, include_field_ids=False)
+            aligned.append(array if _same_layout(array.type, arrow_type) else array.cast(arrow_type))
+    return aligned
+
+
+def align_to_schema(table, data, fill: dict = None):
+    """
+    Align Arrow data to the table's current schema without leaving Arrow.
+
+    Columns are matched by field id: either from 'PARQUET:field_id' field metadata, or by looking
+    up the column name in all historical schemas, so data using a column's old name still lands
+    in the renamed column. Then columns are reordered and cast to the current types, deleted
+    columns are dropped, and columns missing from the data are filled with the value from fill,
+    the field's write default, or nulls. Unchanged columns are passed through without copying.
+
+    Args:
+        table: PyIceberg Table object
+        data: Arrow table, record batch, or iterable of record batches (e.g. a RecordBatchReader)
+        fill: Constant values for missing columns, by (dotted) current column name
+
+    Returns:
+        Same kind as data: Arrow table, record batch, or generator of record batches
+
+    Raises:
+        ValueError: If a column never existed in the table, or a required column is missing
+    """
+    fill = fill or {}
+    schema = table.schema()
+    ids = _field_ids_by_name(table)
+
+    def _align_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+        columns = _align_columns(batch.columns, list(batch.schema), schema.fields, ids, fill, '', batch.num_rows)
+        return pa.RecordBatch.from_arrays(columns, schema=pa.schema([
+            pa.field(f.name, c.type, nullable=not f.required) for f, c in zip(schema.fields, columns)
+        ]))
+
+    if isinstance(data, pa.RecordBatch):
+        return _align_batch(data)
+    if isinstance(data, pa.Table):
+        batches = [_align_batch(batch) for batch in data.to_batches()]
+        if not batches:
+            return schema_to_pyarrow(schema, include_field_ids=False).empty_table()
+        return pa.Table.from_batches(batches)
+    return (_align_batch(batch) for batch in data)
+
+
+def append_aligned(table, data, fill: dict = None, snapshot_properties: dict = None) -> None:
+    """
+    Align data to the table's current schema (see align_to_schema()) and append it in write order.
+
+    Args:
+        table: PyIceberg Table object
+        data: Arrow table, record batch, or iterable of record batches
+        fill: Constant values for missing columns, by (dotted) current column name
+        snapshot_properties: Custom properties added to the snapshot summary
+    """
+    aligned = align_to_schema(table, data, fill)
+    if isinstance(aligned, pa.RecordBatch):
+        aligned = pa.Table.from_batches([aligned])
+    elif not isinstance(aligned, pa.Table):
+        batches = list(aligned)
+        if not batches:
+            return
+        aligned = pa.Table.from_batches(batches)
+    clustered_append(table, aligned, snapshot_properties=snapshot_properties)